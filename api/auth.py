@@ -0,0 +1,93 @@
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.database import get_async_db
+from core.security import (
+    DUMMY_PASSWORD_HASH,
+    create_access_token,
+    get_current_user,
+    hash_password,
+    verify_password,
+)
+from models.user import User
+from schemas.user import Token, UserCreate, UserResponse, UserUpdate
+
+router = APIRouter(prefix="/api/auth", tags=["Authentication"])
+
+
+@router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
+async def register(user_in: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    """Create an account"""
+    user = User(
+        email=user_in.email,
+        username=user_in.username,
+        full_name=user_in.full_name,
+        company_name=user_in.company_name,
+        hashed_password=await hash_password(user_in.password),
+    )
+    db.add(user)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Email or username already registered")
+    await db.refresh(user)
+    return user
+
+
+@router.post("/login", response_model=Token)
+async def login(
+    form: OAuth2PasswordRequestForm = Depends(),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Exchange a username (or email) and password for an access token"""
+    user = await db.scalar(select(User).where(or_(User.username == form.username, User.email == form.username)))
+    # Unknown users still pay for a hash check so response times do not reveal them
+    valid = await verify_password(form.password, user.hashed_password if user else DUMMY_PASSWORD_HASH)
+    if user is None or not valid or not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect username or password",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return Token(access_token=create_access_token(user))
+
+
+@router.get("/me", response_model=UserResponse)
+async def read_me(current_user: User = Depends(get_current_user)):
+    """The authenticated user's profile"""
+    return current_user
+
+
+@router.patch("/me", response_model=UserResponse)
+async def update_me(
+    changes: UserUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Update the profile; a new password revokes every earlier token"""
+    user = await db.get(User, current_user.id, with_for_update=True)
+    data = changes.model_dump(exclude_unset=True)
+    password = data.pop("password", None)
+    for field, value in data.items():
+        setattr(user, field, value)
+    if password:
+        user.hashed_password = await hash_password(password)
+    await db.commit()
+    await db.refresh(user)
+    return user
+
+
+@router.delete("/me", status_code=status.HTTP_204_NO_CONTENT, response_class=Response)
+async def deactivate_me(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Deactivate the account; its tokens stop working immediately"""
+    user = await db.get(User, current_user.id, with_for_update=True)
+    user.is_active = False
+    await db.commit()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,208 @@
+import base64
+import json
+import logging
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy import or_, select, tuple_, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.database import AsyncSessionLocal, get_async_db, get_ingest_db
+from core.security import get_current_user
+from models.commitment import CLOSED_STATUSES, Commitment, CommitmentArchive, CommitmentStatus, CommitmentType
+from models.user import User
+from schemas.commitment import (
+    CommitmentCreate,
+    CommitmentPage,
+    CommitmentResponse,
+    CommitmentStatusSchema,
+    CommitmentTypeSchema,
+    CommitmentUpdate,
+)
+from schemas.ingest import BulkIngestResponse
+from schemas.types import to_naive_utc
+from services import bulk_ingest
+from services.commitment_service import update_commitment, upsert_commitment
+from services.drafts import DraftSubject, draft_service, save_draft
+from services.listing import COMMITMENT_LIST_FIELDS, archive_list_columns, as_dicts, commitment_list_columns
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/commitments", tags=["Commitments"])
+
+
+def encode_cursor(deadline: datetime, commitment_id: int) -> str:
+    """Encode the (deadline, id) keyset position of the last row on a page"""
+    raw = json.dumps([deadline.isoformat(), commitment_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor produced by encode_cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        deadline, commitment_id = json.loads(raw)
+        return to_naive_utc(datetime.fromisoformat(deadline)), int(commitment_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+@router.get("", response_model=CommitmentPage, response_class=ORJSONResponse)
+async def list_commitments(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    status_filter: Optional[List[CommitmentStatusSchema]] = Query(None, alias="status"),
+    commitment_type: Optional[CommitmentTypeSchema] = None,
+    party: Optional[str] = None,
+    deadline_from: Optional[datetime] = None,
+    deadline_to: Optional[datetime] = None,
+    include_archived: bool = Query(False, description="Also list closed commitments moved to the archive"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    """List commitments ordered by (deadline, id) using keyset pagination"""
+    statuses = [CommitmentStatus(s.value) for s in status_filter or ()]
+    position = decode_cursor(cursor) if cursor else None
+    # deadline is a naive UTC column; asyncpg rejects aware values bound against it
+    deadline_from = to_naive_utc(deadline_from) if deadline_from else None
+    deadline_to = to_naive_utc(deadline_to) if deadline_to else None
+
+    def page(model, columns):
+        # Fetch one extra row to know whether another page exists
+        query = select(*columns).where(model.owner_id == current_user.id)
+        if statuses:
+            query = query.where(model.status.in_(statuses))
+        if commitment_type:
+            query = query.where(model.commitment_type == CommitmentType(commitment_type.value))
+        if party:
+            query = query.where(or_(model.party_name == party, model.party_email == party))
+        if deadline_from:
+            query = query.where(model.deadline >= deadline_from)
+        if deadline_to:
+            query = query.where(model.deadline < deadline_to)
+        if position:
+            query = query.where(tuple_(model.deadline, model.id) > tuple_(*position))
+        return query.order_by(model.deadline, model.id).limit(limit + 1)
+
+    query = page(Commitment, commitment_list_columns())
+    # The archive only holds closed rows: skip it when the status filter rules them out
+    if include_archived and (not statuses or set(statuses) & set(CLOSED_STATUSES)):
+        # Each side walks its own (owner_id, deadline, id) index; only 2 x (limit + 1) rows are merged
+        hot = query.subquery()
+        cold = page(CommitmentArchive, archive_list_columns()).subquery()
+        merged = union_all(select(hot), select(cold)).subquery()
+        query = select(merged).order_by(merged.c.deadline, merged.c.id).limit(limit + 1)
+    rows = (await db.execute(query)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].deadline, rows[-1].id)
+
+    # Plain rows straight to orjson: no ORM objects, no per-row model validation
+    return ORJSONResponse({"items": as_dicts(COMMITMENT_LIST_FIELDS, rows), "next_cursor": next_cursor})
+
+
+@router.post("", response_model=CommitmentResponse, status_code=status.HTTP_201_CREATED)
+async def create_commitment(
+    commitment: CommitmentCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Create a commitment; resubmitting the same source message returns the stored one"""
+    return await upsert_commitment(db, current_user.id, commitment)
+
+
+@router.post("/bulk", response_model=BulkIngestResponse)
+async def bulk_create_commitments(
+    request: Request,
+    db: AsyncSession = Depends(get_ingest_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Create many commitments from a JSON array or an NDJSON stream"""
+    try:
+        records = await bulk_ingest.read_records(request.headers.get("content-type", ""), request.stream())
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    result = await bulk_ingest.ingest_records(db, bulk_ingest.COMMITMENTS, current_user.id, records)
+    return BulkIngestResponse(inserted=result.inserted, duplicates=result.duplicates, errors=result.errors)
+
+
+@router.patch("/{commitment_id}", response_model=CommitmentResponse)
+async def patch_commitment(
+    commitment_id: int,
+    changes: CommitmentUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Update a commitment, e.g. to move it to another status"""
+    commitment = await update_commitment(db, current_user.id, commitment_id, changes)
+    if commitment is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Commitment not found")
+    return commitment
+
+
+def sse(event: str, data) -> bytes:
+    """One server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+async def draft_events(owner_id: int, commitment: Commitment, refresh: bool) -> AsyncIterator[bytes]:
+    """Server-sent events for one draft: token events, then done (or error)"""
+    if commitment.draft_content and not refresh:
+        yield sse("token", commitment.draft_content)
+        yield sse("done", {"draft": commitment.draft_content, "source": "stored"})
+        return
+    subject = DraftSubject.of(commitment)
+    draft = None if refresh else await draft_service.cached(subject)
+    source = "template"
+    if draft is not None:
+        yield sse("token", draft)
+    else:
+        source = "model"
+        parts = []
+        try:
+            async for token in draft_service.stream(subject):
+                parts.append(token)
+                yield sse("token", token)
+        except Exception as exc:
+            logger.warning("Draft generation failed for commitment %d: %s", commitment.id, exc)
+            yield sse("error", {"detail": "Draft generation failed"})
+            return
+        draft = "".join(parts)
+    draft = draft.strip()
+    async with AsyncSessionLocal() as db:
+        await save_draft(db, owner_id, commitment.id, draft)
+    yield sse("done", {"draft": draft, "source": source})
+
+
+@router.get("/{commitment_id}/draft")
+async def stream_draft(
+    commitment_id: int,
+    refresh: bool = Query(False, description="Generate a new draft even if one is stored or cached"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Stream a follow-up draft for a commitment as server-sent events.
+
+    `token` events carry text (JSON strings) as the model writes it; a
+    stored draft or one filled from a cached template arrives as a single
+    token. `done` carries the complete draft and its source (stored,
+    template or model) once it is saved to draft_content. `error` ends the
+    stream if generation fails.
+    """
+    commitment = await db.scalar(
+        select(Commitment).where(Commitment.id == commitment_id, Commitment.owner_id == current_user.id)
+    )
+    if commitment is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Commitment not found")
+    # Release the pooled connection: generation can take many seconds
+    await db.close()
+    return StreamingResponse(
+        draft_events(current_user.id, commitment, refresh),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,89 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.database import get_async_db
+from core.security import get_current_user
+from models.commitment import Commitment
+from models.contact import Contact
+from models.sales import Sales
+from models.user import User
+from schemas.contact import ContactDetail, ContactPage
+from services.contacts import normalize_name
+from services.listing import (
+    COMMITMENT_LIST_FIELDS,
+    SALES_LIST_FIELDS,
+    as_dicts,
+    commitment_list_columns,
+    sales_list_columns,
+)
+
+router = APIRouter(prefix="/api/contacts", tags=["Contacts"])
+
+# Contact fields returned by the list and detail views, in order
+CONTACT_FIELDS = ("id", "display_name", "email", "phone", "created_at")
+
+
+@router.get("", response_model=ContactPage, response_class=ORJSONResponse)
+async def list_contacts(
+    q: Optional[str] = Query(None, description="Name prefix"),
+    cursor: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    """List contacts newest first, using keyset pagination on id"""
+    query = select(*(getattr(Contact, name) for name in CONTACT_FIELDS)).where(Contact.owner_id == current_user.id)
+    prefix = normalize_name(q)
+    if prefix:
+        # ix_contacts_owner_name
+        query = query.where(Contact.name_key.startswith(prefix, autoescape=True))
+    if cursor:
+        query = query.where(Contact.id < cursor)
+
+    # Fetch one extra row to know whether another page exists
+    rows = (await db.execute(query.order_by(Contact.id.desc()).limit(limit + 1))).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1].id
+    return ORJSONResponse({"items": as_dicts(CONTACT_FIELDS, rows), "next_cursor": next_cursor})
+
+
+@router.get("/{contact_id}", response_model=ContactDetail, response_class=ORJSONResponse)
+async def get_contact(
+    contact_id: int,
+    limit: int = Query(200, ge=1, le=1000, description="Commitments and sales returned each"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    """A contact with its commitments and sales"""
+    contact = (
+        await db.execute(
+            select(*(getattr(Contact, name) for name in CONTACT_FIELDS))
+            .where(Contact.id == contact_id, Contact.owner_id == current_user.id)
+        )
+    ).first()
+    if contact is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
+
+    # ix_commitments_owner_contact_deadline / ix_sales_owner_contact_listing
+    commitments = await db.execute(
+        select(*commitment_list_columns())
+        .where(Commitment.owner_id == current_user.id, Commitment.contact_id == contact_id)
+        .order_by(Commitment.deadline, Commitment.id)
+        .limit(limit)
+    )
+    sales = await db.execute(
+        select(*sales_list_columns())
+        .where(Sales.owner_id == current_user.id, Sales.contact_id == contact_id)
+        .order_by(Sales.id.desc())
+        .limit(limit)
+    )
+    detail = dict(zip(CONTACT_FIELDS, contact))
+    detail["commitments"] = as_dicts(COMMITMENT_LIST_FIELDS, commitments)
+    detail["sales"] = as_dicts(SALES_LIST_FIELDS, sales)
+    return ORJSONResponse(detail)
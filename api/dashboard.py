@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.database import get_async_db
+from core.security import get_current_user
+from models.user import User
+from schemas.dashboard import DashboardSummary
+from services.dashboard_stats import get_counters, summarize
+
+router = APIRouter(prefix="/api/dashboard", tags=["Dashboard"])
+
+
+@router.get("/summary", response_model=DashboardSummary)
+async def dashboard_summary(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Commitment counts and sales pipeline value, read from the maintained counters"""
+    return summarize(await get_counters(db, current_user.id))
@@ -0,0 +1,81 @@
+import time
+from typing import AsyncIterator, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from fastapi.security import OAuth2PasswordBearer
+
+from core.config import get_settings
+from core.database import AsyncSessionLocal
+from core.security import authenticate_token, credentials_exception
+from services.realtime import change_broker
+
+settings = get_settings()
+
+router = APIRouter(prefix="/api/events", tags=["Events"])
+
+optional_bearer = OAuth2PasswordBearer(tokenUrl="/api/auth/login", auto_error=False)
+
+# Browsers reconnect after this many milliseconds when the stream drops
+RETRY_MS = 3000
+
+
+async def still_authorized(token: str, owner_id: int) -> bool:
+    """Whether the token is unexpired and still valid for owner_id (password unchanged, user active)"""
+    try:
+        # Served from the auth cache, whose token entries never outlive the token
+        async with AsyncSessionLocal() as db:
+            user = await authenticate_token(token, db)
+    except HTTPException:
+        return False
+    return user.id == owner_id
+
+
+async def event_stream(owner_id: int, token: str) -> AsyncIterator[bytes]:
+    """
+    Server-sent events: a ready event, then coalesced changes and heartbeat comments.
+
+    The token is re-checked once per heartbeat interval; the stream ends when
+    it has expired or was revoked, and the client's reconnect then fails auth.
+    """
+    subscription = change_broker.subscribe(owner_id)
+    checked = time.monotonic()
+    try:
+        yield f"retry: {RETRY_MS}\nevent: ready\ndata: {{}}\n\n".encode()
+        while True:
+            message = await subscription.get(settings.REALTIME_HEARTBEAT_SECONDS)
+            if time.monotonic() - checked >= settings.REALTIME_HEARTBEAT_SECONDS:
+                if not await still_authorized(token, owner_id):
+                    return
+                checked = time.monotonic()
+            if message is None:
+                yield b": ping\n\n"
+            else:
+                yield b"event: changes\ndata: " + message + b"\n\n"
+    finally:
+        change_broker.unsubscribe(subscription)
+
+
+@router.get("/stream")
+async def stream_changes(
+    token: Optional[str] = Query(None, description="Access token, for clients that cannot set headers (EventSource)"),
+    bearer: Optional[str] = Depends(optional_bearer),
+):
+    """
+    Push changes to the user's commitments and sales as server-sent events.
+
+    Each `changes` event carries the changed rows in list-view shape per
+    kind, `removed` ids, and `reload`: kinds with too many changes to send,
+    which the client should refetch. Refetch everything after a `ready`
+    event, since changes made while disconnected are not replayed.
+    """
+    if not (token or bearer):
+        raise credentials_exception
+    # A short-lived session: the stream must not hold a pooled connection open
+    async with AsyncSessionLocal() as db:
+        user = await authenticate_token(token or bearer, db)
+    return StreamingResponse(
+        event_stream(user.id, token or bearer),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
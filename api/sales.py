@@ -0,0 +1,89 @@
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.database import get_async_db, get_ingest_db
+from core.security import get_current_user
+from models.sales import Sales, SalesStatus
+from models.user import User
+from schemas.ingest import BulkIngestResponse
+from schemas.sales import SalesForecast, SalesPage, SalesResponse, SalesStatusSchema, SalesUpdate
+from services import bulk_ingest
+from services.listing import SALES_LIST_FIELDS, as_dicts, sales_list_columns
+from services.sales_logic import forecast_sales, update_sale
+
+router = APIRouter(prefix="/api/sales", tags=["Sales"])
+
+
+@router.get("", response_model=SalesPage, response_class=ORJSONResponse)
+async def list_sales(
+    cursor: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=500),
+    status_filter: Optional[List[SalesStatusSchema]] = Query(None, alias="status"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    """List sales records newest first, using keyset pagination on id"""
+    query = select(*sales_list_columns()).where(Sales.owner_id == current_user.id)
+    if status_filter:
+        query = query.where(Sales.status.in_([SalesStatus(s.value) for s in status_filter]))
+    if cursor:
+        query = query.where(Sales.id < cursor)
+
+    # Fetch one extra row to know whether another page exists
+    rows = (await db.execute(query.order_by(Sales.id.desc()).limit(limit + 1))).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1].id
+
+    # Plain rows straight to orjson: no ORM objects, no per-row model validation
+    return ORJSONResponse({"items": as_dicts(SALES_LIST_FIELDS, rows), "next_cursor": next_cursor})
+
+
+@router.post("/bulk", response_model=BulkIngestResponse)
+async def bulk_create_sales(
+    request: Request,
+    db: AsyncSession = Depends(get_ingest_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Create many sales records from a JSON array or an NDJSON stream"""
+    try:
+        records = await bulk_ingest.read_records(request.headers.get("content-type", ""), request.stream())
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    result = await bulk_ingest.ingest_records(db, bulk_ingest.SALES, current_user.id, records)
+    return BulkIngestResponse(inserted=result.inserted, duplicates=result.duplicates, errors=result.errors)
+
+
+@router.get("/forecast", response_model=SalesForecast)
+async def sales_forecast(
+    period: Literal["week", "month"] = "month",
+    horizon: int = Query(6, ge=1, le=104),
+    currency: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Weighted pipeline per week or month, stage conversion rates and slippage"""
+    options = {"currency": currency.upper()} if currency else {}
+    try:
+        return await forecast_sales(db, current_user.id, period=period, horizon=horizon, **options)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+
+@router.patch("/{sale_id}", response_model=SalesResponse)
+async def patch_sale(
+    sale_id: int,
+    changes: SalesUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Update a sales record, e.g. to move the deal to another status"""
+    sale = await update_sale(db, current_user.id, sale_id, changes)
+    if sale is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sales record not found")
+    return sale
@@ -0,0 +1,26 @@
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.database import get_async_db
+from core.security import get_current_user
+from models.user import User
+from schemas.search import SearchResults
+from services import search as search_service
+
+router = APIRouter(prefix="/api/search", tags=["Search"])
+
+
+@router.get("", response_model=SearchResults)
+async def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    kind: Optional[Literal["commitment", "sale"]] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Ranked full-text search over the current user's commitments and sales"""
+    kinds = [kind] if kind else list(search_service.SEARCH_TARGETS)
+    hits = await search_service.search(db, current_user.id, q, kinds=kinds, limit=limit)
+    return SearchResults(query=q, hits=hits)
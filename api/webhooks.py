@@ -0,0 +1,60 @@
+import hmac
+import json
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Response, status
+
+from core.config import get_settings
+from schemas.webhook import InboundMessage, WebhookAccepted
+from services.telegram_bot import telegram_bot, update_chat_id
+from services.webhook_spool import MESSAGE, TELEGRAM, SpoolFull, webhook_spool
+
+settings = get_settings()
+
+router = APIRouter(prefix="/api/webhooks", tags=["Webhooks"])
+
+# Seconds senders are asked to wait when the spool is full
+RETRY_AFTER = "30"
+
+
+async def verify_webhook_secret(x_webhook_secret: str = Header(...)):
+    """Dependency checking the shared secret senders put in X-Webhook-Secret"""
+    if not hmac.compare_digest(x_webhook_secret, settings.WEBHOOK_SECRET):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid webhook secret")
+
+
+async def spool(kind: str, payload: str, ordering_key: Optional[str] = None) -> int:
+    """Append a delivery to the spool, or answer 503 while it is full"""
+    try:
+        return await webhook_spool.append(kind, payload, ordering_key)
+    except SpoolFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many deliveries waiting, retry later",
+            headers={"Retry-After": RETRY_AFTER},
+        )
+
+
+@router.post(
+    "/messages",
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=WebhookAccepted,
+    dependencies=[Depends(verify_webhook_secret)],
+)
+async def receive_message(message: InboundMessage):
+    """Spool an inbound message for commitment extraction; redeliveries are idempotent"""
+    return WebhookAccepted(delivery_id=await spool(MESSAGE, message.model_dump_json()))
+
+
+@router.post("/telegram", status_code=status.HTTP_204_NO_CONTENT, response_class=Response)
+async def receive_telegram_update(
+    update: Dict[str, Any] = Body(...),
+    x_telegram_bot_api_secret_token: str = Header(...),
+):
+    """Spool a Telegram update delivered by webhook (see TELEGRAM_WEBHOOK_URL); each chat stays in order"""
+    if not hmac.compare_digest(x_telegram_bot_api_secret_token, settings.WEBHOOK_SECRET):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid webhook secret")
+    if not (telegram_bot.token and telegram_bot.webhook_url):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Telegram webhook not enabled")
+    chat_id = update_chat_id(update)
+    await spool(TELEGRAM, json.dumps(update), None if chat_id is None else f"telegram:{chat_id}")
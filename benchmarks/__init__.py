@@ -0,0 +1,8 @@
+"""
+Benchmarks for Commit AI.
+
+`python -m benchmarks` generates a seeded, skewed dataset and runs the
+micro, database and HTTP load suites against it, writing bench_output.txt
+(see __main__.py). The bench_*.py scripts are focused benchmarks of one
+code path each, with their own budgets.
+"""
@@ -0,0 +1,101 @@
+"""
+Run the benchmark suite against a freshly generated dataset.
+
+    python -m benchmarks [--profile quick|full] [--database-url URL] [--url URL]
+                         [--suites micro,db,http] [--output bench_output.txt]
+                         [--update-baselines] [--threshold 0.25] [--fail-on-regression]
+
+Without --database-url the dataset goes into a scratch SQLite file. A
+Postgres URL must point at an empty database: the generator creates the
+tables and ids from 1. The report is written to --output and compared
+with the baselines recorded for the same profile and backend.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+PROFILES = {
+    "quick": {"users": 20, "commitments": 20_000, "sales": 5_000, "duration": 5.0, "concurrency": 20},
+    "full": {"users": 200, "commitments": 200_000, "sales": 50_000, "duration": 20.0, "concurrency": 50},
+}
+SUITES = ("micro", "db", "http")
+
+
+async def run(args) -> int:
+    # App modules read settings on import, so they are imported only once DATABASE_URL is set
+    from benchmarks import http_load, micro
+    from benchmarks.datagen import DatasetSpec, load
+    from benchmarks.report import load_baselines, render, save_baselines
+    from core.database import async_database_url, async_engine, engine
+
+    profile = PROFILES[args.profile]
+    spec = DatasetSpec(users=profile["users"], commitments=profile["commitments"], sales=profile["sales"], seed=args.seed)
+    backend = async_database_url.get_backend_name()
+    key = f"{args.profile}/{backend}"
+
+    started = time.perf_counter()
+    dataset = await load(spec)
+    print(f"Loaded {spec.commitments} commitments and {spec.sales} sales for {spec.users} users "
+          f"in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    results = []
+    if "micro" in args.suites:
+        results += micro.model_benchmarks(spec.now)
+        results += micro.schema_benchmarks(spec.now)
+        results += micro.service_benchmarks(spec.now)
+    if "db" in args.suites:
+        results += await micro.database_benchmarks(dataset)
+    if "http" in args.suites:
+        results += await http_load.run(dataset, profile["duration"], profile["concurrency"], url=args.url)
+    if "db" in args.suites:
+        # Last: it writes rows the read benchmarks should not see
+        results += await micro.ingest_benchmark(dataset)
+    await async_engine.dispose()
+    engine.dispose()
+
+    baselines = load_baselines(key)
+    header = [
+        f"profile {args.profile}: {spec.users} users, {spec.commitments} commitments, {spec.sales} sales, seed {spec.seed}",
+        f"database {backend}" + (f", server {args.url}" if args.url else ""),
+        f"baselines {key}" + ("" if baselines else " (none recorded)"),
+    ]
+    report, regressions = render(results, baselines, args.threshold, header)
+    with open(args.output, "w") as handle:
+        handle.write(report)
+    print(report)
+    if args.update_baselines:
+        save_baselines(key, results)
+        print(f"Baselines for {key} updated", file=sys.stderr)
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="quick")
+    parser.add_argument("--database-url", help="defaults to a scratch SQLite file")
+    parser.add_argument("--url", help="load-test a running server instead of the in-process app")
+    parser.add_argument("--suites", default=",".join(SUITES), help="comma-separated subset of " + ", ".join(SUITES))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="bench_output.txt")
+    parser.add_argument("--threshold", type=float, default=0.25, help="relative slowdown reported as a regression")
+    parser.add_argument("--update-baselines", action="store_true")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+    args.suites = {suite.strip() for suite in args.suites.split(",") if suite.strip()}
+    unknown = args.suites - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suites: {', '.join(sorted(unknown))}")
+
+    with tempfile.TemporaryDirectory() as scratch:
+        os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(scratch, 'bench.db')}"
+        os.environ.pop("ASYNC_DATABASE_URL", None)
+        os.environ["DEBUG"] = "false"
+        return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
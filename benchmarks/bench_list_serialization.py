@@ -0,0 +1,112 @@
+"""
+Benchmark: commitment list serialization, ORM + Pydantic vs column rows + orjson.
+
+Seeds one owner's commitments into a temporary SQLite database and times
+building the JSON body of a list page both ways, query included:
+
+  orm:     SELECT whole rows -> Commitment objects -> CommitmentListResponse
+           per row (is_overdue in Python) -> model_dump -> json.dumps,
+           i.e. what FastAPI does with a response_model
+  columns: SELECT the list columns with is_overdue computed in SQL ->
+           dicts -> orjson, i.e. what GET /api/commitments does now
+
+Both bodies are checked to decode to the same items.
+
+    python -m benchmarks.bench_list_serialization [--rows 5000] [--runs 20]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    scratch = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+    # Settings are read at import time, so point them at the scratch database first
+    os.environ["DATABASE_URL"] = f"sqlite:///{scratch.name}"
+    os.environ["DEBUG"] = "false"
+
+    from fastapi.responses import ORJSONResponse
+    from sqlalchemy import insert, select
+
+    from services.listing import COMMITMENT_LIST_FIELDS, as_dicts, commitment_list_columns
+    from core.database import AsyncSessionLocal, close_db, engine, init_db
+    from models.commitment import Commitment, CommitmentStatus, CommitmentType
+    from models.user import User
+    from schemas.commitment import CommitmentListResponse, CommitmentPage
+
+    init_db()
+    now = datetime.utcnow()
+    statuses, types = list(CommitmentStatus), list(CommitmentType)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": 1, "email": "owner@example.com", "username": "owner", "hashed_password": "x"}])
+        conn.execute(insert(Commitment), [
+            {
+                "owner_id": 1,
+                "action": f"Send invoice #{n} to the customer",
+                "description": "Lorem ipsum " * 20,
+                "commitment_type": types[n % len(types)],
+                "status": statuses[n % len(statuses)],
+                "deadline": now + timedelta(hours=n - args.rows // 2),
+                "party_name": f"Customer {n % 97}",
+                "party_email": f"customer{n % 97}@example.com",
+                "auto_drafted": False,
+                "reminder_sent": False,
+                "escalated": False,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for n in range(args.rows)
+        ])
+
+    async def orm_path(db) -> bytes:
+        query = select(Commitment).where(Commitment.owner_id == 1).order_by(Commitment.deadline, Commitment.id)
+        rows = (await db.scalars(query.limit(args.rows))).all()
+        page = CommitmentPage(items=[CommitmentListResponse.model_validate(row) for row in rows])
+        body = json.dumps(page.model_dump(mode="json"), ensure_ascii=False, separators=(",", ":")).encode()
+        db.expunge_all()
+        return body
+
+    async def column_path(db) -> bytes:
+        query = select(*commitment_list_columns()).where(Commitment.owner_id == 1).order_by(Commitment.deadline, Commitment.id)
+        rows = (await db.execute(query.limit(args.rows))).all()
+        return ORJSONResponse({"items": as_dicts(COMMITMENT_LIST_FIELDS, rows), "next_cursor": None}).body
+
+    async def time_ms(path) -> float:
+        samples = []
+        async with AsyncSessionLocal() as db:
+            for _ in range(args.runs):
+                started = time.perf_counter()
+                await path(db)
+                samples.append((time.perf_counter() - started) * 1000)
+        return statistics.median(samples)
+
+    async def run():
+        async with AsyncSessionLocal() as db:
+            same = json.loads(await orm_path(db)) == json.loads(await column_path(db))
+        timings = {"orm": await time_ms(orm_path), "columns": await time_ms(column_path)}
+        await close_db()
+        return same, timings
+
+    same, timings = asyncio.run(run())
+    os.unlink(scratch.name)
+    print(f"rows: {args.rows}, median of {args.runs} runs, identical items: {same}")
+    for name, ms in timings.items():
+        print(f"  {name:8s} {ms:8.2f} ms")
+    print(f"  speedup  {timings['orm'] / timings['columns']:8.1f}x")
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
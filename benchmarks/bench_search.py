@@ -0,0 +1,117 @@
+"""
+Benchmark: full-text search latency.
+
+Loads seeded synthetic commitments spread over many owners into a
+scratch database and reports p50 / p95 latency of services.search.search().
+The target is p95 under 50 ms at 1M rows. By default a temporary SQLite
+file is used (FTS5 path). Pass --database-url with an empty Postgres
+database to measure the tsvector / GIN path. The tables are created
+there and filled.
+
+    python -m benchmarks.bench_search [--rows 1000000] [--owners 100] [--queries 200]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BUDGET_P95_MS = 50.0
+COMMON_TERMS = ["invoice", "payment", "delivery", "reorder", "acme", "march", "april", "contract"]
+
+
+def vocabulary(rng: random.Random, size: int = 5000):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(4, 9))) for _ in range(size)]
+
+
+def synthetic_rows(rng: random.Random, words, count: int, owners: int, start: int):
+    now = datetime(2026, 1, 1)
+    for n in range(start, start + count):
+        terms = rng.sample(words, 4) + rng.sample(COMMON_TERMS, 1)
+        rng.shuffle(terms)
+        yield {
+            "owner_id": n % owners + 1,
+            "action": " ".join(terms[:3]).capitalize(),
+            "description": " ".join(terms[3:] + rng.sample(words, 6)),
+            "party_name": f"{rng.choice(words).capitalize()} Ltd",
+            "commitment_type": "OTHER",
+            "status": "PENDING",
+            "deadline": now + timedelta(hours=n % 5000),
+            "auto_drafted": False,
+            "reminder_sent": False,
+            "escalated": False,
+            "created_at": now,
+            "updated_at": now,
+        }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--owners", type=int, default=100)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args(argv)
+
+    scratch = None
+    if args.database_url is None:
+        scratch = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        args.database_url = f"sqlite:///{scratch.name}"
+    # Settings are read at import time, so point them at the scratch database first
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("DEBUG", "false")
+
+    from sqlalchemy import insert
+
+    from core.database import AsyncSessionLocal, close_db, engine, init_db
+    from models.commitment import Commitment
+    from models.user import User
+    from services.search import search
+
+    rng = random.Random(42)
+    words = vocabulary(rng)
+    init_db()
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": n, "email": f"owner{n}@example.com", "username": f"owner{n}", "hashed_password": "x"}
+            for n in range(1, args.owners + 1)
+        ])
+        for offset in range(0, args.rows, 50_000):
+            conn.execute(insert(Commitment), list(synthetic_rows(rng, words, min(50_000, args.rows - offset), args.owners, offset)))
+    print(f"loaded {args.rows} rows for {args.owners} owners in {time.perf_counter() - started:.1f} s")
+
+    queries = [
+        " ".join(rng.sample(COMMON_TERMS, rng.randint(1, 2)) + rng.sample(words, rng.randint(0, 1)))
+        for _ in range(args.queries)
+    ]
+
+    async def run():
+        samples = []
+        async with AsyncSessionLocal() as db:
+            for query in queries:
+                owner_id = rng.randint(1, args.owners)
+                t0 = time.perf_counter()
+                await search(db, owner_id, query, limit=20)
+                samples.append((time.perf_counter() - t0) * 1000)
+        await close_db()
+        return samples
+
+    samples = asyncio.run(run())
+    samples.sort()
+    p50 = statistics.median(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"queries: {len(samples)}  p50 {p50:.2f} ms  p95 {p95:.2f} ms  (budget p95 {BUDGET_P95_MS:.0f} ms)")
+    if scratch is not None:
+        os.unlink(scratch.name)
+    return 0 if p95 <= BUDGET_P95_MS else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+"""
+Seeded synthetic datasets: users, commitments and sales.
+
+Tenant sizes follow a Zipf-like curve, so a few owners hold most of the
+rows, as in a real SaaS tenant mix. Deadlines mix a long overdue tail, a
+cluster in the coming two weeks and month-end invoice spikes. Statuses and
+amounts are drawn from fixed weights. The same seed always yields the
+same rows, placed relative to the current hour.
+
+Import this after DATABASE_URL points at the target database (the suite
+runner does that).
+"""
+
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List
+
+import bcrypt
+from sqlalchemy import insert
+
+from core.database import AsyncSessionLocal, engine, init_db
+from models.commitment import Commitment, CommitmentStatus, CommitmentType
+from models.sales import Sales, SalesStatus
+from models.user import User
+from services.dashboard_stats import rebuild_counters
+
+# Every generated user logs in with this; hashed at the lowest bcrypt cost to keep seeding fast
+PASSWORD = "benchmark-password"
+
+CHUNK_SIZE = 10_000
+
+COMPANIES = [
+    "Acme", "Globex", "Initech", "Umbrella", "Hooli", "Vandelay", "Stark", "Wayne", "Tyrell", "Soylent",
+    "Cyberdyne", "Wonka", "Gringotts", "Oscorp", "Pied Piper", "Aperture", "Monarch", "Dunder Mifflin",
+]
+SUFFIXES = ["Ltd", "GmbH", "Inc", "LLC", "& Sons", "Trading", "Logistics", "Foods"]
+TOPICS = ["the March invoice", "pallet delivery", "contract renewal", "sample order", "price list", "quarterly review"]
+PRODUCTS = ["Annual license", "Bulk order", "Support plan", "Pilot project", "Hardware refresh", "Consulting days"]
+
+COMMITMENT_TEMPLATES = {
+    CommitmentType.INVOICE: "Send invoice for {topic} to {party}",
+    CommitmentType.REORDER: "Reorder stock from {party}",
+    CommitmentType.PAYMENT: "Pay {party} for {topic}",
+    CommitmentType.FOLLOWUP: "Follow up with {party} about {topic}",
+    CommitmentType.DELIVERY: "Deliver {topic} to {party}",
+    CommitmentType.REMINDER: "Remind {party} about {topic}",
+    CommitmentType.OTHER: "Call {party} regarding {topic}",
+}
+TYPE_WEIGHTS = [0.22, 0.1, 0.15, 0.25, 0.12, 0.08, 0.08]
+OPEN_STATUS_WEIGHTS = [0.8, 0.2]  # pending, in_progress
+SALES_STATUS_WEIGHTS = [0.35, 0.2, 0.1, 0.15, 0.15, 0.05]
+CURRENCIES = ["USD", "EUR", "GBP"]
+CURRENCY_WEIGHTS = [0.6, 0.3, 0.1]
+
+
+@dataclass
+class DatasetSpec:
+    """Size and shape of a generated dataset"""
+    users: int = 200
+    commitments: int = 200_000
+    sales: int = 50_000
+    seed: int = 42
+    skew: float = 1.1  # Zipf exponent of tenant sizes
+    # Deadlines are placed relative to this, so overdue sweeps and forecasts behave as in production
+    now: datetime = field(default_factory=lambda: datetime.utcnow().replace(minute=0, second=0, microsecond=0))
+
+
+@dataclass
+class Dataset:
+    """What load() wrote, for picking realistic request targets"""
+    spec: DatasetSpec
+    commitments_per_user: Dict[int, int]
+    sales_per_user: Dict[int, int]
+
+    @property
+    def user_ids(self) -> List[int]:
+        return sorted(self.commitments_per_user)
+
+    def pick_user(self, rng: random.Random) -> int:
+        """A user id, weighted by tenant size like real traffic"""
+        ids = self.user_ids
+        return rng.choices(ids, weights=[self.commitments_per_user[i] + 1 for i in ids])[0]
+
+
+def tenant_sizes(total: int, users: int, skew: float) -> List[int]:
+    """Split total rows over users with Zipf-like weights (largest first)"""
+    weights = [1 / (rank ** skew) for rank in range(1, users + 1)]
+    scale = total / sum(weights)
+    sizes = [int(weight * scale) for weight in weights]
+    sizes[0] += total - sum(sizes)
+    return sizes
+
+
+def _party(rng: random.Random) -> str:
+    return f"{rng.choice(COMPANIES)} {rng.choice(SUFFIXES)}"
+
+
+def _deadline(rng: random.Random, now: datetime) -> datetime:
+    roll = rng.random()
+    if roll < 0.2:  # overdue tail
+        return now - timedelta(days=rng.expovariate(1 / 20), hours=rng.randint(0, 23))
+    if roll < 0.7:  # the next two weeks
+        return now + timedelta(days=rng.uniform(0, 14))
+    if roll < 0.85:  # month-end spikes (invoices, payments)
+        month = now.month + rng.randint(0, 3)  # the deadline's month, 1-based, may run past 12
+        next_month_start = datetime(now.year + month // 12, month % 12 + 1, 1)
+        return next_month_start - timedelta(hours=rng.randint(1, 48))
+    return now + timedelta(days=rng.uniform(14, 365))
+
+
+def commitment_rows(rng: random.Random, owner_id: int, count: int, now: datetime) -> Iterator[Dict[str, Any]]:
+    types = list(CommitmentType)
+    for n in range(count):
+        commitment_type = rng.choices(types, TYPE_WEIGHTS)[0]
+        party = _party(rng)
+        deadline = _deadline(rng, now)
+        created_at = min(deadline, now) - timedelta(days=rng.uniform(0, 30))
+        if deadline < now:
+            status = rng.choices(
+                [CommitmentStatus.COMPLETED, CommitmentStatus.OVERDUE, CommitmentStatus.CANCELLED], [0.6, 0.3, 0.1]
+            )[0]
+        else:
+            status = rng.choices([CommitmentStatus.PENDING, CommitmentStatus.IN_PROGRESS], OPEN_STATUS_WEIGHTS)[0]
+        yield {
+            "owner_id": owner_id,
+            "action": COMMITMENT_TEMPLATES[commitment_type].format(topic=rng.choice(TOPICS), party=party),
+            "description": f"Agreed with {party} on {created_at:%d %b}." if rng.random() < 0.5 else None,
+            "commitment_type": commitment_type,
+            "deadline": deadline,
+            "status": status,
+            "party_name": party,
+            "party_email": f"contact{rng.randint(1, 500)}@{party.split()[0].lower()}.example",
+            "source": rng.choice(["email", "telegram", "manual"]),
+            "source_message_id": f"bench-{owner_id}-{n}",
+            "auto_drafted": False,
+            "reminder_sent": deadline < now + timedelta(days=1),
+            "escalated": status == CommitmentStatus.OVERDUE and rng.random() < 0.5,
+            "created_at": created_at,
+            "updated_at": created_at,
+            "completed_at": deadline if status == CommitmentStatus.COMPLETED else None,
+        }
+
+
+def sales_rows(rng: random.Random, owner_id: int, count: int, now: datetime) -> Iterator[Dict[str, Any]]:
+    statuses = list(SalesStatus)
+    for _ in range(count):
+        customer = _party(rng)
+        updated_at = now - timedelta(days=rng.uniform(0, 365))
+        yield {
+            "owner_id": owner_id,
+            "customer_name": customer,
+            "customer_email": f"buyer@{customer.split()[0].lower()}.example",
+            "title": f"{rng.choice(PRODUCTS)} for {customer}",
+            "description": None,
+            "amount": round(rng.lognormvariate(8, 1.2), 2) if rng.random() > 0.02 else None,
+            "currency": rng.choices(CURRENCIES, CURRENCY_WEIGHTS)[0],
+            "status": rng.choices(statuses, SALES_STATUS_WEIGHTS)[0],
+            "expected_close_date": now + timedelta(days=rng.gauss(60, 90)) if rng.random() > 0.05 else None,
+            "created_at": updated_at - timedelta(days=rng.uniform(0, 60)),
+            "updated_at": updated_at,
+        }
+
+
+def _insert_chunked(conn, table, rows: Iterator[Dict[str, Any]]):
+    chunk: List[Dict[str, Any]] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK_SIZE:
+            conn.execute(insert(table), chunk)
+            chunk = []
+    if chunk:
+        conn.execute(insert(table), chunk)
+
+
+async def load(spec: DatasetSpec) -> Dataset:
+    """Create the tables, write the dataset and rebuild the dashboard counters"""
+    rng = random.Random(spec.seed)
+    init_db()
+    hashed = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(4)).decode()
+    commitment_sizes = tenant_sizes(spec.commitments, spec.users, spec.skew)
+    # Sales volume follows the same tenants, with neighbours occasionally swapped
+    sales_sizes = tenant_sizes(spec.sales, spec.users, spec.skew * 0.9)
+    for rank in range(len(sales_sizes) - 1):
+        if rng.random() < 0.3:
+            sales_sizes[rank], sales_sizes[rank + 1] = sales_sizes[rank + 1], sales_sizes[rank]
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {
+                "id": user_id,
+                "email": f"owner{user_id}@bench.example",
+                "username": f"owner{user_id}",
+                "hashed_password": hashed,
+                "company_name": _party(rng),
+                "is_active": True,
+            }
+            for user_id in range(1, spec.users + 1)
+        ])
+        for user_id, size in enumerate(commitment_sizes, start=1):
+            _insert_chunked(conn, Commitment.__table__, commitment_rows(rng, user_id, size, spec.now))
+        for user_id, size in enumerate(sales_sizes, start=1):
+            _insert_chunked(conn, Sales.__table__, sales_rows(rng, user_id, size, spec.now))
+    async with AsyncSessionLocal() as db:
+        await rebuild_counters(db)
+    return Dataset(
+        spec=spec,
+        commitments_per_user=dict(enumerate(commitment_sizes, start=1)),
+        sales_per_user=dict(enumerate(sales_sizes, start=1)),
+    )
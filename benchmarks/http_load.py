@@ -0,0 +1,151 @@
+"""
+HTTP load test with a weighted mix of dashboard traffic.
+
+Runs in-process through ASGITransport by default, which measures the app
+and database without network noise, or against a running server with
+--url. Each virtual user picks a tenant weighted by size and an operation
+from OPERATIONS. Tokens are minted locally, so the server must share
+SECRET_KEY with the runner.
+"""
+
+import asyncio
+import random
+import statistics
+import time
+from collections import defaultdict
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+import httpx
+from sqlalchemy import select
+
+from benchmarks.datagen import PASSWORD, Dataset
+from benchmarks.report import Result
+from core.database import AsyncSessionLocal
+from core.security import create_access_token
+from models.commitment import Commitment
+from models.user import User
+
+# operation -> relative weight, roughly what a busy dashboard fleet sends
+OPERATIONS = {
+    "list_commitments": 30,
+    "dashboard_summary": 20,
+    "search": 15,
+    "list_sales": 10,
+    "sales_forecast": 5,
+    "update_commitment": 10,
+    "create_commitment": 8,
+    "login": 2,
+}
+SEARCH_TERMS = ["invoice", "delivery", "renewal", "acme", "globex", "pallet", "follow", "payment", "hooli"]
+SAMPLE_IDS = 50  # commitment ids kept per tenant for updates
+
+
+class LoadContext:
+    """Tokens and sample rows per tenant, prepared before the clock starts"""
+
+    def __init__(self, dataset: Dataset):
+        self.dataset = dataset
+        self.tokens: Dict[int, str] = {}
+        self.usernames: Dict[int, str] = {}
+        self.commitment_ids: Dict[int, List[int]] = {}
+
+    async def prepare(self):
+        async with AsyncSessionLocal() as db:
+            for user in await db.scalars(select(User).where(User.id.in_(self.dataset.user_ids))):
+                self.tokens[user.id] = create_access_token(user, timedelta(hours=2))
+                self.usernames[user.id] = user.username
+            for owner_id in self.dataset.user_ids:
+                ids = await db.scalars(select(Commitment.id).where(Commitment.owner_id == owner_id).limit(SAMPLE_IDS))
+                self.commitment_ids[owner_id] = list(ids)
+
+
+async def _request(client: httpx.AsyncClient, context: LoadContext, operation: str, rng: random.Random) -> httpx.Response:
+    owner_id = context.dataset.pick_user(rng)
+    headers = {"Authorization": f"Bearer {context.tokens[owner_id]}"}
+    if operation == "list_commitments":
+        params = {"limit": 50}
+        if rng.random() < 0.3:
+            params["status"] = "pending"
+        return await client.get("/api/commitments", params=params, headers=headers)
+    if operation == "dashboard_summary":
+        return await client.get("/api/dashboard/summary", headers=headers)
+    if operation == "search":
+        query = " ".join(rng.sample(SEARCH_TERMS, rng.randint(1, 2)))
+        return await client.get("/api/search", params={"q": query}, headers=headers)
+    if operation == "list_sales":
+        return await client.get("/api/sales", params={"limit": 50}, headers=headers)
+    if operation == "sales_forecast":
+        return await client.get("/api/sales/forecast", headers=headers)
+    if operation == "update_commitment":
+        ids = context.commitment_ids[owner_id]
+        if not ids:
+            return await client.get("/api/dashboard/summary", headers=headers)
+        status = rng.choice(["pending", "in_progress", "completed"])
+        return await client.patch(f"/api/commitments/{rng.choice(ids)}", json={"status": status}, headers=headers)
+    if operation == "create_commitment":
+        payload = {
+            "action": f"Follow up with {rng.choice(SEARCH_TERMS).title()} Ltd",
+            "commitment_type": "followup",
+            "deadline": (context.dataset.spec.now + timedelta(days=rng.randint(1, 30))).isoformat(),
+            "source": "bench",
+        }
+        return await client.post("/api/commitments", json=payload, headers=headers)
+    if operation == "login":
+        form = {"username": context.usernames[owner_id], "password": PASSWORD}
+        return await client.post("/api/auth/login", data=form)
+    raise ValueError(f"Unknown operation {operation}")
+
+
+async def run(dataset: Dataset, duration: float, concurrency: int, url: Optional[str] = None, seed: int = 7) -> List[Result]:
+    """Drive the operation mix for duration seconds; latency percentiles per operation and overall throughput"""
+    context = LoadContext(dataset)
+    await context.prepare()
+    operations, weights = zip(*OPERATIONS.items())
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors = 0
+
+    if url:
+        transport = httpx.AsyncHTTPTransport(limits=httpx.Limits(max_connections=concurrency))
+        base_url = url
+    else:
+        from main import app  # imported late: the runner points DATABASE_URL at the benchmark database first
+        transport = httpx.ASGITransport(app=app)
+        base_url = "http://bench"
+
+    async def worker(index: int, deadline: float):
+        nonlocal errors
+        rng = random.Random(seed + index)
+        while time.perf_counter() < deadline:
+            operation = rng.choices(operations, weights)[0]
+            started = time.perf_counter()
+            try:
+                response = await _request(client, context, operation, rng)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            latencies[operation].append(time.perf_counter() - started)
+            errors += failed
+
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=30) as client:
+        # A short warm-up so connection pools and caches are filled before measuring
+        await asyncio.gather(*(worker(index, time.perf_counter() + min(1.0, duration / 10)) for index in range(concurrency)))
+        latencies.clear()
+        errors = 0
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(index, started + duration) for index in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    total = sum(len(samples) for samples in latencies.values())
+    results = [
+        Result("http.throughput", total / elapsed, "req/s", higher_is_better=True),
+        Result("http.errors", errors, "count"),
+    ]
+    for operation in operations:
+        samples = sorted(latencies.get(operation, []))
+        if len(samples) < 2:
+            continue
+        quantiles = statistics.quantiles(samples, n=100)
+        results.append(Result(f"http.{operation}.p50", quantiles[49] * 1e3, "ms"))
+        results.append(Result(f"http.{operation}.p95", quantiles[94] * 1e3, "ms"))
+    return results
@@ -0,0 +1,159 @@
+"""
+Micro-benchmarks for models, schemas and services.
+
+CPU-only benchmarks use synthetic rows from datagen. Database benchmarks
+run against the loaded dataset and target its largest tenant, where
+regressions show first. bulk_ingest writes to a spare owner and runs last.
+"""
+
+import random
+import statistics
+import time
+from itertools import cycle
+from datetime import datetime
+from typing import Awaitable, Callable, List
+
+import orjson
+from sqlalchemy import insert, select
+
+from benchmarks.bench_sales_forecast import synthetic_columns
+from benchmarks.datagen import Dataset, commitment_rows, sales_rows
+from benchmarks.report import Result
+from core.database import AsyncSessionLocal, engine
+from models.commitment import Commitment
+from models.user import User
+from schemas.commitment import CommitmentCreate, CommitmentResponse
+from schemas.sales import SalesCreate
+from services import bulk_ingest
+from services.ai_engine import parse_deadline, prefilter
+from services.dashboard_stats import get_counters, rebuild_counters, summarize
+from services.listing import COMMITMENT_LIST_FIELDS, as_dicts, commitment_list_columns
+from services.sales_logic import deal_arrays, forecast, forecast_sales
+from services.search import search
+
+MESSAGES = [
+    "I'll send the invoice to Acme by Friday",
+    "We will deliver the pallets in 2 weeks, promise",
+    "Can you pay the Globex balance by 2026-03-01?",
+    "Thanks for lunch yesterday!",
+    "Let me follow up with Initech next week about the renewal",
+    "Reorder 40 boxes from Hooli before end of month",
+]
+
+
+def per_op(fn: Callable[[], object], number: int, repeat: int = 5) -> float:
+    """Best-of-repeat seconds per call (best filters out scheduler noise for CPU-bound code)"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - started) / number)
+    return best
+
+
+async def per_call(fn: Callable[[], Awaitable[object]], repeat: int) -> float:
+    """Median seconds per awaited call (median, since I/O timings are noisy both ways)"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def model_benchmarks(now: datetime) -> List[Result]:
+    rows = list(commitment_rows(random.Random(1), 1, 2000, now))
+    objects = [Commitment(id=n, **row) for n, row in enumerate(rows, start=1)]
+    construct = cycle(rows)
+    overdue = cycle(objects)
+    return [
+        Result("model.commitment_construct", per_op(lambda: Commitment(**next(construct)), 2000, 3) * 1e6, "us/op"),
+        Result("model.commitment_is_overdue", per_op(lambda: next(overdue).is_overdue, 20000) * 1e6, "us/op"),
+    ]
+
+
+def schema_benchmarks(now: datetime) -> List[Result]:
+    rng = random.Random(2)
+    payloads = [
+        {**row, "commitment_type": row["commitment_type"].value, "deadline": row["deadline"].isoformat()}
+        for row in commitment_rows(rng, 1, 1000, now)
+    ]
+    for payload in payloads:
+        for key in ("owner_id", "status", "auto_drafted", "reminder_sent", "escalated", "created_at", "updated_at", "completed_at"):
+            payload.pop(key)
+    sales = [
+        {**row, "status": row["status"].value, "expected_close_date": None}
+        for row in sales_rows(rng, 1, 1000, now)
+    ]
+    objects = [
+        Commitment(id=n, draft_content=None, **row) for n, row in enumerate(commitment_rows(rng, 1, 1000, now), start=1)
+    ]
+    commitments, deals, responses = cycle(payloads), cycle(sales), cycle(objects)
+    return [
+        Result("schema.commitment_create", per_op(lambda: CommitmentCreate.model_validate(next(commitments)), 5000) * 1e6, "us/op"),
+        Result("schema.sales_create", per_op(lambda: SalesCreate.model_validate(next(deals)), 5000) * 1e6, "us/op"),
+        Result("schema.commitment_response_orm", per_op(lambda: CommitmentResponse.model_validate(next(responses)), 5000) * 1e6, "us/op"),
+    ]
+
+
+def service_benchmarks(now: datetime) -> List[Result]:
+    messages = cycle(MESSAGES)
+    columns = synthetic_columns(100_000, now)
+    deals = deal_arrays(*columns)
+    return [
+        Result("service.parse_deadline", per_op(lambda: parse_deadline(next(messages), now), 10000) * 1e6, "us/op"),
+        Result("service.prefilter", per_op(lambda: prefilter(next(messages), now), 10000) * 1e6, "us/op"),
+        Result("service.deal_arrays_100k", per_op(lambda: deal_arrays(*columns), 1, 5) * 1e3, "ms"),
+        Result("service.forecast_100k", per_op(lambda: forecast(deals, now=now, period="month", horizon=12), 1, 5) * 1e3, "ms"),
+    ]
+
+
+async def database_benchmarks(dataset: Dataset, repeat: int = 20) -> List[Result]:
+    owner_id = max(dataset.commitments_per_user, key=dataset.commitments_per_user.get)
+    rng = random.Random(3)
+    queries = cycle([f"{rng.choice(['invoice', 'delivery', 'follow', 'pay'])} {rng.choice(['acme', 'globex', 'hooli'])}" for _ in range(repeat)])
+    results = []
+    async with AsyncSessionLocal() as db:
+        async def hydrate():
+            await db.scalars(select(Commitment).where(Commitment.owner_id == owner_id).limit(5000))
+            db.expunge_all()
+
+        async def list_page():
+            rows = await db.execute(
+                select(*commitment_list_columns())
+                .where(Commitment.owner_id == owner_id)
+                .order_by(Commitment.deadline, Commitment.id)
+                .limit(500)
+            )
+            orjson.dumps({"items": as_dicts(COMMITMENT_LIST_FIELDS, rows)})
+
+        async def summary():
+            summarize(await get_counters(db, owner_id))
+
+        results += [
+            Result("db.orm_hydrate_5000", await per_call(hydrate, repeat) * 1e3, "ms"),
+            Result("db.list_page_500", await per_call(list_page, repeat) * 1e3, "ms"),
+            Result("db.search", await per_call(lambda: search(db, owner_id, next(queries)), repeat) * 1e3, "ms"),
+            Result("db.dashboard_summary", await per_call(summary, repeat) * 1e3, "ms"),
+            Result("db.forecast_sales", await per_call(lambda: forecast_sales(db, owner_id), repeat) * 1e3, "ms"),
+            Result("db.rebuild_counters", await per_call(lambda: rebuild_counters(db), 3) * 1e3, "ms"),
+        ]
+    return results
+
+
+async def ingest_benchmark(dataset: Dataset, rows: int = 5000) -> List[Result]:
+    """Bulk ingest throughput into a spare owner (writes, so run after the read benchmarks)"""
+    owner_id = max(dataset.user_ids) + 1
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": owner_id, "email": "ingest@bench.example", "username": "ingest", "hashed_password": "x"}])
+    records = [
+        {"action": row["action"], "deadline": row["deadline"].isoformat(), "commitment_type": row["commitment_type"].value,
+         "party_name": row["party_name"], "source": "bench", "source_message_id": f"ingest-{n}"}
+        for n, row in enumerate(commitment_rows(random.Random(4), owner_id, rows, dataset.spec.now))
+    ]
+    async with AsyncSessionLocal() as db:
+        started = time.perf_counter()
+        result = await bulk_ingest.ingest_records(db, bulk_ingest.COMMITMENTS, owner_id, records)
+        elapsed = time.perf_counter() - started
+    return [Result("db.bulk_ingest", result.inserted / elapsed, "rows/s", higher_is_better=True)]
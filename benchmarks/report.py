@@ -0,0 +1,90 @@
+"""
+Benchmark results, baselines and the bench_output.txt report.
+
+Baselines live in benchmarks/baselines.json, keyed by profile and database
+backend ("quick/sqlite", "full/postgresql", ...). They were recorded on
+one machine: after changing hardware, re-record them with
+--update-baselines before reading anything into the deltas.
+"""
+
+import json
+import math
+import os
+import platform
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+
+@dataclass
+class Result:
+    """One measured figure"""
+    name: str
+    value: float
+    unit: str
+    higher_is_better: bool = False
+
+    def change(self, baseline: Optional[float]) -> Optional[float]:
+        """Relative change against a baseline, positive meaning worse"""
+        if baseline is None:
+            return None
+        if baseline == 0:
+            return 0.0 if self.value == 0 else math.inf
+        change = (self.value - baseline) / baseline
+        return -change if self.higher_is_better else change
+
+
+def load_baselines(key: str) -> Dict[str, float]:
+    try:
+        with open(BASELINES_PATH) as handle:
+            return json.load(handle).get(key, {})
+    except FileNotFoundError:
+        return {}
+
+
+def save_baselines(key: str, results: Iterable[Result]):
+    try:
+        with open(BASELINES_PATH) as handle:
+            baselines = json.load(handle)
+    except FileNotFoundError:
+        baselines = {}
+    baselines[key] = {result.name: round(result.value, 4) for result in results}
+    with open(BASELINES_PATH, "w") as handle:
+        json.dump(baselines, handle, indent=2, sort_keys=True)
+        handle.write("\n")
+
+
+def render(results: List[Result], baselines: Dict[str, float], threshold: float, header: List[str]) -> Tuple[str, List[str]]:
+    """Plain-text table of results against baselines, and the names of regressed results"""
+    lines = [
+        f"Commit AI benchmarks  {datetime.utcnow():%Y-%m-%d %H:%M} UTC",
+        f"python {platform.python_version()} on {platform.machine()} ({os.cpu_count()} cpus)",
+        *header,
+        "",
+        f"{'benchmark':44s} {'value':>12s} {'unit':8s} {'baseline':>12s} {'change':>9s}",
+    ]
+    regressions = []
+    for result in results:
+        baseline = baselines.get(result.name)
+        change = result.change(baseline)
+        flag = ""
+        if change is not None and change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(result.name)
+        baseline_text = "-" if baseline is None else f"{baseline:12.3f}"
+        if change is None:
+            change_text = "new"
+        elif math.isinf(change):
+            change_text = "+inf"
+        else:
+            # Shown as "worse by", so +10% is always a slowdown whatever the unit
+            change_text = f"{change * 100:+.1f}%"
+        lines.append(f"{result.name:44s} {result.value:12.3f} {result.unit:8s} {baseline_text:>12s} {change_text:>9s}{flag}")
+    lines.append("")
+    if regressions:
+        lines.append(f"{len(regressions)} regression(s) beyond {threshold:.0%}: {', '.join(regressions)}")
+    else:
+        lines.append(f"No regressions beyond {threshold:.0%}")
+    return "\n".join(lines) + "\n", regressions
@@ -1,21 +1,197 @@
-from sqlalchemy import create_engine
+"""
+Engines, pools and sessions.
+
+Each workload gets its own pool on the primary, so a bulk backfill cannot
+starve interactive requests:
+
+- interactive: API requests (AsyncSessionLocal, get_async_db)
+- ingest: bulk endpoints, webhooks, Telegram and the ETL pipeline
+  (IngestSessionLocal, get_ingest_db)
+- background: schedulers, dispatchers and caches (BackgroundSessionLocal)
+
+Interactive sessions route reads. A session opened for a GET request
+sends plain SELECTs to a replica from DATABASE_REPLICA_URLS, one replica
+per session. Writes, SELECT ... FOR UPDATE and anything after the
+session's first write go to the primary. Owners who committed in the last
+READ_YOUR_WRITES_SECONDS are pinned to the primary, so they always see
+their own changes. Without replicas everything runs on the primary.
+"""
+
+import time
+from collections import OrderedDict
+from itertools import count
+from typing import AsyncGenerator, Generator, List, Optional
+
+import asyncpg
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url, Engine, URL
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base, Session
-from typing import Generator
+from sqlalchemy.sql.expression import CompoundSelect, Select, TextClause
 from core.config import get_settings
+from core.metrics import TimedAsyncQueuePool, TimedQueuePool, instrument_engine
 
 # Get settings
 settings = get_settings()
 
+# Async drivers used for each sync dialect
+ASYNC_DRIVERS = {
+    "postgresql": "asyncpg",
+    "sqlite": "aiosqlite",
+}
+
+# Request methods whose sessions may read from a replica
+READ_METHODS = {"GET", "HEAD"}
+
+# Session.info keys used for routing
+READ_REPLICA = "read_replica"  # True: plain reads may go to a replica
+USER_ID = "user_id"  # set by authentication; pinned users read from the primary
+_WROTE = "wrote_primary"
+_REPLICA = "replica"
+
+
+def get_async_url(url: str) -> URL:
+    """Map a sync database URL onto its async driver (asyncpg / aiosqlite)"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    driver = ASYNC_DRIVERS.get(backend)
+    if driver is None:
+        raise ValueError(f"No async driver configured for '{backend}' databases")
+    return parsed.set(drivername=f"{backend}+{driver}")
+
+
+def engine_options(url: URL, pool_size: int = settings.DB_POOL_SIZE, max_overflow: int = settings.DB_MAX_OVERFLOW) -> dict:
+    """Pool options from settings; SQLite picks its own pool class"""
+    if url.get_backend_name() == "sqlite":
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "poolclass": TimedAsyncQueuePool if url.get_dialect().is_async else TimedQueuePool,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+
+
+def make_async_engine(
+    url: URL,
+    name: str,
+    pool_size: int = settings.DB_POOL_SIZE,
+    max_overflow: int = settings.DB_MAX_OVERFLOW,
+) -> AsyncEngine:
+    """An instrumented async engine with its own pool, labelled name in /metrics"""
+    if url.get_backend_name() == "postgresql":
+        url = url.update_query_dict({"prepared_statement_cache_size": str(settings.DB_STATEMENT_CACHE_SIZE)})
+    created = create_async_engine(
+        url,
+        echo=settings.SQL_ECHO,
+        pool_logging_name=name,
+        **engine_options(url, pool_size, max_overflow),
+    )
+    instrument_engine(created.sync_engine, name)
+    return created
+
+
 # Create database engine
+database_url = make_url(settings.DATABASE_URL)
 engine = create_engine(
-    settings.DATABASE_URL,
-    echo=settings.DEBUG,
-    pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20,
+    database_url,
+    echo=settings.SQL_ECHO,
+    pool_logging_name="sync",
+    **engine_options(database_url),
 )
+instrument_engine(engine, "sync")
+
+# Create async database engines: one pool per workload on the primary, one per replica
+async_database_url = (
+    make_url(settings.ASYNC_DATABASE_URL)
+    if settings.ASYNC_DATABASE_URL
+    else get_async_url(settings.DATABASE_URL)
+)
+async_engine = make_async_engine(async_database_url, "interactive")
+ingest_engine = make_async_engine(
+    async_database_url, "ingest", settings.DB_INGEST_POOL_SIZE, settings.DB_INGEST_MAX_OVERFLOW
+)
+background_engine = make_async_engine(
+    async_database_url, "background", settings.DB_BACKGROUND_POOL_SIZE, settings.DB_BACKGROUND_MAX_OVERFLOW
+)
+replica_engines: List[AsyncEngine] = [
+    make_async_engine(get_async_url(url), f"replica{index}")
+    for index, url in enumerate(settings.DATABASE_REPLICA_URLS)
+]
+
+
+class ReadYourWrites:
+    """Owners who committed recently: their sessions read from the primary until the pin expires"""
+
+    def __init__(self, seconds: float = settings.READ_YOUR_WRITES_SECONDS, max_entries: int = 100_000):
+        self.seconds = seconds
+        self.max_entries = max_entries
+        self._until: OrderedDict = OrderedDict()
+
+    def pin(self, owner_id: int):
+        self._until.pop(owner_id, None)
+        self._until[owner_id] = time.monotonic() + self.seconds
+        while len(self._until) > self.max_entries:
+            self._until.popitem(last=False)
+
+    def pinned(self, owner_id: Optional[int]) -> bool:
+        until = self._until.get(owner_id)
+        if until is None:
+            return False
+        if until < time.monotonic():
+            self._until.pop(owner_id, None)
+            return False
+        return True
+
+
+read_your_writes = ReadYourWrites()
+_next_replica = count()
+
+
+def _is_plain_read(clause) -> bool:
+    if isinstance(clause, (Select, CompoundSelect)):
+        return getattr(clause, "_for_update_arg", None) is None
+    if isinstance(clause, TextClause):
+        return clause.text.lstrip()[:6].upper() == "SELECT"
+    return False
+
+
+class RoutingSession(Session):
+    """Sends a GET request's plain reads to a replica and everything else to the primary"""
 
-# Create session factory
+    def get_bind(self, mapper=None, clause=None, **kw) -> Engine:
+        info = self.info
+        if (
+            info.get(READ_REPLICA)
+            and replica_engines
+            and not self._flushing
+            and not info.get(_WROTE)
+            and _is_plain_read(clause)
+            and not read_your_writes.pinned(info.get(USER_ID))
+        ):
+            # One replica per session, so all of its reads see the same snapshot
+            if _REPLICA not in info:
+                info[_REPLICA] = replica_engines[next(_next_replica) % len(replica_engines)].sync_engine
+            return info[_REPLICA]
+        if self._flushing or (clause is not None and not _is_plain_read(clause)):
+            # From here on this session reads its own writes
+            info[_WROTE] = True
+        return super().get_bind(mapper, clause=clause, **kw)
+
+
+def _pin_writer(session: Session):
+    if session.info.pop(_WROTE, False) and session.info.get(USER_ID) is not None:
+        read_your_writes.pin(session.info[USER_ID])
+
+
+event.listen(RoutingSession, "after_commit", _pin_writer)
+
+# Create session factories
 SessionLocal = sessionmaker(
     bind=engine,
     autocommit=False,
@@ -23,10 +199,46 @@ SessionLocal = sessionmaker(
     expire_on_commit=False,
 )
 
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    sync_session_class=RoutingSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+IngestSessionLocal = async_sessionmaker(
+    bind=ingest_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+BackgroundSessionLocal = async_sessionmaker(
+    bind=background_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
 # Base class for all models
 Base = declarative_base()
 
 
+# What a write can raise for bad row data. COPY goes to asyncpg directly, so its
+# errors are not wrapped in DBAPIError; client-side encoding errors are InterfaceErrors.
+WRITE_ERRORS = (DBAPIError, asyncpg.PostgresError, asyncpg.InterfaceError)
+
+
+def dialect_insert(dialect_name: str):
+    """INSERT construct with ON CONFLICT support for the given dialect"""
+    if dialect_name == "postgresql":
+        return postgresql.insert
+    if dialect_name == "sqlite":
+        return sqlite.insert
+    raise NotImplementedError(f"ON CONFLICT inserts are not supported on '{dialect_name}'")
+
+
 def get_db() -> Generator[Session, None, None]:
     """Dependency to get database session"""
     db = SessionLocal()
@@ -36,6 +248,26 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
+async def get_async_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """Dependency to get an interactive async database session (replica reads for GET requests)"""
+    async with AsyncSessionLocal(info={READ_REPLICA: request.method in READ_METHODS}) as db:
+        yield db
+
+
+async def get_ingest_db() -> AsyncGenerator[AsyncSession, None]:
+    """Dependency to get an async session from the ingest pool"""
+    async with IngestSessionLocal() as db:
+        yield db
+
+
 def init_db():
     """Initialize database - create all tables"""
+    import models.user, models.contact, models.commitment, models.sales, models.extraction_cache, models.mailbox, models.telegram, models.dashboard, models.search  # noqa: F401 - register tables
     Base.metadata.create_all(bind=engine)
+
+
+async def close_db():
+    """Release pooled connections held by all engines"""
+    for pooled in (async_engine, ingest_engine, background_engine, *replica_engines):
+        await pooled.dispose()
+    engine.dispose()
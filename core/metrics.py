@@ -0,0 +1,375 @@
+"""
+Request and SQL instrumentation, exposed as Prometheus text on /metrics.
+
+MetricsMiddleware times every HTTP request per route. For the duration of a
+request it also holds a RequestStats in a context variable. The SQLAlchemy
+cursor hooks installed by instrument_engine() add each statement to it, so
+statements issued from the event loop, from greenlets (async engine) and
+from threadpool endpoints all land on the request that issued them. From
+that we get:
+
+- statements and SQL time per request, per route
+- N+1 detection: the same statement run N_PLUS_ONE_THRESHOLD times in one
+  request is logged once and counted
+- a slow-query log for statements slower than SLOW_QUERY_SECONDS
+  (statement text only, never parameters)
+
+Pool metrics cover checkout wait and hold time, and the current size,
+checked-out and overflow counts of each engine's pool. Everything lives in
+process memory; with several workers, scrape each one (or use a single
+worker per container).
+"""
+
+import logging
+import re
+import threading
+import time
+from collections import Counter as TallyCounter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "COPY", "BEGIN", "COMMIT", "ROLLBACK"}
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """A named family of samples; render() yields exposition lines"""
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        yield from self.samples()
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            yield f"{self.name}{_labels(self.labels, label_values)} {_number(value)}"
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts..., +Inf count], sum
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *label_values: str):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = ([0] * (len(self.buckets) + 1), [0.0])
+            counts, total = series
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            else:
+                counts[-1] += 1
+            total[0] += value
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            series = sorted((labels, (list(counts), total[0])) for labels, (counts, total) in self._series.items())
+        bounds = [f'le="{_number(bound)}"' for bound in self.buckets] + ['le="+Inf"']
+        for label_values, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(self.labels, label_values, bound)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labels, label_values)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labels, label_values)} {cumulative}"
+
+
+class Collected(Metric):
+    """Gauge or counter read from elsewhere at scrape time"""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str],
+        collect: Callable[[], Iterable[Tuple[LabelValues, float]]],
+        kind: str = "gauge",
+    ):
+        super().__init__(name, documentation, labels)
+        self.collect = collect
+        self.kind = kind
+
+    def samples(self) -> Iterator[str]:
+        for label_values, value in sorted(self.collect()):
+            yield f"{self.name}{_labels(self.labels, label_values)} {_number(value)}"
+
+
+class Registry:
+    """All metrics of this process, rendered in registration order"""
+
+    def __init__(self):
+        self.metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, documentation: str, read: Callable[[], float]):
+        """An unlabelled gauge read at scrape time"""
+        self.register(Collected(name, documentation, (), lambda: [((), read())]))
+
+    def tally(self, name: str, documentation: str, label: str, read: Callable[[], Mapping[str, float]]):
+        """A counter family from a stats Counter (auth cache, change broker, ...), one sample per key"""
+        self.register(Collected(name, documentation, (label,), lambda: [((key,), value) for key, value in read().items()], "counter"))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception:
+                logger.exception("Collecting metric %s failed", metric.name)
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HTTP_LATENCY: Histogram = registry.register(Histogram(
+    "http_request_duration_seconds", "Time to serve a request", ("method", "route", "status"),
+))
+REQUEST_STATEMENTS: Histogram = registry.register(Histogram(
+    "http_request_sql_statements", "SQL statements executed per request", ("method", "route"), STATEMENT_BUCKETS,
+))
+REQUEST_SQL_SECONDS: Histogram = registry.register(Histogram(
+    "http_request_sql_duration_seconds", "Time spent in SQL per request", ("method", "route"),
+))
+N_PLUS_ONE: Counter = registry.register(Counter(
+    "http_request_n_plus_one_total", "Statements repeated N_PLUS_ONE_THRESHOLD times within one request", ("method", "route"),
+))
+SQL_LATENCY: Histogram = registry.register(Histogram(
+    "sql_statement_duration_seconds", "SQL statement execution time", ("operation",),
+))
+SQL_SLOW: Counter = registry.register(Counter(
+    "sql_slow_statements_total", "SQL statements slower than SLOW_QUERY_SECONDS", ("operation",),
+))
+SQL_ERRORS: Counter = registry.register(Counter(
+    "sql_statement_errors_total", "SQL statements that raised", ("operation",),
+))
+POOL_WAIT: Histogram = registry.register(Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection", ("pool",),
+))
+POOL_HOLD: Histogram = registry.register(Histogram(
+    "db_pool_connection_hold_seconds", "Time a connection stays checked out", ("pool",),
+))
+
+
+@dataclass
+class RequestStats:
+    """SQL activity of the request being served"""
+    scope: dict
+    statements: int = 0
+    sql_seconds: float = 0.0
+    repeats: TallyCounter = field(default_factory=TallyCounter)
+
+    @property
+    def route(self) -> str:
+        return _route(self.scope)
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+_OPERATION = re.compile(r"\s*(\w+)")
+
+
+def _operation(statement: str) -> str:
+    match = _OPERATION.match(statement)
+    operation = match.group(1).upper() if match else ""
+    return operation if operation in OPERATIONS else "OTHER"
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    operation = _operation(statement)
+    SQL_LATENCY.observe(elapsed, operation)
+    stats = _request_stats.get()
+    if elapsed >= settings.SLOW_QUERY_SECONDS:
+        SQL_SLOW.inc(operation)
+        logger.warning(
+            "slow_query duration=%.3f route=%s statement=%s",
+            elapsed, stats.route if stats else "-", " ".join(statement.split())[:1000],
+        )
+    if stats is None:
+        return
+    stats.statements += 1
+    stats.sql_seconds += elapsed
+    stats.repeats[statement] += 1
+    if stats.repeats[statement] == settings.N_PLUS_ONE_THRESHOLD:
+        N_PLUS_ONE.inc(stats.scope["method"], stats.route)
+        logger.warning(
+            "n_plus_one method=%s route=%s repeats=%d statement=%s",
+            stats.scope["method"], stats.route, settings.N_PLUS_ONE_THRESHOLD, " ".join(statement.split())[:1000],
+        )
+
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_started"):
+        conn.info["query_started"].pop()
+    if exception_context.statement:
+        SQL_ERRORS.inc(_operation(exception_context.statement))
+
+
+class _TimedCheckout:
+    """Records how long pool checkouts wait for a connection"""
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            POOL_WAIT.observe(time.perf_counter() - started, self.logging_name or "default")
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+_pools: Dict[str, Engine] = {}
+
+
+def _on_checkout(name: str):
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out_at"] = time.perf_counter()
+    return checkout
+
+
+def _on_checkin(name: str):
+    def checkin(dbapi_connection, connection_record):
+        started = connection_record.info.pop("checked_out_at", None)
+        if started is not None:
+            POOL_HOLD.observe(time.perf_counter() - started, name)
+    return checkin
+
+
+def _pool_status(read: Callable) -> Callable[[], List[Tuple[LabelValues, float]]]:
+    def collect():
+        # engine.pool is replaced on dispose(), so read it on every scrape
+        return [((name,), read(engine.pool)) for name, engine in _pools.items() if isinstance(engine.pool, QueuePool)]
+    return collect
+
+
+registry.register(Collected("db_pool_size", "Connections the pool keeps open", ("pool",), _pool_status(lambda pool: pool.size())))
+registry.register(Collected("db_pool_checked_out", "Connections currently checked out", ("pool",), _pool_status(lambda pool: pool.checkedout())))
+registry.register(Collected("db_pool_overflow", "Connections open beyond the pool size", ("pool",), _pool_status(lambda pool: max(pool.overflow(), 0))))
+
+
+def instrument_engine(engine: Engine, name: str):
+    """Attach statement and pool hooks to an engine (the sync_engine of an AsyncEngine)"""
+    event.listen(engine, "before_cursor_execute", _before_execute)
+    event.listen(engine, "after_cursor_execute", _after_execute)
+    event.listen(engine, "handle_error", _handle_error)
+    # Pool events registered on the engine also apply to the pool dispose() recreates
+    event.listen(engine, "checkout", _on_checkout(name))
+    event.listen(engine, "checkin", _on_checkin(name))
+    _pools[name] = engine
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing requests and collecting their SQL statistics"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats(scope)
+        token = _request_stats.set(stats)
+        response = {"status": 500, "streaming": False}
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["streaming"] = any(
+                    name == b"content-type" and value.startswith(b"text/event-stream")
+                    for name, value in message.get("headers", ())
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_stats.reset(token)
+            # Event streams stay open for hours; their duration says nothing about latency
+            if not response["streaming"]:
+                route = _route(scope)
+                HTTP_LATENCY.observe(time.perf_counter() - started, scope["method"], route, str(response["status"]))
+                REQUEST_STATEMENTS.observe(stats.statements, scope["method"], route)
+                REQUEST_SQL_SECONDS.observe(stats.sql_seconds, scope["method"], route)
+
+
+def _route(scope) -> str:
+    # FastAPI stores the matched route in the scope; the template keeps label cardinality bounded
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
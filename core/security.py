@@ -0,0 +1,225 @@
+"""
+Password hashing, JWT access tokens and the authenticated-user dependency.
+
+get_current_user() keeps two bounded TTL caches per process: verified
+tokens (token -> user id) and active users (user id -> detached User), so
+a request with a known token neither decodes the JWT nor queries the
+database. Committing any change to a User through the ORM drops it from
+the cache (call auth_cache.invalidate_user() after bulk UPDATEs), so
+deactivation takes effect on the next request. Tokens carry a fingerprint
+of the password hash, so a password change also revokes earlier tokens.
+Other worker processes pick the change up within AUTH_CACHE_TTL_SECONDS.
+
+bcrypt runs on a dedicated thread pool; it releases the GIL, so a burst
+of logins neither blocks the event loop nor queues behind other
+asyncio.to_thread() work.
+"""
+
+import asyncio
+import hashlib
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Hashable, Optional, Tuple
+
+import bcrypt
+from fastapi import Depends, HTTPException, status
+from fastapi.security import OAuth2PasswordBearer
+from jose import JWTError, jwt
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from core.config import get_settings
+from core.database import USER_ID, get_async_db
+from models.user import User
+
+# Get settings
+settings = get_settings()
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+
+credentials_exception = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
+# Checked when the user does not exist so a failed login costs the same either way
+DUMMY_PASSWORD_HASH = "$2b$12$f0qheJjPymIuIiSo4nXUbOIIJIGqWWJJjTjdmM5AWPU3q/x9A/D6W"
+
+_hash_pool = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+
+
+def _password_bytes(password: str) -> bytes:
+    # bcrypt only uses the first 72 bytes (newer releases raise instead of truncating)
+    return password.encode("utf-8")[:72]
+
+
+async def hash_password(password: str) -> str:
+    """bcrypt hash of a password, computed off the event loop"""
+    salt = bcrypt.gensalt(settings.BCRYPT_ROUNDS)
+    hashed = await asyncio.get_running_loop().run_in_executor(
+        _hash_pool, bcrypt.hashpw, _password_bytes(password), salt
+    )
+    return hashed.decode("ascii")
+
+
+async def verify_password(password: str, hashed_password: str) -> bool:
+    """Check a password against a bcrypt hash, off the event loop"""
+    try:
+        return await asyncio.get_running_loop().run_in_executor(
+            _hash_pool, bcrypt.checkpw, _password_bytes(password), hashed_password.encode("ascii")
+        )
+    except ValueError:  # not a bcrypt hash
+        return False
+
+
+def password_fingerprint(hashed_password: str) -> str:
+    """Short digest of a password hash; changes whenever the password does"""
+    return hashlib.sha256(hashed_password.encode("utf-8")).hexdigest()[:16]
+
+
+def create_access_token(user: User, expires_delta: Optional[timedelta] = None) -> str:
+    """Create a signed JWT for a user, valid until the password changes or it expires"""
+    expire = datetime.utcnow() + (
+        expires_delta or timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    return jwt.encode(
+        {"sub": str(user.id), "pwd": password_fingerprint(user.hashed_password), "exp": expire},
+        settings.SECRET_KEY,
+        algorithm=settings.ALGORITHM,
+    )
+
+
+def decode_access_token(token: str) -> Tuple[int, str, float]:
+    """Verify a JWT and return its user id, password fingerprint and expiry (epoch seconds)"""
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        return int(payload["sub"]), str(payload["pwd"]), float(payload["exp"])
+    except (JWTError, KeyError, ValueError, TypeError):
+        raise credentials_exception
+
+
+class AuthCache:
+    """Bounded LRU/TTL caches of verified tokens and active users"""
+
+    def __init__(self, max_entries: int = settings.AUTH_CACHE_SIZE, ttl: float = settings.AUTH_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats: Counter = Counter()
+        self._tokens: "OrderedDict[str, Tuple[float, Tuple[int, str]]]" = OrderedDict()
+        self._users: "OrderedDict[int, Tuple[float, User]]" = OrderedDict()
+
+    def _get(self, entries: OrderedDict, key: Hashable) -> Optional[Any]:
+        entry = entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            entries.pop(key, None)
+            return None
+        entries.move_to_end(key)
+        return value
+
+    def _put(self, entries: OrderedDict, key: Hashable, value: Any, ttl: float):
+        entries[key] = (time.monotonic() + ttl, value)
+        entries.move_to_end(key)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def get_token(self, token: str) -> Optional[Tuple[int, str]]:
+        """(user id, password fingerprint) of a token verified earlier"""
+        return self._get(self._tokens, token)
+
+    def put_token(self, token: str, user_id: int, fingerprint: str, expires: float):
+        # Never outlive the token itself
+        ttl = min(self.ttl, expires - time.time())
+        if ttl > 0:
+            self._put(self._tokens, token, (user_id, fingerprint), ttl)
+
+    def get_user(self, user_id: int) -> Optional[User]:
+        return self._get(self._users, user_id)
+
+    def put_user(self, user: User):
+        self._put(self._users, user.id, user, self.ttl)
+
+    def invalidate_user(self, user_id: int):
+        """Forget a user so the next request reloads it from the database"""
+        self._users.pop(user_id, None)
+
+    def clear(self):
+        self._tokens.clear()
+        self._users.clear()
+
+
+auth_cache = AuthCache()
+
+
+async def authenticate_token(token: str, db: AsyncSession) -> User:
+    """
+    The active user an access token belongs to; raises credentials_exception otherwise.
+
+    The user is a detached snapshot shared between requests: read its
+    columns, but load it into the session before changing it.
+    """
+    verified = auth_cache.get_token(token)
+    if verified is None:
+        user_id, fingerprint, expires = decode_access_token(token)
+        auth_cache.put_token(token, user_id, fingerprint, expires)
+        auth_cache.stats["token_misses"] += 1
+    else:
+        user_id, fingerprint = verified
+        auth_cache.stats["token_hits"] += 1
+    # Lets the session keep this user on the primary right after their own writes
+    db.info[USER_ID] = user_id
+
+    user = auth_cache.get_user(user_id)
+    if user is None:
+        user = await db.get(User, user_id)
+        if user is None or not user.is_active:
+            raise credentials_exception
+        db.expunge(user)
+        auth_cache.put_user(user)
+        auth_cache.stats["user_misses"] += 1
+    else:
+        auth_cache.stats["user_hits"] += 1
+
+    if password_fingerprint(user.hashed_password) != fingerprint:
+        raise credentials_exception
+    return user
+
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db),
+) -> User:
+    """Dependency to get the authenticated, active user (see authenticate_token)"""
+    return await authenticate_token(token, db)
+
+
+# Cache invalidation: remember users changed or deleted in a session and
+# drop them from the cache once that session commits.
+_CHANGED_USERS = "auth_changed_users"
+
+
+def _after_flush(session: Session, flush_context):
+    changed = [obj.id for obj in (*session.dirty, *session.deleted) if isinstance(obj, User)]
+    if changed:
+        session.info.setdefault(_CHANGED_USERS, set()).update(changed)
+
+
+def _after_commit(session: Session):
+    for user_id in session.info.pop(_CHANGED_USERS, ()):
+        auth_cache.invalidate_user(user_id)
+
+
+def _after_rollback(session: Session, previous_transaction):
+    session.info.pop(_CHANGED_USERS, None)
+
+
+event.listen(Session, "after_flush", _after_flush)
+event.listen(Session, "after_commit", _after_commit)
+event.listen(Session, "after_soft_rollback", _after_rollback)
@@ -1,7 +1,20 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from core.config import get_settings
-from core.database import init_db
+from core.database import init_db, close_db
+from core.metrics import CONTENT_TYPE, Collected, MetricsMiddleware, registry
+from core.security import auth_cache
+from api import auth, commitments, contacts, dashboard, events, sales, search, webhooks
+from services.ai_engine import ai_engine
+from services.archival import archival_job
+from services.dashboard_stats import counter_reconciler
+from services.deadline_scheduler import deadline_scheduler
+from services.drafts import draft_pregenerator, draft_service
+from services.realtime import change_broker
+from services.reminder_dispatcher import reminder_dispatcher
+from services.telegram_bot import telegram_bot
+from services.webhook_spool import webhook_spool
 import os
 
 # Initialize settings
@@ -25,12 +38,34 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
+
+# Register API routers
+app.include_router(auth.router)
+app.include_router(commitments.router)
+app.include_router(contacts.router)
+app.include_router(dashboard.router)
+app.include_router(events.router)
+app.include_router(sales.router)
+app.include_router(search.router)
+app.include_router(webhooks.router)
 
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize database on startup"""
     init_db()
+    change_broker.start()
+    deadline_scheduler.start()
+    reminder_dispatcher.start()
+    counter_reconciler.start()
+    archival_job.start()
+    webhook_spool.start()
+    ai_engine.start()
+    await ai_engine.cache.purge_stale()
+    await draft_service.cache.purge_stale()
+    draft_pregenerator.start()
+    await telegram_bot.start()
     print(f"✓ {settings.APP_NAME} started")
     print(f"✓ Database initialized")
 
@@ -38,6 +73,16 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown"""
+    await draft_pregenerator.stop()
+    await webhook_spool.stop()
+    await telegram_bot.close()
+    await archival_job.stop()
+    await counter_reconciler.stop()
+    await reminder_dispatcher.stop()
+    await deadline_scheduler.stop()
+    await change_broker.stop()
+    await ai_engine.close()
+    await close_db()
     print(f"✓ {settings.APP_NAME} shutting down")
 
 
@@ -50,6 +95,38 @@ async def health_check():
     }
 
 
+registry.tally("auth_cache_events_total", "Token and user cache hits, misses and evictions", "event", lambda: auth_cache.stats)
+registry.tally("realtime_events_total", "Changes received and messages sent by the change broker", "event", lambda: change_broker.stats)
+registry.gauge("realtime_subscribers", "Connected event streams", change_broker.subscriber_count)
+registry.tally("draft_events_total", "Drafts generated by the model, filled from templates and pre-generated", "event", lambda: draft_service.stats)
+registry.tally("ai_engine_events_total", "Pre-filter verdicts, model calls, messages and seconds, deduplicated and unanswered messages", "event", lambda: ai_engine.stats)
+registry.gauge("prefilter_threshold", "Pre-filter score below which messages skip the model", lambda: ai_engine.prefilter_threshold)
+registry.register(Collected(
+    "prefilter_score_messages_total", "Messages per pre-filter score bucket (0.5 wide, labelled by lower bound)", ("score",),
+    lambda: [((str(score),), count) for score, count in ai_engine.score_histogram.items()],
+    "counter",
+))
+registry.tally("extraction_cache_events_total", "Extraction cache hits (memory, persistent) and misses", "event", lambda: ai_engine.cache.stats)
+registry.gauge("extraction_cache_hit_ratio", "Share of extraction lookups answered from the cache", lambda: ai_engine.cache.get_stats()["hit_ratio"])
+registry.gauge("extraction_cache_llm_seconds_saved", "Model time saved by cache hits, at the average seconds per message", lambda: ai_engine.get_stats()["cache_llm_seconds_saved"])
+registry.tally("reminder_events_total", "Commitments claimed, reminded, escalated and undelivered, and digests sent per channel", "event", lambda: reminder_dispatcher.get_stats())
+registry.tally("telegram_events_total", "Telegram updates received, handled and failed, and messages sent and throttled", "event", lambda: telegram_bot.stats)
+registry.gauge("telegram_pending_updates", "Telegram updates buffered for the chat workers", lambda: telegram_bot.get_stats()["pending"])
+registry.gauge("telegram_active_chats", "Telegram chats with buffered updates", lambda: telegram_bot.get_stats()["active_chats"])
+registry.tally("webhook_spool_events_total", "Webhook deliveries accepted, rejected, handled, failed and redelivered", "event", webhook_spool.get_stats)
+registry.register(Collected(
+    "webhook_spool_deliveries", "Webhook deliveries in the spool", ("state",),
+    lambda: [((state,), webhook_spool.depth[state]) for state in ("pending", "in_flight", "dead")],
+))
+registry.gauge("webhook_spool_oldest_seconds", "Age of the oldest undelivered webhook delivery", lambda: webhook_spool.depth["oldest_seconds"])
+
+
+@app.get("/metrics", tags=["Health"], response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics: request latency, SQL per request, slow queries, N+1 and pool usage"""
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
+
+
 @app.get("/", tags=["Root"])
 async def root():
     """Root endpoint"""
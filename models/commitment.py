@@ -1,4 +1,5 @@
-from sqlalchemy import Column, String, Integer, DateTime, Boolean, Enum, ForeignKey, Text
+from sqlalchemy import DDL, Column, String, Integer, DateTime, Boolean, Enum, ForeignKey, Text, Index, and_, event, text
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from core.database import Base
@@ -14,6 +15,18 @@ class CommitmentStatus(str, enum.Enum):
     CANCELLED = "cancelled"
 
 
+# Statuses that can still become overdue / are finished
+OPEN_STATUSES = (CommitmentStatus.PENDING, CommitmentStatus.IN_PROGRESS)
+CLOSED_STATUSES = (CommitmentStatus.COMPLETED, CommitmentStatus.CANCELLED)
+
+# Natural key of a commitment captured from a message; redeliveries conflict on it
+SOURCE_MESSAGE_KEY = ("owner_id", "source", "source_message_id")
+SOURCE_MESSAGE_PREDICATE = "source_message_id IS NOT NULL"
+
+# Rows the reminder dispatcher may still have to notify about
+NOTIFY_PREDICATE = "escalated IS NOT TRUE"
+
+
 class CommitmentType(str, enum.Enum):
     """Enum for commitment types"""
     INVOICE = "invoice"
@@ -29,6 +42,31 @@ class Commitment(Base):
     """Commitment model - tracks future obligations from communications"""
     
     __tablename__ = "commitments"
+    __table_args__ = (
+        # Backs the overdue sweep: status IN (...) AND deadline <= now
+        Index("ix_commitments_status_deadline", "status", "deadline"),
+        # Back keyset pagination on (deadline, id) within an owner's commitments
+        Index("ix_commitments_owner_deadline", "owner_id", "deadline", "id"),
+        Index("ix_commitments_owner_status_deadline", "owner_id", "status", "deadline", "id"),
+        Index("ix_commitments_owner_type_deadline", "owner_id", "commitment_type", "deadline", "id"),
+        # Per-contact views: everything owed to / by one party
+        Index("ix_commitments_owner_contact_deadline", "owner_id", "contact_id", "deadline", "id"),
+        # Backs the reminder dispatcher's claim query; escalated rows drop out
+        Index(
+            "ix_commitments_notify_deadline",
+            "deadline",
+            postgresql_where=text(NOTIFY_PREDICATE),
+            sqlite_where=text(NOTIFY_PREDICATE),
+        ),
+        # One row per source message, so webhook retries and re-ingestion upsert
+        Index(
+            "uq_commitments_source_message",
+            *SOURCE_MESSAGE_KEY,
+            unique=True,
+            postgresql_where=text(SOURCE_MESSAGE_PREDICATE),
+            sqlite_where=text(SOURCE_MESSAGE_PREDICATE),
+        ),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
@@ -46,6 +84,7 @@ class Commitment(Base):
     party_name = Column(String(255), nullable=True)
     party_email = Column(String(255), nullable=True)
     party_phone = Column(String(20), nullable=True)
+    contact_id = Column(Integer, ForeignKey("contacts.id"), nullable=True)  # resolved party
     
     # Source information
     source = Column(String(50), nullable=True)  # email, whatsapp, telegram, etc.
@@ -56,6 +95,7 @@ class Commitment(Base):
     draft_content = Column(Text, nullable=True)
     reminder_sent = Column(Boolean, default=False)
     escalated = Column(Boolean, default=False)
+    reminder_claimed_until = Column(DateTime, nullable=True)  # reminder dispatcher lease
     
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
@@ -68,8 +108,57 @@ class Commitment(Base):
     def __repr__(self):
         return f"<Commitment(id={self.id}, action={self.action}, deadline={self.deadline}, status={self.status})>"
     
+    @hybrid_property
     def is_overdue(self) -> bool:
         """Check if commitment is overdue"""
-        if self.status == CommitmentStatus.COMPLETED:
+        if self.status in CLOSED_STATUSES:
             return False
         return datetime.utcnow() > self.deadline
+    
+    @is_overdue.inplace.expression
+    @classmethod
+    def _is_overdue_expression(cls):
+        """SQL version of is_overdue for filtering and sorting in the database"""
+        return and_(cls.status.notin_(CLOSED_STATUSES), cls.deadline < datetime.utcnow())
+
+
+class CommitmentArchive(Base):
+    """Closed commitments moved out of the hot table by the archival job (see services/archival.py)"""
+    
+    __tablename__ = "commitments_archive"
+    __table_args__ = (
+        # The read path lists an owner's archive in the same (deadline, id) order as the hot table
+        Index("ix_commitments_archive_owner_deadline", "owner_id", "deadline", "id"),
+        # Postgres: one partition per deadline year, so old years can be detached or dropped whole
+        {"postgresql_partition_by": "RANGE (deadline)"},
+    )
+    
+    # Partitioned tables need the partition key in the primary key; ids stay unique from the hot table
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    deadline = Column(DateTime, primary_key=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    
+    action = Column(String(255), nullable=False)
+    description = Column(Text, nullable=True)
+    commitment_type = Column(Enum(CommitmentType), nullable=False)
+    status = Column(Enum(CommitmentStatus), nullable=False)
+    party_name = Column(String(255), nullable=True)
+    party_email = Column(String(255), nullable=True)
+    party_phone = Column(String(20), nullable=True)
+    source = Column(String(50), nullable=True)
+    source_message_id = Column(String(255), nullable=True)
+    
+    created_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+    completed_at = Column(DateTime, nullable=True)
+    archived_at = Column(DateTime, nullable=False)
+
+
+# Rows outside every yearly partition (only possible if written outside the archival job)
+event.listen(
+    CommitmentArchive.__table__,
+    "after_create",
+    DDL(
+        "CREATE TABLE IF NOT EXISTS commitments_archive_default PARTITION OF commitments_archive DEFAULT"
+    ).execute_if(dialect="postgresql"),
+)
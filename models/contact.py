@@ -0,0 +1,60 @@
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Index, UniqueConstraint, text
+from datetime import datetime
+from core.database import Base
+
+
+# Kinds of contact key; only block keys may point at several contacts
+EMAIL = "email"
+PHONE = "phone"
+NAME = "name"
+BLOCK = "block"
+UNIQUE_KEY_PREDICATE = f"kind <> '{BLOCK}'"
+
+
+class Contact(Base):
+    """A party resolved from the free-text party fields of commitments and sales (see services/contacts.py)"""
+    
+    __tablename__ = "contacts"
+    __table_args__ = (
+        # The strongest key the contact was created from; concurrent writers upsert on it
+        UniqueConstraint("owner_id", "identity", name="uq_contacts_identity"),
+        Index("ix_contacts_owner_name", "owner_id", "name_key"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    identity = Column(String(320), nullable=False)  # "email:...", "phone:..." or "name:..."
+    display_name = Column(String(255), nullable=False)
+    name_key = Column(String(255), nullable=True)  # normalized name
+    email = Column(String(255), nullable=True)  # normalized, first seen
+    phone = Column(String(20), nullable=True)  # as first seen
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f"<Contact(id={self.id}, display_name={self.display_name}, identity={self.identity})>"
+
+
+class ContactKey(Base):
+    """Lookup key of a contact: normalized email, phone key, exact name or name blocking key"""
+    
+    __tablename__ = "contact_keys"
+    __table_args__ = (
+        # An email, phone or exact name belongs to one contact; a blocking key to many
+        Index(
+            "uq_contact_keys_value",
+            "owner_id",
+            "kind",
+            "value",
+            unique=True,
+            postgresql_where=text(UNIQUE_KEY_PREDICATE),
+            sqlite_where=text(UNIQUE_KEY_PREDICATE),
+        ),
+    )
+    
+    owner_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    kind = Column(String(10), primary_key=True)
+    value = Column(String(320), primary_key=True)
+    contact_id = Column(Integer, ForeignKey("contacts.id", ondelete="CASCADE"), primary_key=True, index=True)
+    
+    def __repr__(self):
+        return f"<ContactKey(kind={self.kind}, value={self.value}, contact_id={self.contact_id})>"
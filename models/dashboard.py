@@ -0,0 +1,22 @@
+from sqlalchemy import Column, String, Integer, BigInteger, Float, ForeignKey
+from core.database import Base
+
+
+class DashboardCounter(Base):
+    """Running count (and sales value) of one owner's rows in one bucket
+    
+    commitments: category = commitment type, status = commitment status
+    sales: category = currency, status = sales status, amount = pipeline value
+    """
+    
+    __tablename__ = "dashboard_counters"
+    
+    owner_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    scope = Column(String(20), primary_key=True)
+    category = Column(String(50), primary_key=True)
+    status = Column(String(20), primary_key=True)
+    count = Column(BigInteger, default=0, nullable=False)
+    amount = Column(Float, default=0.0, nullable=False)
+    
+    def __repr__(self):
+        return f"<DashboardCounter(owner_id={self.owner_id}, scope={self.scope}, category={self.category}, status={self.status}, count={self.count})>"
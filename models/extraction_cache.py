@@ -0,0 +1,35 @@
+from sqlalchemy import Column, String, Integer, DateTime, Text
+from datetime import datetime
+from core.database import Base
+
+
+class CachedExtraction(Base):
+    """Persistent tier of the AI extraction result cache"""
+    
+    __tablename__ = "extraction_cache"
+    
+    # sha256 of model, prompt version and normalized text
+    key = Column(String(64), primary_key=True)
+    model = Column(String(100), nullable=False, index=True)
+    prompt_version = Column(Integer, nullable=False)
+    result = Column(Text, nullable=False)  # JSON list of extracted commitments
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f"<CachedExtraction(key={self.key}, model={self.model}, prompt_version={self.prompt_version})>"
+
+
+class DraftTemplate(Base):
+    """Persistent tier of the draft template cache (see services/drafts.py)"""
+    
+    __tablename__ = "draft_templates"
+    
+    # sha256 of model, prompt version, commitment type, party and normalized action
+    key = Column(String(64), primary_key=True)
+    model = Column(String(100), nullable=False, index=True)
+    prompt_version = Column(Integer, nullable=False)
+    result = Column(Text, nullable=False)  # draft text with slot markers
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f"<DraftTemplate(key={self.key}, model={self.model}, prompt_version={self.prompt_version})>"
@@ -0,0 +1,45 @@
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, ForeignKey, UniqueConstraint
+from datetime import datetime
+from core.database import Base
+
+
+class MailboxCheckpoint(Base):
+    """Resume position of the email reader for one mailbox folder"""
+    
+    __tablename__ = "mailbox_checkpoints"
+    __table_args__ = (
+        UniqueConstraint("owner_id", "account", "folder", name="uq_mailbox_checkpoints_folder"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    account = Column(String(255), nullable=False)  # imap://user@host, mbox path, maildir path
+    folder = Column(String(255), nullable=False)
+    
+    # IMAP: UIDVALIDITY + last UID; mbox: byte offset; Maildir: "mtime_ns:filename"
+    uidvalidity = Column(BigInteger, nullable=True)
+    position = Column(String(512), nullable=True)
+    
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f"<MailboxCheckpoint(account={self.account}, folder={self.folder}, position={self.position})>"
+
+
+class IngestedMessage(Base):
+    """A source message that has already been through extraction"""
+    
+    __tablename__ = "ingested_messages"
+    __table_args__ = (
+        UniqueConstraint("owner_id", "source", "source_message_id", name="uq_ingested_messages_source"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    source = Column(String(50), nullable=False)
+    source_message_id = Column(String(255), nullable=False)
+    commitments_found = Column(Integer, default=0, nullable=False)
+    ingested_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f"<IngestedMessage(source={self.source}, source_message_id={self.source_message_id})>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, DateTime, Boolean, Enum, ForeignKey, Float, Text
+from sqlalchemy import Column, String, Integer, DateTime, Boolean, Enum, ForeignKey, Float, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from core.database import Base
@@ -19,6 +19,12 @@ class Sales(Base):
     """Sales model - tracks sales interactions and deals"""
     
     __tablename__ = "sales"
+    __table_args__ = (
+        # Backs the newest-first keyset listing of an owner's sales
+        Index("ix_sales_owner_listing", "owner_id", "id"),
+        Index("ix_sales_owner_status_listing", "owner_id", "status", "id"),
+        Index("ix_sales_owner_contact_listing", "owner_id", "contact_id", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
@@ -27,6 +33,7 @@ class Sales(Base):
     customer_name = Column(String(255), nullable=False)
     customer_email = Column(String(255), nullable=True)
     customer_phone = Column(String(20), nullable=True)
+    contact_id = Column(Integer, ForeignKey("contacts.id"), nullable=True)  # resolved customer
     
     # Sales details
     title = Column(String(255), nullable=False)
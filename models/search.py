@@ -0,0 +1,70 @@
+"""
+Full-text search schema for commitments and sales.
+
+Postgres: a generated, stored tsvector column with a GIN index on
+(owner_id, search_vector). The index needs btree_gin. The database
+recomputes the column on every INSERT / UPDATE / COPY.
+
+SQLite: an external-content FTS5 table per base table, kept in step by
+triggers.
+
+Both are created right after their base table, so neither is declared on
+the ORM models.
+"""
+
+from sqlalchemy import DDL, event
+
+from models.commitment import Commitment
+from models.sales import Sales
+
+TEXT_SEARCH_CONFIG = "english"
+
+# Searchable columns per table, most important (weight A) first
+SEARCH_COLUMNS = {
+    Commitment.__table__: {"A": ("action", "party_name"), "B": ("description",)},
+    Sales.__table__: {"A": ("title", "customer_name"), "B": ("description",)},
+}
+
+
+def fts_table(table_name: str) -> str:
+    return f"{table_name}_fts"
+
+
+def _postgres_ddl(table, weighted) -> list:
+    vector = " || ".join(
+        f"setweight(to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce({column}, '')), '{weight}')"
+        for weight, columns in weighted.items()
+        for column in columns
+    )
+    return [
+        f"ALTER TABLE {table.name} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        f"GENERATED ALWAYS AS ({vector}) STORED",
+        "CREATE EXTENSION IF NOT EXISTS btree_gin",
+        f"CREATE INDEX IF NOT EXISTS ix_{table.name}_search ON {table.name} USING gin (owner_id, search_vector)",
+    ]
+
+
+def _sqlite_ddl(table, weighted) -> list:
+    columns = [column for names in weighted.values() for column in names]
+    fts = fts_table(table.name)
+    names = ", ".join(columns)
+    new = ", ".join(f"new.{column}" for column in columns)
+    old = ", ".join(f"old.{column}" for column in columns)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({names}, "
+        f"content='{table.name}', content_rowid='id', tokenize='porter unicode61')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table.name} BEGIN "
+        f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table.name} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {names} ON {table.name} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old}); "
+        f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new}); END",
+    ]
+
+
+for _table, _weighted in SEARCH_COLUMNS.items():
+    for _statement in _postgres_ddl(_table, _weighted):
+        event.listen(_table, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
+    for _statement in _sqlite_ddl(_table, _weighted):
+        event.listen(_table, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, ForeignKey
+from datetime import datetime
+from core.database import Base
+
+
+class TelegramChat(Base):
+    """A Telegram chat whose messages are captured as an owner's commitments"""
+    
+    __tablename__ = "telegram_chats"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    chat_id = Column(BigInteger, unique=True, index=True, nullable=False)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    title = Column(String(255), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f"<TelegramChat(chat_id={self.chat_id}, owner_id={self.owner_id})>"
+
+
+class TelegramOffset(Base):
+    """Durable getUpdates offset: every update below it has been handled"""
+    
+    __tablename__ = "telegram_offsets"
+    
+    bot_id = Column(BigInteger, primary_key=True)  # numeric part of the bot token
+    next_update_id = Column(BigInteger, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f"<TelegramOffset(bot_id={self.bot_id}, next_update_id={self.next_update_id})>"
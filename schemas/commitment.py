@@ -1,8 +1,10 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
 from datetime import datetime
 from enum import Enum
 
+from schemas.types import UtcDatetime
+
 
 class CommitmentStatusSchema(str, Enum):
     """Commitment status enum"""
@@ -26,15 +28,15 @@ class CommitmentTypeSchema(str, Enum):
 
 class CommitmentBase(BaseModel):
     """Base commitment schema"""
-    action: str
+    action: str = Field(max_length=255)
     description: Optional[str] = None
     commitment_type: CommitmentTypeSchema = CommitmentTypeSchema.OTHER
-    deadline: datetime
-    party_name: Optional[str] = None
-    party_email: Optional[str] = None
-    party_phone: Optional[str] = None
-    source: Optional[str] = None
-    source_message_id: Optional[str] = None
+    deadline: UtcDatetime
+    party_name: Optional[str] = Field(None, max_length=255)
+    party_email: Optional[str] = Field(None, max_length=255)
+    party_phone: Optional[str] = Field(None, max_length=20)
+    source: Optional[str] = Field(None, max_length=50)
+    source_message_id: Optional[str] = Field(None, max_length=255)
 
 
 class CommitmentCreate(CommitmentBase):
@@ -44,14 +46,14 @@ class CommitmentCreate(CommitmentBase):
 
 class CommitmentUpdate(BaseModel):
     """Commitment update schema"""
-    action: Optional[str] = None
+    action: Optional[str] = Field(None, max_length=255)
     description: Optional[str] = None
     commitment_type: Optional[CommitmentTypeSchema] = None
-    deadline: Optional[datetime] = None
+    deadline: Optional[UtcDatetime] = None
     status: Optional[CommitmentStatusSchema] = None
-    party_name: Optional[str] = None
-    party_email: Optional[str] = None
-    party_phone: Optional[str] = None
+    party_name: Optional[str] = Field(None, max_length=255)
+    party_email: Optional[str] = Field(None, max_length=255)
+    party_phone: Optional[str] = Field(None, max_length=20)
     draft_content: Optional[str] = None
     reminder_sent: Optional[bool] = None
     escalated: Optional[bool] = None
@@ -87,3 +89,9 @@ class CommitmentListResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+
+class CommitmentPage(BaseModel):
+    """Keyset-paginated commitment list"""
+    items: List[CommitmentListResponse]
+    next_cursor: Optional[str] = None
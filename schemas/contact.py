@@ -0,0 +1,30 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import datetime
+
+from schemas.commitment import CommitmentListResponse
+from schemas.sales import SalesListResponse
+
+
+class ContactResponse(BaseModel):
+    """Contact response schema"""
+    id: int
+    display_name: str
+    email: Optional[str] = None
+    phone: Optional[str] = None
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+
+class ContactPage(BaseModel):
+    """Keyset-paginated contact list, newest first"""
+    items: List[ContactResponse]
+    next_cursor: Optional[int] = None
+
+
+class ContactDetail(ContactResponse):
+    """A contact with its commitments (by deadline) and sales (newest first)"""
+    commitments: List[CommitmentListResponse]
+    sales: List[SalesListResponse]
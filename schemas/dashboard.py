@@ -0,0 +1,28 @@
+from pydantic import BaseModel
+from typing import Dict
+
+from schemas.commitment import CommitmentTypeSchema
+from schemas.sales import SalesStatusSchema
+
+
+class StatusCounts(BaseModel):
+    """Commitment counts by status"""
+    pending: int = 0
+    in_progress: int = 0
+    completed: int = 0
+    overdue: int = 0
+    cancelled: int = 0
+    total: int = 0
+
+
+class PipelineTotals(BaseModel):
+    """Number of deals and their value per currency"""
+    count: int = 0
+    value: Dict[str, float] = {}
+
+
+class DashboardSummary(BaseModel):
+    """Dashboard figures read from the per-owner counters"""
+    commitments: StatusCounts
+    commitments_by_type: Dict[CommitmentTypeSchema, StatusCounts]
+    sales_by_status: Dict[SalesStatusSchema, PipelineTotals]
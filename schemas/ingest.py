@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+from typing import Any, List
+
+
+class BulkRowError(BaseModel):
+    """A record rejected during bulk ingest"""
+    index: int
+    errors: Any
+
+
+class BulkIngestResponse(BaseModel):
+    """Bulk ingest result schema"""
+    inserted: int
+    duplicates: int = 0
+    errors: List[BulkRowError] = []
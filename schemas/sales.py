@@ -1,8 +1,10 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
 from datetime import datetime
 from enum import Enum
 
+from schemas.types import UtcDatetime
+
 
 class SalesStatusSchema(str, Enum):
     """Sales status enum"""
@@ -16,17 +18,17 @@ class SalesStatusSchema(str, Enum):
 
 class SalesBase(BaseModel):
     """Base sales schema"""
-    customer_name: str
-    customer_email: Optional[str] = None
-    customer_phone: Optional[str] = None
-    title: str
+    customer_name: str = Field(max_length=255)
+    customer_email: Optional[str] = Field(None, max_length=255)
+    customer_phone: Optional[str] = Field(None, max_length=20)
+    title: str = Field(max_length=255)
     description: Optional[str] = None
     amount: Optional[float] = None
-    currency: str = "USD"
+    currency: str = Field("USD", max_length=3)
     status: SalesStatusSchema = SalesStatusSchema.PROSPECT
-    expected_close_date: Optional[datetime] = None
-    next_action: Optional[str] = None
-    next_action_date: Optional[datetime] = None
+    expected_close_date: Optional[UtcDatetime] = None
+    next_action: Optional[str] = Field(None, max_length=255)
+    next_action_date: Optional[UtcDatetime] = None
 
 
 class SalesCreate(SalesBase):
@@ -36,17 +38,17 @@ class SalesCreate(SalesBase):
 
 class SalesUpdate(BaseModel):
     """Sales update schema"""
-    customer_name: Optional[str] = None
-    customer_email: Optional[str] = None
-    customer_phone: Optional[str] = None
-    title: Optional[str] = None
+    customer_name: Optional[str] = Field(None, max_length=255)
+    customer_email: Optional[str] = Field(None, max_length=255)
+    customer_phone: Optional[str] = Field(None, max_length=20)
+    title: Optional[str] = Field(None, max_length=255)
     description: Optional[str] = None
     amount: Optional[float] = None
-    currency: Optional[str] = None
+    currency: Optional[str] = Field(None, max_length=3)
     status: Optional[SalesStatusSchema] = None
-    expected_close_date: Optional[datetime] = None
-    next_action: Optional[str] = None
-    next_action_date: Optional[datetime] = None
+    expected_close_date: Optional[UtcDatetime] = None
+    next_action: Optional[str] = Field(None, max_length=255)
+    next_action_date: Optional[UtcDatetime] = None
 
 
 class SalesResponse(SalesBase):
@@ -71,3 +73,39 @@ class SalesListResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+
+class SalesPage(BaseModel):
+    """Keyset-paginated sales list, newest first"""
+    items: List[SalesListResponse]
+    next_cursor: Optional[int] = None
+
+
+class ForecastPeriod(BaseModel):
+    """Expected revenue of deals scheduled to close in one period"""
+    start: datetime
+    deals: int
+    pipeline: float
+    weighted: float
+
+
+class SlippageStats(BaseModel):
+    """How far deals run past their expected close date"""
+    open_past_due: int
+    open_past_due_value: float
+    open_mean_days_late: float
+    closed_mean_days_late: float
+
+
+class SalesForecast(BaseModel):
+    """Weighted pipeline forecast in one currency"""
+    currency: str
+    period: str
+    periods: List[ForecastPeriod]
+    later: float  # weighted value closing after the horizon
+    unscheduled: float  # weighted value without an expected close date
+    stage_weights: Dict[SalesStatusSchema, float]
+    conversion_rates: Dict[str, float]  # "prospect->negotiation": share of deals that got there
+    win_rate: Optional[float] = None
+    slippage: SlippageStats
+    unconverted_currencies: List[str] = []
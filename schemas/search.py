@@ -0,0 +1,20 @@
+from pydantic import BaseModel
+from typing import List, Literal, Optional
+from datetime import datetime
+
+
+class SearchHit(BaseModel):
+    """One ranked search result"""
+    kind: Literal["commitment", "sale"]
+    id: int
+    title: str  # commitment action / sale title
+    party: Optional[str] = None  # party_name / customer_name
+    status: str
+    date: Optional[datetime] = None  # deadline / expected_close_date
+    rank: float
+
+
+class SearchResults(BaseModel):
+    """Search response schema"""
+    query: str
+    hits: List[SearchHit]
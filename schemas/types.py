@@ -0,0 +1,15 @@
+from datetime import datetime, timezone
+from typing import Annotated
+
+from pydantic import AfterValidator
+
+
+def to_naive_utc(value: datetime) -> datetime:
+    """Aware datetimes converted to naive UTC, the form every DateTime column stores"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+# A datetime accepted with "Z" or an offset and stored as naive UTC
+UtcDatetime = Annotated[datetime, AfterValidator(to_naive_utc)]
@@ -41,3 +41,9 @@ class UserDetailResponse(UserResponse):
     
     class Config:
         from_attributes = True
+
+
+class Token(BaseModel):
+    """Access token returned by login"""
+    access_token: str
+    token_type: str = "bearer"
@@ -0,0 +1,20 @@
+from pydantic import BaseModel
+from typing import Optional
+
+from schemas.types import UtcDatetime
+
+
+class InboundMessage(BaseModel):
+    """Message delivered by an email / chat webhook"""
+    owner_id: int
+    source: str  # email, whatsapp, telegram, etc.
+    source_message_id: str
+    text: str
+    sender_name: Optional[str] = None
+    sender_email: Optional[str] = None
+    sent_at: Optional[UtcDatetime] = None
+
+
+class WebhookAccepted(BaseModel):
+    """Delivery spooled for processing"""
+    delivery_id: int
@@ -0,0 +1,538 @@
+"""
+Commitment detection with the local LLM (Ollama).
+
+A cheap rule-based pre-filter scores every message first, and messages that
+score clearly negative never reach the model. The rest are queued and packed
+several to a prompt, in-flight model calls are capped by a semaphore, and one
+pooled HTTP client is shared by every call. Identical texts submitted while a
+request for them is still pending share its result instead of being sent again,
+and finished results are cached (see services/extraction_cache.py).
+
+Free-text generation (drafts) streams through the same client and counts
+against the same concurrency cap.
+"""
+
+import asyncio
+import calendar
+import hashlib
+import json
+import logging
+import math
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+
+from core.config import get_settings
+from models.commitment import CommitmentType
+from schemas.types import to_naive_utc
+from services.extraction_cache import ExtractionCache
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Bump whenever the prompt or response format changes (2: drops entries cached before date-scoped keys)
+PROMPT_VERSION = 2
+
+PROMPT_TEMPLATE = """You extract business commitments (promises to do something by a date) from messages.
+Today is {today}. For each numbered message below, list the commitments it contains.
+Respond with JSON only, in the form:
+{{"results": [{{"index": <message number>, "commitments": [{{"action": str, "commitment_type": one of {types}, "deadline": ISO 8601 date or null, "party_name": str or null, "confidence": number between 0 and 1}}]}}]}}
+Use an empty "commitments" list for messages without commitments.
+
+{messages}"""
+
+
+@dataclass
+class ExtractedCommitment:
+    """A commitment detected in a message"""
+    action: str
+    commitment_type: CommitmentType = CommitmentType.OTHER
+    deadline: Optional[datetime] = None
+    party_name: Optional[str] = None
+    confidence: float = 0.0
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially different copies of a message compare equal"""
+    return " ".join(text.split())
+
+
+def text_key(text: str, model: str = settings.LLM_MODEL, today: Optional[date] = None) -> str:
+    """Stable key for a normalized message under a given model and prompt version
+
+    Messages with relative dates ("by Friday") are also keyed by the day: the
+    prompt's "Today is" resolves them to a different deadline tomorrow.
+    """
+    normalized = normalize_text(text)
+    raw = f"{model}\0{PROMPT_VERSION}\0{normalized}"
+    if has_relative_date(normalized):
+        raw += f"\0{(today or datetime.utcnow().date()).isoformat()}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def dump_commitments(commitments: List[ExtractedCommitment]) -> str:
+    """Serialize extraction results for the persistent cache"""
+    return json.dumps([
+        {
+            "action": c.action,
+            "commitment_type": c.commitment_type.value,
+            "deadline": c.deadline.isoformat() if c.deadline else None,
+            "party_name": c.party_name,
+            "confidence": c.confidence,
+        }
+        for c in commitments
+    ])
+
+
+def load_commitments(data: str) -> List[ExtractedCommitment]:
+    """Inverse of dump_commitments"""
+    parsed = (parse_commitment(item) for item in json.loads(data))
+    return [c for c in parsed if c is not None]
+
+
+def parse_commitment(data: dict) -> Optional[ExtractedCommitment]:
+    """Build an ExtractedCommitment from one model-produced dict, ignoring junk"""
+    action = data.get("action") if isinstance(data, dict) else None
+    if not action:
+        return None
+    try:
+        commitment_type = CommitmentType(str(data.get("commitment_type", "other")).lower())
+    except ValueError:
+        commitment_type = CommitmentType.OTHER
+    deadline = None
+    if data.get("deadline"):
+        try:
+            deadline = datetime.fromisoformat(str(data["deadline"]))
+        except ValueError:
+            pass
+        else:
+            # Deadlines are stored as naive UTC
+            if deadline.tzinfo is not None:
+                deadline = deadline.astimezone(timezone.utc).replace(tzinfo=None)
+    try:
+        confidence = min(max(float(data.get("confidence", 0.0)), 0.0), 1.0)
+    except (TypeError, ValueError):
+        confidence = 0.0
+    return ExtractedCommitment(
+        action=str(action)[:255],
+        commitment_type=commitment_type,
+        deadline=deadline,
+        party_name=data.get("party_name") or None,
+        confidence=confidence,
+    )
+
+
+# Rule-based pre-filter. Cheap compiled patterns score each message before it
+# can reach the model; messages scoring below LLM_PREFILTER_THRESHOLD are
+# treated as containing no commitment.
+
+TYPE_PATTERNS = {
+    CommitmentType.INVOICE: re.compile(r"\b(invoic\w*|bill(ing|ed)?|quote|estimate)\b", re.I),
+    CommitmentType.REORDER: re.compile(r"\b(re-?order\w*|restock\w*|replenish\w*|top up|running low)\b", re.I),
+    CommitmentType.PAYMENT: re.compile(r"\b(pay(ment|ing|s)?|paid|transfer|remit\w*|settle|wire)\b", re.I),
+    CommitmentType.FOLLOWUP: re.compile(r"\b(follow(ing)?[- ]?up|get back to|circle back|touch base|check in)\b", re.I),
+    CommitmentType.DELIVERY: re.compile(r"\b(deliver\w*|ship(ping|ment|ped)?|dispatch\w*|send over|drop off)\b", re.I),
+    CommitmentType.REMINDER: re.compile(r"\b(remind\w*|don'?t forget|remember to)\b", re.I),
+}
+
+COMMITMENT_VERB_PATTERN = re.compile(
+    r"\b(i'?ll|i will|we'?ll|we will|i'?m going to|we'?re going to|i can|let me|promise\w*|"
+    r"will (send|do|get|have|call|pay|deliver|ship)|can you|could you|please|need(s)? to|"
+    r"make sure|by (then|tomorrow|today|tonight|eod|eow|end of))\b",
+    re.I,
+)
+
+NEGATIVE_PATTERN = re.compile(
+    r"(unsubscribe|newsletter|view (it )?in (your )?browser|no-?reply|do not reply|"
+    r"receipt for your|order confirmation|your order has|privacy policy|"
+    r"^\s*(thanks|thank you|thx|ok|okay|great|cool|noted|got it)\W*$)",
+    re.I | re.M,
+)
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+MONTHS = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+
+ISO_DATE_PATTERN = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+RELATIVE_DAY_PATTERN = re.compile(r"\b(today|tonight|eod|tomorrow|eow|end of (the )?(day|week|month))\b", re.I)
+IN_PERIOD_PATTERN = re.compile(r"\bin (\d+|a|an|one|two|three) (day|week|month)s?\b", re.I)
+NEXT_PERIOD_PATTERN = re.compile(r"\bnext (week|month)\b", re.I)
+WEEKDAY_PATTERN = re.compile(r"\b(next )?(" + "|".join(WEEKDAYS) + r")\b", re.I)
+MONTH_DAY_PATTERN = re.compile(
+    r"\b(?:(\d{1,2})(?:st|nd|rd|th)? (" + "|".join(MONTHS) + r")[a-z]*|"
+    r"(" + "|".join(MONTHS) + r")[a-z]* (\d{1,2})(?:st|nd|rd|th)?)\b",
+    re.I,
+)
+
+# Date phrases resolved against the current date
+RELATIVE_DATE_PATTERNS = (RELATIVE_DAY_PATTERN, IN_PERIOD_PATTERN, NEXT_PERIOD_PATTERN, WEEKDAY_PATTERN, MONTH_DAY_PATTERN)
+
+NUMBER_WORDS = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3}
+
+# Linear scorer weights; tune against prefilter score histograms
+PREFILTER_BIAS = -1.0
+PREFILTER_WEIGHTS = {
+    "verb": 1.0,
+    "type_keyword": 0.8,
+    "deadline": 1.2,
+    "negative": -2.0,
+}
+
+
+def _end_of_day(day: datetime) -> datetime:
+    return day.replace(hour=23, minute=59, second=0, microsecond=0)
+
+
+def _add_months(day: datetime, months: int) -> datetime:
+    month = day.month - 1 + months
+    year = day.year + month // 12
+    month = month % 12 + 1
+    return day.replace(year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def parse_deadline(text: str, now: Optional[datetime] = None) -> Optional[datetime]:
+    """Find the first date phrase in a message ("by Friday", "in 2 weeks", "2026-03-01")"""
+    now = to_naive_utc(now) if now else datetime.utcnow()
+
+    match = ISO_DATE_PATTERN.search(text)
+    if match:
+        try:
+            return _end_of_day(datetime(*(int(part) for part in match.groups())))
+        except ValueError:
+            pass
+
+    match = RELATIVE_DAY_PATTERN.search(text)
+    if match:
+        phrase = match.group(1).lower()
+        if phrase in ("today", "tonight", "eod") or phrase.endswith("day"):
+            return _end_of_day(now)
+        if phrase == "tomorrow":
+            return _end_of_day(now + timedelta(days=1))
+        if phrase == "eow" or phrase.endswith("week"):
+            return _end_of_day(now + timedelta(days=(4 - now.weekday()) % 7))
+        last_day = calendar.monthrange(now.year, now.month)[1]
+        return _end_of_day(now.replace(day=last_day))
+
+    match = IN_PERIOD_PATTERN.search(text)
+    if match:
+        amount = NUMBER_WORDS.get(match.group(1).lower()) or int(match.group(1))
+        unit = match.group(2).lower()
+        if unit == "month":
+            return _end_of_day(_add_months(now, amount))
+        return _end_of_day(now + timedelta(days=amount * (7 if unit == "week" else 1)))
+
+    match = NEXT_PERIOD_PATTERN.search(text)
+    if match:
+        if match.group(1).lower() == "month":
+            return _end_of_day(_add_months(now, 1))
+        return _end_of_day(now + timedelta(days=7 - now.weekday()))
+
+    match = WEEKDAY_PATTERN.search(text)
+    if match:
+        days_ahead = (WEEKDAYS.index(match.group(2).lower()) - now.weekday()) % 7
+        if days_ahead == 0 or match.group(1):
+            days_ahead += 7
+        return _end_of_day(now + timedelta(days=days_ahead))
+
+    match = MONTH_DAY_PATTERN.search(text)
+    if match:
+        day, month = (match.group(1), match.group(2)) if match.group(1) else (match.group(4), match.group(3))
+        month_number = MONTHS.index(month[:3].lower()) + 1
+        try:
+            candidate = _end_of_day(datetime(now.year, month_number, int(day)))
+        except ValueError:
+            return None
+        if candidate < now:
+            candidate = candidate.replace(year=now.year + 1)
+        return candidate
+
+    return None
+
+
+def has_relative_date(text: str) -> bool:
+    """True when the message has a date phrase whose meaning depends on today (anything but an ISO date)"""
+    return any(pattern.search(text) for pattern in RELATIVE_DATE_PATTERNS)
+
+
+@dataclass
+class PrefilterResult:
+    """Rule-based first-stage verdict for a message"""
+    score: float
+    commitment_type: CommitmentType
+    deadline: Optional[datetime]
+    features: Dict[str, int]
+
+
+def prefilter(text: str, now: Optional[datetime] = None) -> PrefilterResult:
+    """Score a message for commitment likelihood without calling the model"""
+    type_hits = {t: len(pattern.findall(text)) for t, pattern in TYPE_PATTERNS.items()}
+    best_type, best_hits = max(type_hits.items(), key=lambda item: item[1])
+    deadline = parse_deadline(text, now)
+    features = {
+        "verb": min(len(COMMITMENT_VERB_PATTERN.findall(text)), 2),
+        "type_keyword": min(best_hits, 2),
+        "deadline": int(deadline is not None),
+        "negative": min(len(NEGATIVE_PATTERN.findall(text)), 2),
+    }
+    score = PREFILTER_BIAS + sum(PREFILTER_WEIGHTS[name] * value for name, value in features.items())
+    return PrefilterResult(
+        score=score,
+        commitment_type=best_type if best_hits else CommitmentType.OTHER,
+        deadline=deadline,
+        features=features,
+    )
+
+
+class AIEngine:
+    """Batched, concurrency-limited client for the commitment extraction model"""
+
+    def __init__(
+        self,
+        api_url: str = settings.LLM_API_URL,
+        model: str = settings.LLM_MODEL,
+        batch_size: int = settings.LLM_BATCH_SIZE,
+        batch_wait: float = settings.LLM_BATCH_WAIT_MS / 1000,
+        max_concurrency: int = settings.LLM_MAX_CONCURRENCY,
+        timeout: float = settings.LLM_TIMEOUT_SECONDS,
+        prefilter_threshold: float = settings.LLM_PREFILTER_THRESHOLD,
+    ):
+        self.api_url = api_url
+        self.model = model
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.prefilter_threshold = prefilter_threshold
+        # Per-stage counters and pre-filter score histogram (0.5-wide buckets)
+        self.stats: Counter = Counter()
+        self.score_histogram: Counter = Counter()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._batcher: Optional[asyncio.Task] = None
+        self._calls: set = set()
+        self._streams = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._retried: set = set()  # keys re-queued once after the model skipped them
+        self.cache = ExtractionCache(model, PROMPT_VERSION, dump_commitments, load_commitments)
+
+    def start(self):
+        """Open the pooled HTTP client and start the batching loop"""
+        if self._batcher is not None:
+            return
+        self._client = httpx.AsyncClient(
+            base_url=self.api_url,
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=self.max_concurrency,
+            ),
+        )
+        self._queue = asyncio.Queue()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._batcher = asyncio.create_task(self._batch_loop())
+
+    async def close(self):
+        """Stop batching, wait for in-flight model calls and close the client"""
+        if self._batcher is None:
+            return
+        self._batcher.cancel()
+        try:
+            await self._batcher
+        except asyncio.CancelledError:
+            pass
+        self._batcher = None
+        while not self._queue.empty():
+            _, _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("AI engine closed"))
+        if self._calls:
+            await asyncio.gather(*self._calls, return_exceptions=True)
+        await self._client.aclose()
+        self._client = None
+
+    def get_stats(self) -> Dict[str, object]:
+        """Snapshot of per-stage counters for tuning the pre-filter threshold"""
+        cache_stats = self.cache.get_stats()
+        cache_hits = cache_stats["memory_hits"] + cache_stats["persistent_hits"]
+        messages = self.stats["llm_messages"]
+        seconds_per_message = self.stats["llm_seconds"] / messages if messages else 0.0
+        return {
+            **self.stats,
+            **{f"cache_{name}": value for name, value in cache_stats.items()},
+            "cache_llm_seconds_saved": cache_hits * seconds_per_message,
+            "prefilter_threshold": self.prefilter_threshold,
+            "prefilter_score_histogram": dict(sorted(self.score_histogram.items())),
+        }
+
+    def is_idle(self) -> bool:
+        """True when no extraction is queued or running and nothing is streaming"""
+        if self._streams:
+            return False
+        return self._batcher is None or (self._queue.empty() and not self._calls)
+
+    async def stream(self, prompt: str, temperature: float = 0.3) -> AsyncIterator[str]:
+        """Generate free text, yielding tokens as the model produces them"""
+        if self._batcher is None:
+            self.start()
+        self._streams += 1
+        try:
+            async with self._semaphore:
+                self.stats["llm_streams"] += 1
+                request = {"model": self.model, "prompt": prompt, "stream": True, "options": {"temperature": temperature}}
+                async with self._client.stream("POST", "/api/generate", json=request) as response:
+                    response.raise_for_status()
+                    # One JSON object per line: {"response": "<token>", "done": false}
+                    async for line in response.aiter_lines():
+                        if not line:
+                            continue
+                        chunk = json.loads(line)
+                        if chunk.get("response"):
+                            yield chunk["response"]
+                        if chunk.get("done"):
+                            break
+        finally:
+            self._streams -= 1
+
+    def passes_prefilter(self, text: str) -> bool:
+        """Run the rule-based stage and record its verdict"""
+        result = prefilter(text)
+        self.stats["prefilter_seen"] += 1
+        self.score_histogram[math.floor(result.score * 2) / 2] += 1
+        if result.score < self.prefilter_threshold:
+            self.stats["prefilter_rejected"] += 1
+            return False
+        self.stats["prefilter_passed"] += 1
+        return True
+
+    async def extract(self, text: str, use_prefilter: bool = True) -> List[ExtractedCommitment]:
+        """Detect commitments in one message"""
+        if use_prefilter and not self.passes_prefilter(text):
+            return []
+        key = text_key(text, self.model)
+        cached = await self.cache.get(key)
+        if cached is not None:
+            return cached
+        if self._batcher is None:
+            self.start()
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats["llm_deduplicated"] += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+            await self._queue.put((key, normalize_text(text), future))
+        # Shield so one cancelled caller doesn't cancel the shared result
+        return await asyncio.shield(future)
+
+    async def extract_many(self, texts: List[str], use_prefilter: bool = True) -> List[List[ExtractedCommitment]]:
+        """Detect commitments in several messages, preserving order"""
+        return await asyncio.gather(*(self.extract(text, use_prefilter) for text in texts))
+
+    async def _batch_loop(self):
+        """Pack queued messages into batches and dispatch them under the concurrency cap"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            try:
+                deadline = loop.time() + self.batch_wait
+                while len(batch) < self.batch_size:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    # asyncio.timeout: wait_for can lose a dequeued message or a cancel that races the timeout
+                    try:
+                        async with asyncio.timeout(remaining):
+                            batch.append(await self._queue.get())
+                    except TimeoutError:
+                        break
+                await self._semaphore.acquire()
+            except asyncio.CancelledError:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(RuntimeError("AI engine closed"))
+                raise
+
+            task = asyncio.create_task(self._run_batch(batch))
+            self._calls.add(task)
+            task.add_done_callback(self._calls.discard)
+
+    async def _run_batch(self, batch: List[Tuple[str, str, asyncio.Future]]):
+        """Send one packed prompt, resolve each message's future and cache the results"""
+        self.stats["llm_calls"] += 1
+        self.stats["llm_messages"] += len(batch)
+        started = time.monotonic()
+        try:
+            results = await self._generate([text for _, text, _ in batch])
+            self.stats["llm_seconds"] += time.monotonic() - started
+            answered = {}
+            for index, (key, text, future) in enumerate(batch):
+                if index in results:
+                    answered[key] = results[index]
+                    self._retried.discard(key)
+                    if not future.done():
+                        future.set_result(results[index])
+                elif key not in self._retried and self._batcher is not None:
+                    # The model skipped this message: one more try in a later batch
+                    self.stats["llm_unanswered"] += 1
+                    self._retried.add(key)
+                    self._queue.put_nowait((key, text, future))
+                else:
+                    # Still unanswered: no commitments this time, but nothing cached, so it is asked again later
+                    self.stats["llm_unanswered"] += 1
+                    self._retried.discard(key)
+                    if not future.done():
+                        future.set_result([])
+            # Only what the model answered; a skipped message must not be cached as having no commitments
+            await self.cache.set_many(answered)
+        except Exception as exc:
+            self.stats["llm_errors"] += 1
+            logger.warning("Commitment extraction failed for %d messages: %s", len(batch), exc)
+            for key, _, future in batch:
+                self._retried.discard(key)
+                if not future.done():
+                    future.set_exception(exc)
+        finally:
+            self._semaphore.release()
+
+    def build_prompt(self, texts: List[str]) -> str:
+        """Prompt asking the model to extract commitments from numbered messages"""
+        messages = "\n\n".join(f"Message {index}:\n{text}" for index, text in enumerate(texts))
+        return PROMPT_TEMPLATE.format(
+            today=datetime.utcnow().date().isoformat(),
+            types=", ".join(t.value for t in CommitmentType),
+            messages=messages,
+        )
+
+    async def _generate(self, texts: List[str]) -> Dict[int, List[ExtractedCommitment]]:
+        """Call the Ollama generate API and parse per-message results"""
+        response = await self._client.post(
+            "/api/generate",
+            json={
+                "model": self.model,
+                "prompt": self.build_prompt(texts),
+                "format": "json",
+                "stream": False,
+                "options": {"temperature": 0},
+            },
+        )
+        response.raise_for_status()
+        payload = json.loads(response.json()["response"])
+
+        results: Dict[int, List[ExtractedCommitment]] = {}
+        for item in payload.get("results", []):
+            try:
+                index = int(item["index"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            parsed = (parse_commitment(c) for c in item.get("commitments") or [])
+            results[index] = [c for c in parsed if c is not None]
+        return results
+
+
+ai_engine = AIEngine()
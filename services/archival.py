@@ -0,0 +1,167 @@
+"""
+Archival of closed commitments into commitments_archive.
+
+Completed and cancelled commitments whose deadline and last update are
+both older than ARCHIVE_AFTER_DAYS are moved into commitments_archive,
+ARCHIVE_BATCH_SIZE rows per transaction. Each batch is one INSERT ...
+SELECT and one DELETE. The hot table, and every index on it, then only
+grows with recent and open work. The archive drops the draft and
+reminder bookkeeping and has a single (owner_id, deadline, id) index. On Postgres it
+is range-partitioned by deadline year, and the job creates each year's
+partition before the first row lands in it.
+
+Archived rows are read-only. They still count in the dashboard counters
+(rebuild_counters reads both tables), and the list endpoint includes them
+with include_archived=true. They are not in full-text search, and a source
+message redelivered after archival is not deduplicated against them.
+
+Postgres' own partitioning is applied to the archive rather than to
+commitments itself: the partition key would have to join every unique
+key, including the source-message key the webhook upserts conflict on.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Set
+
+from sqlalchemy import delete, literal, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from core.config import get_settings
+from core.database import BackgroundSessionLocal, dialect_insert
+from models.commitment import CLOSED_STATUSES, Commitment, CommitmentArchive
+from services.dashboard_stats import COMMITMENTS
+from services.realtime import ChangeSet
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Columns copied from commitments; archived_at is set by the job
+ARCHIVED_COLUMNS = [column.name for column in CommitmentArchive.__table__.columns if column.name != "archived_at"]
+
+# Deadline years whose partition this process has already created
+_partitions: Set[int] = set()
+
+
+async def ensure_partitions(db: AsyncSession, years: Iterable[int]) -> List[int]:
+    """Create the yearly archive partitions (Postgres) for the given deadline years; returns the years created"""
+    table = CommitmentArchive.__tablename__
+    created = sorted(set(years) - _partitions)
+    for year in created:
+        await db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {table}_{year} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')"
+        ))
+    return created
+
+
+async def archive_batch(db: AsyncSession, cutoff: datetime, batch_size: int) -> int:
+    """Move up to batch_size closed commitments last touched before cutoff; returns how many moved"""
+    dialect = db.bind.dialect.name
+    due = (
+        select(Commitment.id, Commitment.owner_id, Commitment.deadline)
+        # ix_commitments_status_deadline narrows this to old closed rows
+        .where(
+            Commitment.status.in_(CLOSED_STATUSES),
+            Commitment.deadline < cutoff,
+            Commitment.updated_at < cutoff,
+        )
+        .order_by(Commitment.deadline)
+        .limit(batch_size)
+    )
+    if dialect == "postgresql":
+        # Concurrent jobs in other workers take different rows
+        due = due.with_for_update(skip_locked=True)
+    rows = (await db.execute(due)).all()
+    if not rows:
+        await db.rollback()
+        return 0
+    ids = [row.id for row in rows]
+    partitions = []
+    if dialect == "postgresql":
+        partitions = await ensure_partitions(db, {row.deadline.year for row in rows})
+
+    copied = select(
+        *(Commitment.__table__.c[name] for name in ARCHIVED_COLUMNS),
+        literal(datetime.utcnow()).label("archived_at"),
+    ).where(Commitment.id.in_(ids))
+    insert = dialect_insert(dialect)(CommitmentArchive).from_select([*ARCHIVED_COLUMNS, "archived_at"], copied)
+    # Rows already in the archive under the same key are left as they are
+    await db.execute(insert.on_conflict_do_nothing())
+    await db.execute(delete(Commitment).where(Commitment.id.in_(ids)).execution_options(synchronize_session=False))
+
+    # Counters are untouched: archived rows still count. Open dashboards drop them from their lists.
+    changes = ChangeSet()
+    for row in rows:
+        changes.add(row.owner_id, COMMITMENTS, [row.id])
+    await changes.publish(db)
+    await db.commit()
+    # Only now: DDL rolls back with the batch on Postgres
+    _partitions.update(partitions)
+    return len(rows)
+
+
+async def archive_commitments(
+    db: AsyncSession,
+    now: Optional[datetime] = None,
+    after_days: Optional[int] = None,
+    batch_size: Optional[int] = None,
+) -> int:
+    """Archive every eligible closed commitment, one transaction per batch"""
+    now = now or datetime.utcnow()
+    after_days = settings.ARCHIVE_AFTER_DAYS if after_days is None else after_days
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    cutoff = now - timedelta(days=after_days)
+    total = 0
+    while True:
+        moved = await archive_batch(db, cutoff, batch_size)
+        total += moved
+        if moved < batch_size:
+            return total
+        # Let interactive work in between batches
+        await asyncio.sleep(0)
+
+
+class ArchivalJob:
+    """Periodically moves old closed commitments to the archive"""
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker = BackgroundSessionLocal,
+        interval: float = settings.ARCHIVE_INTERVAL_SECONDS,
+        after_days: int = settings.ARCHIVE_AFTER_DAYS,
+    ):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.after_days = after_days
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the archival loop; disabled when ARCHIVE_AFTER_DAYS is 0"""
+        if self._task is None and self.after_days > 0:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Cancel the archival loop"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run(self):
+        while True:
+            try:
+                async with self.session_factory() as db:
+                    moved = await archive_commitments(db, after_days=self.after_days)
+                if moved:
+                    logger.info("Archived %d closed commitments", moved)
+            except Exception:
+                logger.exception("Commitment archival failed")
+            await asyncio.sleep(self.interval)
+
+
+archival_job = ArchivalJob()
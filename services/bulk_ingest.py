@@ -0,0 +1,270 @@
+"""
+Bulk ingest of commitments and sales records.
+
+Records are validated in batches; rows that fail validation are reported
+back by index while the rest of the batch is written. On Postgres each
+batch is written with COPY, elsewhere with batched multi-row INSERTs.
+Commitments already stored for the same source message are skipped and
+counted as duplicates.
+"""
+
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple, Type, Union
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import Table, insert, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import get_settings
+from core.database import WRITE_ERRORS, dialect_insert
+from models.commitment import Commitment, SOURCE_MESSAGE_KEY, SOURCE_MESSAGE_PREDICATE
+from models.sales import Sales, SalesStatus
+from schemas.commitment import CommitmentCreate
+from schemas.sales import SalesCreate
+from services.commitment_service import commitment_row
+from services.contacts import assign_contacts
+from services.dashboard_stats import COUNTER_COLUMNS, CounterDelta
+from services.deadline_scheduler import deadline_scheduler
+from services.realtime import ChangeSet
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+@dataclass
+class IngestSpec:
+    """How to validate and store one kind of record"""
+    schema: Type[BaseModel]
+    table: Table
+    build_row: Callable[[BaseModel, int, datetime], Dict[str, Any]]
+    # Unique key rows may already exist under; conflicting rows are skipped
+    conflict_columns: Tuple[str, ...] = ()
+    conflict_where: Optional[str] = None
+
+
+@dataclass
+class IngestResult:
+    """Outcome of a bulk ingest"""
+    inserted: int = 0
+    duplicates: int = 0
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+
+
+def build_sales_row(record: SalesCreate, owner_id: int, now: datetime) -> Dict[str, Any]:
+    """Full sales row, including the defaults COPY would not apply"""
+    row = record.model_dump()
+    row.update(
+        owner_id=owner_id,
+        status=SalesStatus(record.status.value),
+        created_at=now,
+        updated_at=now,
+    )
+    return row
+
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+COMMITMENTS = IngestSpec(
+    CommitmentCreate,
+    Commitment.__table__,
+    commitment_row,
+    conflict_columns=SOURCE_MESSAGE_KEY,
+    conflict_where=SOURCE_MESSAGE_PREDICATE,
+)
+SALES = IngestSpec(SalesCreate, Sales.__table__, build_sales_row)
+
+
+async def iter_ndjson(chunks: AsyncIterable[bytes]) -> AsyncIterator[Any]:
+    """Parse an NDJSON byte stream line by line; undecodable lines yield the exception"""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield _parse_line(line)
+    if buffer.strip():
+        yield _parse_line(buffer)
+
+
+async def read_records(content_type: str, chunks: AsyncIterable[bytes]) -> Union[List[Any], AsyncIterator[Any]]:
+    """Records from a request body: streamed NDJSON, or a JSON array"""
+    if content_type.split(";")[0].strip() in NDJSON_CONTENT_TYPES:
+        return iter_ndjson(chunks)
+    body = b"".join([chunk async for chunk in chunks])
+    records = json.loads(body)
+    if not isinstance(records, list):
+        raise ValueError("Expected a JSON array of records")
+    return records
+
+
+def _parse_line(line: bytes) -> Any:
+    try:
+        return json.loads(line)
+    except ValueError as exc:
+        return exc
+
+
+def _error_detail(exc: Exception) -> Any:
+    if isinstance(exc, ValidationError):
+        return exc.errors(include_url=False, include_context=False)
+    if isinstance(exc, DBAPIError):
+        return str(exc.orig)
+    return str(exc)
+
+
+def _copy_value(column, value):
+    """COPY bypasses SQLAlchemy type processing; Enum columns store member names"""
+    if hasattr(column.type, "enums") and value is not None:
+        return value.name
+    return value
+
+
+async def write_rows(db: AsyncSession, spec: IngestSpec, rows: List[Dict[str, Any]]) -> List[Any]:
+    """Write one batch with COPY on Postgres, multi-row INSERTs elsewhere
+
+    Returns the dashboard counter columns of the rows actually inserted.
+    """
+    table = spec.table
+    if db.bind.dialect.name == "postgresql":
+        return await _copy_rows(db, spec, rows)
+
+    returning = [table.c[name] for name in COUNTER_COLUMNS[table.name]]
+    if spec.conflict_columns:
+        statement = (
+            dialect_insert(db.bind.dialect.name)(table)
+            .on_conflict_do_nothing(index_elements=list(spec.conflict_columns), index_where=_conflict_where(spec))
+            .returning(*returning)
+        )
+        # executemany is sent as batched multi-row INSERT ... VALUES statements
+        return (await db.execute(statement, rows)).mappings().all()
+    await db.execute(insert(table), rows)
+    return [{name: row[name] for name in COUNTER_COLUMNS[table.name]} for row in rows]
+
+
+def _conflict_where(spec: IngestSpec):
+    return text(spec.conflict_where) if spec.conflict_where else None
+
+
+async def _copy_rows(db: AsyncSession, spec: IngestSpec, rows: List[Dict[str, Any]]) -> List[Any]:
+    """COPY into a transaction-scoped staging table, then INSERT ... SELECT into the real one"""
+    table = spec.table
+    columns = [c for c in table.columns if c.name in rows[0]]
+    column_list = ", ".join(f'"{c.name}"' for c in columns)
+    staging = f"_ingest_{table.name}"
+
+    # Run through SQLAlchemy first so the driver-level COPY joins the open transaction
+    await db.execute(text(
+        f'CREATE TEMP TABLE "{staging}" ON COMMIT DROP AS '
+        f'SELECT {column_list} FROM "{table.name}" WITH NO DATA'
+    ))
+    conn = await db.connection()
+    raw = await conn.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table(
+        staging,
+        records=[tuple(_copy_value(c, row[c.name]) for c in columns) for row in rows],
+        columns=[c.name for c in columns],
+    )
+
+    on_conflict = ""
+    if spec.conflict_columns:
+        target = ", ".join(f'"{name}"' for name in spec.conflict_columns)
+        where = f" WHERE {spec.conflict_where}" if spec.conflict_where else ""
+        on_conflict = f" ON CONFLICT ({target}){where} DO NOTHING"
+    returning = [table.c[name] for name in COUNTER_COLUMNS[table.name]]
+    result = await db.execute(
+        text(
+            f'INSERT INTO "{table.name}" ({column_list}) SELECT {column_list} FROM "{staging}"{on_conflict}'
+            f' RETURNING {", ".join(c.name for c in returning)}'
+        ).columns(*returning)
+    )
+    return result.mappings().all()
+
+
+async def _write_counted(db: AsyncSession, spec: IngestSpec, rows: List[Dict[str, Any]]) -> int:
+    """write_rows plus the matching counter update and change notification, in the same transaction"""
+    await assign_contacts(db, spec.table.name, rows)
+    inserted = await write_rows(db, spec, rows)
+    delta = CounterDelta()
+    delta.add_rows(spec.table.name, inserted)
+    await delta.apply(db)
+    # Inserted ids are not returned, and a bulk load is best refetched as a whole anyway
+    changes = ChangeSet()
+    for owner_id in {row["owner_id"] for row in inserted}:
+        changes.add_all(owner_id, spec.table.name)
+    await changes.publish(db)
+    return len(inserted)
+
+
+async def _flush(db: AsyncSession, spec: IngestSpec, batch: List[tuple], result: IngestResult):
+    """Commit a validated batch; on failure retry row by row to isolate bad rows"""
+    if not batch:
+        return
+    try:
+        inserted = await _write_counted(db, spec, [row for _, row in batch])
+        await db.commit()
+        written = [row for _, row in batch]
+    except WRITE_ERRORS:
+        await db.rollback()
+        inserted, written = 0, []
+        for index, row in batch:
+            try:
+                inserted += await _write_counted(db, spec, [row])
+                await db.commit()
+                written.append(row)
+            except WRITE_ERRORS as exc:
+                await db.rollback()
+                result.errors.append({"index": index, "errors": _error_detail(exc)})
+
+    result.inserted += inserted
+    result.duplicates += len(written) - inserted
+    deadline_scheduler.schedule_many(row["deadline"] for row in written if row.get("deadline"))
+
+
+async def ingest_records(
+    db: AsyncSession,
+    spec: IngestSpec,
+    owner_id: int,
+    records: Union[Iterable[Any], AsyncIterable[Any]],
+    batch_size: Optional[int] = None,
+) -> IngestResult:
+    """Validate and write records in batches, collecting per-row errors"""
+    batch_size = batch_size or settings.INGEST_BATCH_SIZE
+    result = IngestResult()
+    batch: List[tuple] = []
+    now = datetime.utcnow()
+
+    async def consume(index: int, record: Any):
+        nonlocal batch
+        if isinstance(record, Exception):
+            result.errors.append({"index": index, "errors": _error_detail(record)})
+            return
+        try:
+            validated = spec.schema.model_validate(record)
+        except ValidationError as exc:
+            result.errors.append({"index": index, "errors": _error_detail(exc)})
+            return
+        batch.append((index, spec.build_row(validated, owner_id, now)))
+        if len(batch) >= batch_size:
+            await _flush(db, spec, batch, result)
+            batch = []
+
+    if hasattr(records, "__aiter__"):
+        index = 0
+        async for record in records:
+            await consume(index, record)
+            index += 1
+    else:
+        for index, record in enumerate(records):
+            await consume(index, record)
+
+    await _flush(db, spec, batch, result)
+    logger.info(
+        "Ingested %d %s rows (%d duplicates, %d errors)",
+        result.inserted, spec.table.name, result.duplicates, len(result.errors),
+    )
+    return result
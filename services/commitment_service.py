@@ -0,0 +1,216 @@
+"""
+Commitment writes keyed on the source message.
+
+Commitments captured from messages carry (owner_id, source,
+source_message_id), which is unique. Inserts go through ON CONFLICT so a
+redelivered message costs a single statement and never creates a
+duplicate row or needs a SELECT first.
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.database import WRITE_ERRORS, dialect_insert
+from models.commitment import (
+    Commitment,
+    CommitmentStatus,
+    CommitmentType,
+    SOURCE_MESSAGE_KEY,
+    SOURCE_MESSAGE_PREDICATE,
+)
+from schemas.commitment import CommitmentCreate, CommitmentUpdate
+from services.ai_engine import ExtractedCommitment, parse_deadline
+from services.contacts import PARTY_COLUMNS, assign_contacts, contact_for
+from services.dashboard_stats import COMMITMENTS, CounterDelta
+from services.deadline_scheduler import deadline_scheduler
+from services.realtime import ChangeSet
+
+logger = logging.getLogger(__name__)
+
+# Deadline used when neither the model nor the date parser finds one
+DEFAULT_DEADLINE = timedelta(days=7)
+
+# Columns an update may not set to null
+REQUIRED_FIELDS = {"action", "commitment_type", "deadline", "status"}
+
+
+def message_commitment_ids(source_message_id: str, count: int) -> List[str]:
+    """source_message_id for each commitment found in one message ("id", "id#1", ...)"""
+    return [source_message_id if n == 0 else f"{source_message_id}#{n}" for n in range(count)]
+
+
+def commitments_from_extraction(
+    extracted: List[ExtractedCommitment],
+    text: str,
+    source: str,
+    source_message_id: str,
+    party_name: Optional[str] = None,
+    party_email: Optional[str] = None,
+    sent_at: Optional[datetime] = None,
+) -> List[CommitmentCreate]:
+    """CommitmentCreate payloads for what the model found in one message"""
+    sent_at = sent_at or datetime.utcnow()
+    message_ids = message_commitment_ids(source_message_id, len(extracted))
+    return [
+        CommitmentCreate(
+            action=commitment.action,
+            commitment_type=commitment.commitment_type.value,
+            deadline=commitment.deadline or parse_deadline(text, sent_at) or sent_at + DEFAULT_DEADLINE,
+            party_name=(commitment.party_name or party_name or "")[:255] or None,
+            party_email=(party_email or "")[:255] or None,
+            source=source,
+            source_message_id=message_id,
+        )
+        for commitment, message_id in zip(extracted, message_ids)
+    ]
+
+
+def commitment_row(data: CommitmentCreate, owner_id: int, now: datetime) -> Dict[str, Any]:
+    """Full column values for a new commitment, including defaults COPY would not apply"""
+    row = data.model_dump()
+    row.update(
+        owner_id=owner_id,
+        commitment_type=CommitmentType(data.commitment_type.value),
+        status=CommitmentStatus.PENDING,
+        auto_drafted=False,
+        reminder_sent=False,
+        escalated=False,
+        created_at=now,
+        updated_at=now,
+    )
+    return row
+
+
+def upsert_statement(dialect_name: str):
+    """INSERT into commitments that conflicts on the source message key"""
+    return dialect_insert(dialect_name)(Commitment)
+
+
+def on_conflict_kwargs() -> Dict[str, Any]:
+    return {
+        "index_elements": list(SOURCE_MESSAGE_KEY),
+        "index_where": text(SOURCE_MESSAGE_PREDICATE),
+    }
+
+
+async def upsert_commitment(db: AsyncSession, owner_id: int, data: CommitmentCreate) -> Commitment:
+    """Create a commitment, or return the existing one for the same source message"""
+    row = commitment_row(data, owner_id, datetime.utcnow())
+    await assign_contacts(db, Commitment.__tablename__, [row])
+    if data.source_message_id is None:
+        statement = insert(Commitment).values(**row)
+    else:
+        statement = upsert_statement(db.bind.dialect.name).values(**row)
+        # A no-op update makes RETURNING yield the existing row on conflict
+        statement = statement.on_conflict_do_update(
+            **on_conflict_kwargs(),
+            set_={"source_message_id": statement.excluded.source_message_id},
+        )
+    commitment = await db.scalar(
+        select(Commitment).from_statement(statement.returning(Commitment)),
+        execution_options={"populate_existing": True},
+    )
+    # An existing row keeps its own created_at, so this only matches a fresh insert
+    if commitment.created_at == row["created_at"]:
+        delta = CounterDelta()
+        delta.add_commitment(owner_id, commitment.commitment_type, commitment.status)
+        await delta.apply(db)
+        changes = ChangeSet()
+        changes.add(owner_id, COMMITMENTS, [commitment.id])
+        await changes.publish(db)
+    await db.commit()
+    deadline_scheduler.schedule(commitment.deadline)
+    return commitment
+
+
+async def _insert_counted(db: AsyncSession, owner_id: int, rows: List[Dict[str, Any]]) -> List[Any]:
+    """Insert rows, skipping stored source messages, with their counter update and change notification"""
+    await assign_contacts(db, Commitment.__tablename__, rows)
+    statement = (
+        upsert_statement(db.bind.dialect.name)
+        .on_conflict_do_nothing(**on_conflict_kwargs())
+        .returning(Commitment.id, Commitment.deadline, Commitment.commitment_type)
+    )
+    inserted = (await db.execute(statement, rows)).all()
+    delta = CounterDelta()
+    for _, _, commitment_type in inserted:
+        delta.add_commitment(owner_id, commitment_type, CommitmentStatus.PENDING)
+    await delta.apply(db)
+    changes = ChangeSet()
+    changes.add(owner_id, COMMITMENTS, [commitment_id for commitment_id, _, _ in inserted])
+    await changes.publish(db)
+    return inserted
+
+
+async def upsert_commitments(db: AsyncSession, owner_id: int, records: List[CommitmentCreate]) -> int:
+    """Insert many commitments, silently skipping source messages already stored
+
+    When the batch fails it is retried row by row, so one bad row in a
+    (re)delivered batch is logged and skipped instead of failing the rest.
+    """
+    if not records:
+        return 0
+    now = datetime.utcnow()
+    rows = [commitment_row(record, owner_id, now) for record in records]
+    try:
+        inserted = await _insert_counted(db, owner_id, rows)
+        await db.commit()
+    except WRITE_ERRORS:
+        await db.rollback()
+        inserted = []
+        for row in rows:
+            try:
+                inserted += await _insert_counted(db, owner_id, [row])
+                await db.commit()
+            except WRITE_ERRORS as exc:
+                await db.rollback()
+                logger.warning("Skipped commitment for source message %s: %s", row.get("source_message_id"), exc)
+    deadline_scheduler.schedule_many(deadline for _, deadline, _ in inserted)
+    return len(inserted)
+
+
+async def update_commitment(db: AsyncSession, owner_id: int, commitment_id: int, changes: CommitmentUpdate) -> Optional[Commitment]:
+    """Apply a partial update, moving dashboard counters on type or status changes"""
+    commitment = await db.scalar(
+        select(Commitment)
+        .where(Commitment.id == commitment_id, Commitment.owner_id == owner_id)
+        .with_for_update()
+    )
+    if commitment is None:
+        return None
+    values = {
+        name: value
+        for name, value in changes.model_dump(exclude_unset=True).items()
+        if value is not None or name not in REQUIRED_FIELDS
+    }
+    if "commitment_type" in values:
+        values["commitment_type"] = CommitmentType(values["commitment_type"].value)
+    if "status" in values:
+        values["status"] = CommitmentStatus(values["status"].value)
+
+    delta = CounterDelta()
+    delta.add_commitment(owner_id, commitment.commitment_type, commitment.status, -1)
+    now = datetime.utcnow()
+    for name, value in values.items():
+        setattr(commitment, name, value)
+    if values.keys() & set(PARTY_COLUMNS[Commitment.__tablename__]):
+        commitment.contact_id = await contact_for(
+            db, owner_id, commitment.party_name, commitment.party_email, commitment.party_phone
+        )
+    if "status" in values:
+        commitment.completed_at = now if commitment.status == CommitmentStatus.COMPLETED else None
+    commitment.updated_at = now
+    delta.add_commitment(owner_id, commitment.commitment_type, commitment.status)
+    await delta.apply(db)
+    changes = ChangeSet()
+    changes.add(owner_id, COMMITMENTS, [commitment.id])
+    await changes.publish(db)
+    await db.commit()
+    await db.refresh(commitment)
+    if "deadline" in values or "status" in values:
+        deadline_scheduler.schedule(commitment.deadline)
+    return commitment
@@ -0,0 +1,384 @@
+"""
+Contact resolution: one stable contact id per party across commitments and sales.
+
+Commitments (party_name / party_email / party_phone) and sales
+(customer_name / customer_email / customer_phone) store their party as
+free text. Every write resolves that text to a row in contacts and stores
+its id in contact_id, so "everything with Acme" is one indexed lookup on
+(owner_id, contact_id).
+
+Each party is reduced to lookup keys, stored in contact_keys:
+
+- email: lowercased, "+tag" dropped from the local part
+- phone: the last PHONE_KEY_DIGITS digits, so "+44 20 7946 0958" and
+  "020 7946 0958" agree
+- name: accents, punctuation and legal suffixes (Inc, Ltd, GmbH, ...)
+  removed, lowercased
+- block: the first four characters of each name token. Only contacts
+  sharing a blocking key are compared by name similarity, never the
+  whole table.
+
+A party joins the contact that owns its email, then its phone, then its
+exact name, then the most similar name among blocking candidates
+(CONTACT_NAME_THRESHOLD). A name match is refused when both sides have a
+personal email or a phone that disagrees. Otherwise a new contact is
+created, and its keys are added to those already known.
+
+Contacts are never merged after the fact. When a later row links two
+contacts, both keep their rows. resolve_parties() works on whole batches
+with a constant number of queries. reresolve_contacts() walks a table in
+id order, one transaction per CONTACT_RESOLVE_BATCH_SIZE rows, to
+backfill contact_id or apply changed matching rules:
+
+    python -m services.contacts [--owner ID] [--table commitments|sales]
+"""
+
+import asyncio
+import logging
+import re
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from difflib import SequenceMatcher
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import get_settings
+from core.database import dialect_insert
+from models.commitment import Commitment
+from models.contact import BLOCK, EMAIL, NAME, PHONE, Contact, ContactKey
+from models.sales import Sales
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Party columns per table: (name, email, phone)
+PARTY_COLUMNS = {
+    Commitment.__tablename__: ("party_name", "party_email", "party_phone"),
+    Sales.__tablename__: ("customer_name", "customer_email", "customer_phone"),
+}
+TABLES = {Commitment.__tablename__: Commitment.__table__, Sales.__tablename__: Sales.__table__}
+
+PHONE_KEY_DIGITS = 9
+MIN_PHONE_DIGITS = 7
+BLOCK_PREFIX = 4
+
+# Dropped from names before comparing
+LEGAL_SUFFIXES = {
+    "ag", "bv", "co", "company", "corp", "corporation", "gmbh", "inc", "incorporated",
+    "limited", "llc", "llp", "ltd", "plc", "pty", "sa", "sarl", "srl", "the",
+}
+
+# Shared mailbox providers: a different address there means a different person
+FREEMAIL_DOMAINS = {
+    "aol.com", "gmail.com", "googlemail.com", "gmx.com", "gmx.de", "hotmail.com", "icloud.com",
+    "live.com", "mail.ru", "me.com", "outlook.com", "proton.me", "protonmail.com", "yahoo.com", "yandex.ru",
+}
+
+# (owner_id, kind, value) tuples per lookup query
+LOOKUP_CHUNK = 300
+
+
+def normalize_email(email: Optional[str]) -> Optional[str]:
+    """Lowercased address without a +tag; None unless it looks like an address"""
+    if not email:
+        return None
+    local, at, domain = email.strip().lower().rpartition("@")
+    local = local.split("+", 1)[0]
+    if not at or not local or "." not in domain:
+        return None
+    return f"{local}@{domain}"
+
+
+def normalize_phone(phone: Optional[str]) -> Optional[str]:
+    """Phone key: the trailing PHONE_KEY_DIGITS digits; None for short or empty numbers"""
+    digits = re.sub(r"\D", "", phone or "")
+    if len(digits) < MIN_PHONE_DIGITS:
+        return None
+    return digits[-PHONE_KEY_DIGITS:]
+
+
+def normalize_name(name: Optional[str]) -> Optional[str]:
+    """Lowercased name tokens without accents, punctuation or legal suffixes"""
+    if not name:
+        return None
+    folded = "".join(c for c in unicodedata.normalize("NFKD", name) if not unicodedata.combining(c)).lower()
+    tokens = re.findall(r"[^\W_]+", folded)
+    # "The Company" keeps its words rather than becoming empty
+    return " ".join([t for t in tokens if t not in LEGAL_SUFFIXES] or tokens) or None
+
+
+def blocking_keys(name: str) -> List[str]:
+    """Token prefixes; names are only compared with contacts sharing one"""
+    tokens = [t for t in name.split() if len(t) >= 3] or name.split()
+    return sorted({t[:BLOCK_PREFIX] for t in tokens})
+
+
+def name_similarity(a: str, b: str, threshold: float = 0.0) -> float:
+    """0-1 similarity of two normalized names, insensitive to word order; 0 when below threshold"""
+    best = 0.0
+    for left, right in ((a, b), (" ".join(sorted(a.split())), " ".join(sorted(b.split())))):
+        matcher = SequenceMatcher(None, left, right, autojunk=False)
+        # Cheap upper bounds first
+        if matcher.real_quick_ratio() < threshold or matcher.quick_ratio() < threshold:
+            continue
+        best = max(best, matcher.ratio())
+    return best if best >= threshold else 0.0
+
+
+@dataclass(frozen=True)
+class Party:
+    """A party's normalized identifying fields"""
+    name: Optional[str] = None
+    email: Optional[str] = None
+    phone: Optional[str] = None
+    display_name: Optional[str] = field(default=None, compare=False)
+    raw_phone: Optional[str] = field(default=None, compare=False)
+
+    @classmethod
+    def of(cls, name: Optional[str], email: Optional[str], phone: Optional[str]) -> Optional["Party"]:
+        """The party of a row's name / email / phone; None when none of them identifies anyone"""
+        party = cls(
+            normalize_name(name),
+            normalize_email(email),
+            normalize_phone(phone),
+            display_name=(name or "").strip()[:255] or None,
+            raw_phone=(phone or "").strip()[:20] or None,
+        )
+        if not (party.name or party.email or party.phone):
+            return None
+        return party
+
+    def keys(self) -> List[Tuple[str, str]]:
+        """(kind, value) lookup keys, strongest first"""
+        keys = []
+        if self.email:
+            keys.append((EMAIL, self.email))
+        if self.phone:
+            keys.append((PHONE, self.phone))
+        if self.name:
+            keys.append((NAME, self.name))
+            keys.extend((BLOCK, key) for key in blocking_keys(self.name))
+        return keys
+
+    @property
+    def identity(self) -> str:
+        kind, value = self.keys()[0]
+        return f"{kind}:{value}"
+
+
+@dataclass
+class _Candidate:
+    """A contact as far as matching needs it"""
+    id: Optional[int]  # None until a new contact is inserted
+    name: Optional[str]
+    email: Optional[str]
+    phone: Optional[str]
+
+
+def _conflicts(party: Party, contact: _Candidate) -> bool:
+    """True when contact details show two different parties behind similar names"""
+    if party.phone and contact.phone and party.phone != contact.phone:
+        return True
+    if party.email and contact.email and party.email != contact.email:
+        # Two people at one company are still the same customer
+        domain = party.email.rpartition("@")[2]
+        return domain != contact.email.rpartition("@")[2] or domain in FREEMAIL_DOMAINS
+    return False
+
+
+def _match(party: Party, keyed: Dict[tuple, List[Any]], known: Dict[Any, _Candidate], owner_id: int, threshold: float) -> Optional[_Candidate]:
+    for kind, value in ((EMAIL, party.email), (PHONE, party.phone)):
+        if value and keyed.get((owner_id, kind, value)):
+            return known[keyed[(owner_id, kind, value)][0]]
+    if not party.name:
+        return None
+    for contact_id in keyed.get((owner_id, NAME, party.name), ()):
+        if not _conflicts(party, known[contact_id]):
+            return known[contact_id]
+    best, best_score = None, 0.0
+    candidates = {contact_id for key in blocking_keys(party.name) for contact_id in keyed.get((owner_id, BLOCK, key), ())}
+    for contact_id in candidates:
+        contact = known[contact_id]
+        if not contact.name or _conflicts(party, contact):
+            continue
+        score = name_similarity(party.name, contact.name, max(threshold, best_score))
+        if score > best_score:
+            best, best_score = contact, score
+    return best
+
+
+def _chunks(items: Sequence, size: int) -> Iterable[Sequence]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+async def resolve_parties(
+    db: AsyncSession,
+    parties: Iterable[Tuple[int, Party]],
+    threshold: float = settings.CONTACT_NAME_THRESHOLD,
+) -> Dict[Tuple[int, Party], int]:
+    """Contact id for every (owner_id, party), creating contacts as needed, in the caller's transaction"""
+    parties = list(dict.fromkeys(parties))
+    if not parties:
+        return {}
+
+    # 1. Every key of every party, in a handful of queries
+    wanted = sorted({(owner_id, kind, value) for owner_id, party in parties for kind, value in party.keys()})
+    keyed: Dict[tuple, List[Any]] = defaultdict(list)
+    for chunk in _chunks(wanted, LOOKUP_CHUNK):
+        rows = await db.execute(
+            select(ContactKey.owner_id, ContactKey.kind, ContactKey.value, ContactKey.contact_id)
+            .where(tuple_(ContactKey.owner_id, ContactKey.kind, ContactKey.value).in_(chunk))
+        )
+        for owner_id, kind, value, contact_id in rows:
+            keyed[(owner_id, kind, value)].append(contact_id)
+    stored = {key: set(ids) for key, ids in keyed.items()}
+    known: Dict[Any, _Candidate] = {}
+    for chunk in _chunks(sorted({i for ids in keyed.values() for i in ids}), LOOKUP_CHUNK):
+        rows = await db.execute(
+            select(Contact.id, Contact.name_key, Contact.email, Contact.phone).where(Contact.id.in_(chunk))
+        )
+        for contact_id, name, email, phone in rows:
+            known[contact_id] = _Candidate(contact_id, name, email, normalize_phone(phone))
+
+    # 2. Match in memory; new contacts join the maps so later parties in the batch find them
+    resolved: Dict[Tuple[int, Party], _Candidate] = {}
+    created: Dict[Tuple[int, str], Tuple[Party, _Candidate]] = {}
+    for owner_id, party in parties:
+        contact = _match(party, keyed, known, owner_id, threshold)
+        if contact is None:
+            existing = created.get((owner_id, party.identity))
+            contact = existing[1] if existing else _Candidate(None, party.name, party.email, party.phone)
+            if not existing:
+                placeholder = ("new", len(created))
+                known[placeholder] = contact
+                for kind, value in party.keys():
+                    if kind == BLOCK or not keyed.get((owner_id, kind, value)):
+                        keyed[(owner_id, kind, value)].append(placeholder)
+                created[(owner_id, party.identity)] = (party, contact)
+        resolved[(owner_id, party)] = contact
+
+    # 3. Insert new contacts; one created concurrently under the same identity is reused
+    if created:
+        now = datetime.utcnow()
+        insert = dialect_insert(db.bind.dialect.name)
+        statement = insert(Contact).values([
+            {
+                "owner_id": owner_id,
+                "identity": identity,
+                "display_name": party.display_name or party.email or party.raw_phone,
+                "name_key": party.name,
+                "email": party.email,
+                "phone": party.raw_phone,
+                "created_at": now,
+            }
+            for (owner_id, identity), (party, _) in created.items()
+        ])
+        statement = statement.on_conflict_do_update(
+            index_elements=["owner_id", "identity"], set_={"identity": statement.excluded.identity}
+        ).returning(Contact.id, Contact.owner_id, Contact.identity)
+        for contact_id, owner_id, identity in await db.execute(statement):
+            created[(owner_id, identity)][1].id = contact_id
+
+    # 4. Record keys not yet stored for their contact; keys owned by another contact stay with it
+    new_keys = {
+        (owner_id, kind, value, contact.id)
+        for (owner_id, party), contact in resolved.items()
+        for kind, value in party.keys()
+        if contact.id not in stored.get((owner_id, kind, value), ())
+    }
+    if new_keys:
+        insert = dialect_insert(db.bind.dialect.name)
+        await db.execute(
+            insert(ContactKey).on_conflict_do_nothing(),
+            [{"owner_id": o, "kind": k, "value": v, "contact_id": c} for o, k, v, c in sorted(new_keys)],
+        )
+    return {key: contact.id for key, contact in resolved.items()}
+
+
+async def assign_contacts(db: AsyncSession, table_name: str, rows: List[Dict[str, Any]]):
+    """Set contact_id on row dicts about to be written to commitments or sales"""
+    name, email, phone = PARTY_COLUMNS[table_name]
+    parties = [Party.of(row.get(name), row.get(email), row.get(phone)) for row in rows]
+    contacts = await resolve_parties(
+        db, [(row["owner_id"], party) for row, party in zip(rows, parties) if party is not None]
+    )
+    for row, party in zip(rows, parties):
+        row["contact_id"] = contacts[(row["owner_id"], party)] if party is not None else None
+
+
+async def contact_for(db: AsyncSession, owner_id: int, name: Optional[str], email: Optional[str], phone: Optional[str]) -> Optional[int]:
+    """Contact id of one party (after an update to a row's party fields)"""
+    party = Party.of(name, email, phone)
+    if party is None:
+        return None
+    return (await resolve_parties(db, [(owner_id, party)]))[(owner_id, party)]
+
+
+async def reresolve_contacts(
+    db: AsyncSession,
+    table_name: str,
+    owner_id: Optional[int] = None,
+    batch_size: int = settings.CONTACT_RESOLVE_BATCH_SIZE,
+) -> int:
+    """Resolve every row of a table again in id order, one transaction per batch; returns rows whose contact changed"""
+    table = TABLES[table_name]
+    columns = PARTY_COLUMNS[table_name]
+    last_id, changed = 0, 0
+    while True:
+        query = (
+            select(table.c.id, table.c.owner_id, table.c.contact_id, *(table.c[name] for name in columns))
+            .where(table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(batch_size)
+        )
+        if owner_id is not None:
+            query = query.where(table.c.owner_id == owner_id)
+        rows = [dict(row) for row in (await db.execute(query)).mappings()]
+        if not rows:
+            return changed
+        last_id = rows[-1]["id"]
+        previous = [row["contact_id"] for row in rows]
+        await assign_contacts(db, table_name, rows)
+        updates = [
+            {"row_id": row["id"], "new_contact_id": row["contact_id"]}
+            for row, before in zip(rows, previous)
+            if row["contact_id"] != before
+        ]
+        if updates:
+            await db.execute(
+                update(table)
+                .where(table.c.id == bindparam("row_id"))
+                # Not an edit of the row: keep updated_at (archival and sync go by it)
+                .values(contact_id=bindparam("new_contact_id"), updated_at=table.c.updated_at),
+                updates,
+            )
+        await db.commit()
+        changed += len(updates)
+        logger.info("Contacts re-resolved for %s up to id %d (%d changed)", table_name, last_id, changed)
+
+
+async def _main(owner_id: Optional[int], table_names: List[str]):
+    from core.database import IngestSessionLocal, close_db
+    try:
+        for table_name in table_names:
+            async with IngestSessionLocal() as db:
+                changed = await reresolve_contacts(db, table_name, owner_id)
+            print(f"{table_name}: {changed} rows linked to a different contact")
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Re-resolve the contacts of commitments and sales")
+    parser.add_argument("--owner", type=int, help="only this owner's rows")
+    parser.add_argument("--table", choices=sorted(TABLES), action="append", help="default: both tables")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(args.owner, args.table or sorted(TABLES)))
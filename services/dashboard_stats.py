@@ -0,0 +1,286 @@
+"""
+Per-owner dashboard counters.
+
+dashboard_counters holds, per owner, the number of commitments in each
+(type, status) bucket and the number and value of sales in each
+(currency, status) bucket. Every write path collects a CounterDelta and
+applies it in its own transaction, so the counters commit or roll back
+with the rows they describe. The summary endpoint then reads a few dozen
+rows however many commitments an owner has.
+
+rebuild_counters() recomputes the counters from the base tables and fixes
+any drift, e.g. from rows written outside these code paths; the
+CounterReconciler runs it periodically. The rebuild is a single
+INSERT ... SELECT ... GROUP BY upsert, and on Postgres it holds an advisory
+lock that delta writers take shared, so a delta committed while the
+rebuild reads can't be overwritten by the absolute values it writes. Only
+one process (the holder of a second, session-level advisory lock) runs the
+periodic rebuild.
+"""
+
+import asyncio
+import logging
+import math
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from sqlalchemy import String, case, cast, delete, func, literal, or_, select, tuple_, union_all
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession, async_sessionmaker
+
+from core.config import get_settings
+from core.database import BackgroundSessionLocal, background_engine, dialect_insert
+from models.commitment import Commitment, CommitmentArchive
+from models.dashboard import DashboardCounter
+from models.sales import Sales
+from schemas.commitment import CommitmentTypeSchema
+from schemas.dashboard import DashboardSummary, PipelineTotals, StatusCounts
+from schemas.sales import SalesStatusSchema
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+COMMITMENTS = "commitments"
+SALES = "sales"
+
+# Columns a write path must return for the rows it inserted
+COUNTER_COLUMNS = {
+    Commitment.__tablename__: ("owner_id", "commitment_type", "status"),
+    Sales.__tablename__: ("owner_id", "currency", "status", "amount"),
+}
+
+CounterKey = Tuple[int, str, str, str]
+
+# Postgres advisory lock keys: delta writers take COUNTER_LOCK_KEY shared and
+# the rebuild exclusively; the reconciling process holds REBUILD_LEADER_KEY
+COUNTER_LOCK_KEY = 7_245_001
+REBUILD_LEADER_KEY = 7_245_002
+
+
+def _value(member: Any) -> str:
+    return getattr(member, "value", member) or ""
+
+
+def _counter_row(key: CounterKey, count: int, amount: float) -> Dict[str, Any]:
+    owner_id, scope, category, status = key
+    return {
+        "owner_id": owner_id,
+        "scope": scope,
+        "category": category,
+        "status": status,
+        "count": count,
+        "amount": amount,
+    }
+
+
+class CounterDelta:
+    """Counter changes collected by a writer and applied in its transaction"""
+
+    def __init__(self):
+        self.counts: Counter = Counter()
+        self.amounts: Counter = Counter()
+
+    def __bool__(self) -> bool:
+        return any(self.counts.values()) or any(self.amounts.values())
+
+    def add_commitment(self, owner_id: int, commitment_type: Any, status: Any, count: int = 1):
+        self.counts[(owner_id, COMMITMENTS, _value(commitment_type), _value(status))] += count
+
+    def add_sale(self, owner_id: int, currency: Optional[str], status: Any, amount: Optional[float], count: int = 1):
+        key = (owner_id, SALES, currency or "", _value(status))
+        self.counts[key] += count
+        self.amounts[key] += (amount or 0.0) * count
+
+    def add_rows(self, table_name: str, rows: Iterable[Mapping[str, Any]], count: int = 1):
+        """Count inserted (count=1) or deleted (count=-1) rows returned with COUNTER_COLUMNS"""
+        for row in rows:
+            if table_name == Commitment.__tablename__:
+                self.add_commitment(row["owner_id"], row["commitment_type"], row["status"], count)
+            else:
+                self.add_sale(row["owner_id"], row["currency"], row["status"], row["amount"], count)
+
+    async def apply(self, db: AsyncSession):
+        """Add the changes to the stored counters with one upsert"""
+        # Sorted keys make concurrent writers lock counter rows in the same order
+        rows = [
+            _counter_row(key, self.counts[key], self.amounts[key])
+            for key in sorted(set(self.counts) | set(self.amounts))
+            if self.counts[key] or self.amounts[key]
+        ]
+        if not rows:
+            return
+        if db.bind.dialect.name == "postgresql":
+            await db.execute(select(func.pg_advisory_xact_lock_shared(COUNTER_LOCK_KEY)))
+        statement = dialect_insert(db.bind.dialect.name)(DashboardCounter)
+        await db.execute(
+            statement.on_conflict_do_update(
+                index_elements=["owner_id", "scope", "category", "status"],
+                set_={
+                    "count": DashboardCounter.count + statement.excluded.count,
+                    "amount": DashboardCounter.amount + statement.excluded.amount,
+                },
+            ),
+            rows,
+        )
+        self.counts.clear()
+        self.amounts.clear()
+
+
+async def get_counters(db: AsyncSession, owner_id: int) -> List[DashboardCounter]:
+    """All counters of one owner (bounded by types x statuses, not by row count)"""
+    return list(await db.scalars(select(DashboardCounter).where(DashboardCounter.owner_id == owner_id)))
+
+
+def summarize(counters: Iterable[DashboardCounter]) -> DashboardSummary:
+    """Fold an owner's counters into the dashboard summary"""
+    summary = DashboardSummary(commitments=StatusCounts(), commitments_by_type={}, sales_by_status={})
+    for counter in counters:
+        if not counter.count:
+            continue
+        if counter.scope == COMMITMENTS:
+            by_type = summary.commitments_by_type.setdefault(CommitmentTypeSchema(counter.category), StatusCounts())
+            for counts in (summary.commitments, by_type):
+                setattr(counts, counter.status, getattr(counts, counter.status) + counter.count)
+                counts.total += counter.count
+        else:
+            totals = summary.sales_by_status.setdefault(SalesStatusSchema(counter.status), PipelineTotals())
+            totals.count += counter.count
+            if counter.category:
+                totals.value[counter.category] = totals.value.get(counter.category, 0.0) + counter.amount
+    return summary
+
+
+def _enum_value(column):
+    """SQL mapping a stored enum name to its value, the way CounterDelta keys it"""
+    return case({member.name: member.value for member in column.type.enum_class}, value=cast(column, String))
+
+
+def _expected_counters(owner_ids: Optional[List[int]] = None):
+    """Per-bucket counts and sales value computed from the base tables"""
+    parts = [
+        select(
+            model.owner_id,
+            literal(COMMITMENTS, String).label("scope"),
+            _enum_value(model.commitment_type).label("category"),
+            _enum_value(model.status).label("status"),
+            func.count().label("count"),
+            literal(0.0).label("amount"),
+        ).group_by(model.owner_id, model.commitment_type, model.status)
+        for model in (Commitment, CommitmentArchive)
+    ]
+    parts.append(
+        select(
+            Sales.owner_id,
+            literal(SALES, String).label("scope"),
+            func.coalesce(Sales.currency, "").label("category"),
+            _enum_value(Sales.status).label("status"),
+            func.count().label("count"),
+            func.coalesce(func.sum(Sales.amount), 0.0).label("amount"),
+        ).group_by(Sales.owner_id, Sales.currency, Sales.status)
+    )
+    if owner_ids is not None:
+        parts = [part.where(part.selected_columns.owner_id.in_(owner_ids)) for part in parts]
+    buckets = union_all(*parts).subquery()
+    key = (buckets.c.owner_id, buckets.c.scope, buckets.c.category, buckets.c.status)
+    # Hot and archived commitments (and NULL and "" currencies) share buckets
+    return select(*key, func.sum(buckets.c.count), func.sum(buckets.c.amount)).group_by(*key)
+
+
+async def rebuild_counters(db: AsyncSession, owner_ids: Optional[List[int]] = None) -> int:
+    """Recompute counters from commitments (hot and archived) and sales; returns how many were corrected"""
+    if db.bind.dialect.name == "postgresql":
+        # Waits for writers that applied a delta to commit; later ones wait for this rebuild
+        await db.execute(select(func.pg_advisory_xact_lock(COUNTER_LOCK_KEY)))
+    expected = _expected_counters(owner_ids)
+    statement = dialect_insert(db.bind.dialect.name)(DashboardCounter).from_select(
+        ["owner_id", "scope", "category", "status", "count", "amount"], expected
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=["owner_id", "scope", "category", "status"],
+        set_={"count": statement.excluded.count, "amount": statement.excluded.amount},
+        where=or_(
+            DashboardCounter.count != statement.excluded.count,
+            func.abs(DashboardCounter.amount - statement.excluded.amount) > 1e-6,
+        ),
+    )
+    corrected = len((await db.execute(statement.returning(DashboardCounter.owner_id))).all())
+
+    # Buckets that no longer have rows; zeroed counters left by deltas are harmless and skipped
+    key = (DashboardCounter.owner_id, DashboardCounter.scope, DashboardCounter.category, DashboardCounter.status)
+    stale = delete(DashboardCounter).where(
+        or_(DashboardCounter.count != 0, DashboardCounter.amount != 0),
+        tuple_(*key).not_in(select(*expected.subquery().c[:4])),
+    )
+    if owner_ids is not None:
+        stale = stale.where(DashboardCounter.owner_id.in_(owner_ids))
+    corrected += (await db.execute(stale)).rowcount
+    await db.commit()
+    return corrected
+
+
+async def lead_rebuilds(conn: AsyncConnection) -> bool:
+    """Whether this connection won the right to run periodic rebuilds"""
+    # Session-level: held until the connection closes, across the commit below
+    won = await conn.scalar(select(func.pg_try_advisory_lock(REBUILD_LEADER_KEY)))
+    await conn.commit()
+    return bool(won)
+
+
+class CounterReconciler:
+    """Periodically rebuilds all counters and logs how far they had drifted
+
+    On Postgres only the process holding the leader lock rebuilds; the others
+    retry every interval and take over when its connection goes away.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker = BackgroundSessionLocal,
+        engine: AsyncEngine = background_engine,
+        interval: float = settings.DASHBOARD_REBUILD_SECONDS,
+    ):
+        self.session_factory = session_factory
+        self.engine = engine
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the reconcile loop; the first rebuild runs immediately"""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Cancel the reconcile loop"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run(self):
+        while True:
+            try:
+                if self.engine.dialect.name != "postgresql":
+                    await self._reconcile()
+                async with self.engine.connect() as leader:
+                    if await lead_rebuilds(leader):
+                        await self._reconcile(leader)
+            except Exception:
+                logger.exception("Dashboard counter rebuild failed")
+            await asyncio.sleep(self.interval)
+
+    async def _reconcile(self, leader: Optional[AsyncConnection] = None):
+        """Rebuild every interval; raises once the leader connection (and its lock) is gone"""
+        while True:
+            async with self.session_factory() as db:
+                corrected = await rebuild_counters(db)
+            if corrected:
+                logger.warning("Dashboard counters drifted: corrected %d", corrected)
+            await asyncio.sleep(self.interval)
+            if leader is not None:
+                await leader.execute(select(1))
+                await leader.commit()
+
+
+counter_reconciler = CounterReconciler()
@@ -0,0 +1,172 @@
+"""
+Overdue sweeper and deadline scheduler for commitments.
+
+The scheduler keeps an in-memory min-heap of upcoming deadlines so it can
+sleep until the next one falls due instead of polling. When it wakes, the
+sweep itself is set-based: the database decides which rows are overdue, so
+stale heap entries (completed or rescheduled commitments) are harmless.
+"""
+
+import asyncio
+import heapq
+import logging
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from core.config import get_settings
+from core.database import BackgroundSessionLocal
+from models.commitment import Commitment, CommitmentStatus, OPEN_STATUSES
+from schemas.types import to_naive_utc
+from services.dashboard_stats import COMMITMENTS, CounterDelta
+from services.realtime import ChangeSet
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+async def sweep_overdue(
+    db: AsyncSession,
+    now: Optional[datetime] = None,
+    batch_size: Optional[int] = None,
+) -> int:
+    """Flip open commitments past their deadline to OVERDUE, one bulk UPDATE per status and batch"""
+    now = now or datetime.utcnow()
+    batch_size = batch_size or settings.OVERDUE_SWEEP_BATCH_SIZE
+    total = 0
+
+    # One status at a time so RETURNING tells the dashboard counters where rows came from
+    for status in OPEN_STATUSES:
+        while True:
+            due_ids = (
+                select(Commitment.id)
+                .where(Commitment.status == status, Commitment.deadline <= now)
+                .order_by(Commitment.deadline)
+                .limit(batch_size)
+                .scalar_subquery()
+            )
+            flipped = (
+                await db.execute(
+                    update(Commitment)
+                    # Re-checked after a lock wait, so a row flipped concurrently is not counted twice
+                    .where(Commitment.id.in_(due_ids), Commitment.status == status)
+                    .values(status=CommitmentStatus.OVERDUE, updated_at=now)
+                    .returning(Commitment.id, Commitment.owner_id, Commitment.commitment_type)
+                    .execution_options(synchronize_session=False)
+                )
+            ).all()
+            delta = CounterDelta()
+            changes = ChangeSet()
+            for commitment_id, owner_id, commitment_type in flipped:
+                delta.add_commitment(owner_id, commitment_type, status, -1)
+                delta.add_commitment(owner_id, commitment_type, CommitmentStatus.OVERDUE)
+                changes.add(owner_id, COMMITMENTS, [commitment_id])
+            await delta.apply(db)
+            await changes.publish(db)
+            await db.commit()
+            total += len(flipped)
+            if len(flipped) < batch_size:
+                break
+    return total
+
+
+class DeadlineScheduler:
+    """Wakes up when the next commitment deadline passes and sweeps overdue rows"""
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker = BackgroundSessionLocal,
+        horizon: timedelta = timedelta(seconds=settings.OVERDUE_SCHEDULER_HORIZON_SECONDS),
+    ):
+        self.session_factory = session_factory
+        self.horizon = horizon
+        self._heap: List[datetime] = []
+        self._horizon_end = datetime.min
+        self._refill_at = datetime.min
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def schedule(self, deadline: datetime):
+        """Register a new or moved deadline so the scheduler wakes up for it"""
+        self.schedule_many([deadline])
+
+    def schedule_many(self, deadlines: Iterable[datetime]):
+        """Register several deadlines, e.g. after a bulk ingest"""
+        earliest = self._heap[0] if self._heap else None
+        for deadline in deadlines:
+            # Callers run this after their commit, so a stray aware datetime must not fail the request
+            if deadline is None:
+                continue
+            deadline = to_naive_utc(deadline)
+            # Deadlines past the horizon are picked up by the next refill
+            if deadline <= self._horizon_end:
+                heapq.heappush(self._heap, deadline)
+        if self._heap and self._heap[0] != earliest:
+            self._wakeup.set()
+
+    def start(self):
+        """Start the scheduler loop on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Cancel the scheduler loop"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def refill(self, now: datetime):
+        """Load deadlines falling inside the next horizon window into the heap"""
+        self._horizon_end = now + self.horizon
+        self._refill_at = now + self.horizon / 2
+        async with self.session_factory() as db:
+            result = await db.scalars(
+                select(Commitment.deadline).where(
+                    Commitment.status.in_(OPEN_STATUSES),
+                    Commitment.deadline > now,
+                    Commitment.deadline <= self._horizon_end,
+                )
+            )
+            self._heap = list(result.all())
+        heapq.heapify(self._heap)
+
+    async def run(self):
+        """Sweep, then sleep until the earliest deadline or the horizon refill"""
+        while True:
+            self._wakeup.clear()
+            now = datetime.utcnow()
+            retry_after = 0.0
+            try:
+                async with self.session_factory() as db:
+                    flipped = await sweep_overdue(db, now=now)
+                if flipped:
+                    logger.info("Marked %d commitments overdue", flipped)
+
+                while self._heap and self._heap[0] <= now:
+                    heapq.heappop(self._heap)
+                if now >= self._refill_at:
+                    await self.refill(now)
+            except Exception:
+                logger.exception("Overdue sweep failed")
+                retry_after = settings.OVERDUE_SCHEDULER_RETRY_SECONDS
+
+            wake_at = self._refill_at
+            if self._heap:
+                wake_at = min(wake_at, self._heap[0])
+            timeout = max((wake_at - datetime.utcnow()).total_seconds(), retry_after)
+
+            # asyncio.timeout rather than wait_for, which on 3.11 can swallow stop()'s cancel when the event fires at the same time
+            try:
+                async with asyncio.timeout(timeout):
+                    await self._wakeup.wait()
+            except TimeoutError:
+                pass
+
+
+deadline_scheduler = DeadlineScheduler()
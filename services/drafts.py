@@ -0,0 +1,284 @@
+"""
+Follow-up drafts for commitments, streamed from the local LLM.
+
+A draft is a short email to the commitment's party: a payment reminder
+for invoice and payment commitments, a follow-up otherwise. It is
+generated with ai_engine.stream(), so clients see tokens as the model
+writes them, and it is saved to draft_content with auto_drafted set.
+
+Similar commitments of one owner share a template. The cache key is the
+owner, the model, the prompt version, the commitment type, the party and
+the action with whitespace, case and digits normalized, so an owner's
+"Send invoice 1042 to Acme" and "Send invoice 1043 to Acme" share a key.
+The prompt asks the model to quote the action and the deadline verbatim.
+A finished draft that does so is cached as a template with those values
+(and the party) replaced by slots; the next commitment with the same key
+gets that template filled with its own values instead of a model call.
+Drafts that paraphrase are not cached, nor are drafts that still repeat a
+number from the action or a word of the party's name outside the slots
+("Invoice 1042 totals $5,300."), which would go stale when filled.
+
+DraftPregenerator drafts open commitments due within
+DRAFT_PREGENERATE_HOURS in the background. Template hits are filled
+immediately; drafts that need the model wait until ai_engine is idle, so
+extraction and interactive drafts always go first.
+"""
+
+import asyncio
+import hashlib
+import logging
+import re
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import AsyncIterator, List, Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from core.config import get_settings
+from core.database import BackgroundSessionLocal
+from models.commitment import Commitment, CommitmentType, OPEN_STATUSES
+from models.extraction_cache import DraftTemplate
+from services.ai_engine import AIEngine, ai_engine, normalize_text
+from services.extraction_cache import ExtractionCache
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Bump whenever the draft prompt changes (2: drops templates cached before owner-scoped keys)
+DRAFT_PROMPT_VERSION = 2
+
+DRAFT_PROMPT = """Write a short, polite {kind} email to {party}.
+It is about this commitment: "{action}", due {deadline}.
+Quote "{action}" and "{deadline}" exactly as written here.
+Reply with the email body only: no subject line, no placeholders."""
+
+# Commitment types drafted as payment reminders
+REMINDER_TYPES = (CommitmentType.INVOICE, CommitmentType.PAYMENT)
+
+# Slot markers in cached templates
+PARTY_SLOT = "[[party]]"
+ACTION_SLOT = "[[action]]"
+DEADLINE_SLOT = "[[deadline]]"
+
+_DIGITS = re.compile(r"\d+")
+_WORDS = re.compile(r"\w{2,}")
+
+
+@dataclass
+class DraftSubject:
+    """What a draft is about: the values filled into its template"""
+    owner_id: int
+    commitment_type: CommitmentType
+    action: str
+    deadline: datetime
+    party: Optional[str] = None
+
+    @classmethod
+    def of(cls, commitment) -> "DraftSubject":
+        """From a Commitment or a row with the same columns"""
+        return cls(
+            owner_id=commitment.owner_id,
+            commitment_type=commitment.commitment_type,
+            action=commitment.action,
+            deadline=commitment.deadline,
+            party=commitment.party_name or commitment.party_email,
+        )
+
+    @property
+    def deadline_text(self) -> str:
+        return f"{self.deadline:%A}, {self.deadline:%B} {self.deadline.day}, {self.deadline.year}"
+
+    def key(self, model: str) -> str:
+        """Template cache key: owner, model, prompt version, type, party and normalized action"""
+        action = _DIGITS.sub("#", normalize_text(self.action).lower())
+        party = normalize_text(self.party or "").lower()
+        raw = f"{self.owner_id}\0{model}\0{DRAFT_PROMPT_VERSION}\0{self.commitment_type.value}\0{party}\0{action}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def slots(self) -> List[Tuple[str, str]]:
+        """(marker, value) pairs, longest value first so a party named inside the action stays in it"""
+        pairs = [(ACTION_SLOT, self.action), (DEADLINE_SLOT, self.deadline_text)]
+        if self.party:
+            pairs.append((PARTY_SLOT, self.party))
+        return sorted(pairs, key=lambda pair: len(pair[1]), reverse=True)
+
+
+def build_prompt(subject: DraftSubject) -> str:
+    """Prompt for one draft"""
+    return DRAFT_PROMPT.format(
+        kind="payment reminder" if subject.commitment_type in REMINDER_TYPES else "follow-up",
+        party=subject.party or "the other party",
+        action=subject.action,
+        deadline=subject.deadline_text,
+    )
+
+
+def templatize(draft: str, subject: DraftSubject) -> Optional[str]:
+    """The draft with its subject's values replaced by slots
+
+    None unless it quotes action and deadline, or if a number from the action
+    or a word of the party is left outside the slots.
+    """
+    if subject.action not in draft or subject.deadline_text not in draft:
+        return None
+    for marker, value in subject.slots():
+        draft = draft.replace(value, marker)
+    leftovers = [rf"(?<!\d){digits}(?!\d)" for digits in _DIGITS.findall(subject.action)]
+    leftovers += [rf"\b{re.escape(word)}\b" for word in _WORDS.findall(subject.party or "")]
+    if any(re.search(pattern, draft, re.IGNORECASE) for pattern in leftovers):
+        return None
+    return draft
+
+
+def fill(template: str, subject: DraftSubject) -> str:
+    """A cached template with this subject's values in its slots"""
+    for marker, value in subject.slots():
+        template = template.replace(marker, value)
+    return template
+
+
+class DraftService:
+    """Draft generation backed by the template cache"""
+
+    def __init__(self, engine: AIEngine = ai_engine, max_entries: int = settings.DRAFT_CACHE_SIZE):
+        self.engine = engine
+        self.cache = ExtractionCache(
+            engine.model, DRAFT_PROMPT_VERSION, str, str, max_entries=max_entries, table=DraftTemplate
+        )
+        self.stats: Counter = Counter()
+
+    async def cached(self, subject: DraftSubject) -> Optional[str]:
+        """The draft filled from a cached template, if there is one"""
+        template = await self.cache.get(subject.key(self.engine.model))
+        if template is None:
+            return None
+        self.stats["template_hits"] += 1
+        return fill(template, subject)
+
+    async def stream(self, subject: DraftSubject) -> AsyncIterator[str]:
+        """Generate a draft with the model, yielding tokens; the finished draft becomes a template"""
+        parts = []
+        async for token in self.engine.stream(build_prompt(subject)):
+            parts.append(token)
+            yield token
+        self.stats["generated"] += 1
+        template = templatize("".join(parts).strip(), subject)
+        if template is None:
+            self.stats["not_templatable"] += 1
+            return
+        await self.cache.set_many({subject.key(self.engine.model): template})
+
+
+async def save_draft(db: AsyncSession, owner_id: int, commitment_id: int, draft: str, overwrite: bool = True) -> bool:
+    """Store a draft on a commitment; with overwrite=False an existing draft is kept"""
+    statement = (
+        update(Commitment)
+        .where(Commitment.id == commitment_id, Commitment.owner_id == owner_id)
+        .values(draft_content=draft, auto_drafted=True)
+        .execution_options(synchronize_session=False)
+    )
+    if not overwrite:
+        statement = statement.where(Commitment.draft_content.is_(None))
+    result = await db.execute(statement)
+    await db.commit()
+    return result.rowcount > 0
+
+
+class DraftPregenerator:
+    """Drafts open commitments with upcoming deadlines while the model has nothing else to do"""
+
+    def __init__(
+        self,
+        service: Optional[DraftService] = None,
+        session_factory: async_sessionmaker = BackgroundSessionLocal,
+        hours: int = settings.DRAFT_PREGENERATE_HOURS,
+        batch_size: int = settings.DRAFT_PREGENERATE_BATCH,
+        interval: float = settings.DRAFT_PREGENERATE_INTERVAL_SECONDS,
+        idle_poll: float = settings.DRAFT_IDLE_POLL_SECONDS,
+    ):
+        self.service = service or draft_service
+        self.session_factory = session_factory
+        self.hours = hours
+        self.batch_size = batch_size
+        self.interval = interval
+        self.idle_poll = idle_poll
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the pre-generation loop; disabled when DRAFT_PREGENERATE_HOURS is 0"""
+        if self._task is None and self.hours > 0:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Cancel the pre-generation loop"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run(self):
+        while True:
+            try:
+                drafted = await self.run_once()
+                if drafted:
+                    logger.info("Pre-generated %d drafts", drafted)
+            except Exception:
+                logger.exception("Draft pre-generation failed")
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self, now: Optional[datetime] = None) -> int:
+        """Draft up to batch_size undrafted open commitments due soon; returns how many were saved"""
+        now = now or datetime.utcnow()
+        async with self.session_factory() as db:
+            rows = (
+                await db.execute(
+                    select(
+                        Commitment.id,
+                        Commitment.owner_id,
+                        Commitment.commitment_type,
+                        Commitment.action,
+                        Commitment.deadline,
+                        Commitment.party_name,
+                        Commitment.party_email,
+                    )
+                    # ix_commitments_status_deadline
+                    .where(
+                        Commitment.status.in_(OPEN_STATUSES),
+                        Commitment.deadline >= now,
+                        Commitment.deadline < now + timedelta(hours=self.hours),
+                        Commitment.draft_content.is_(None),
+                    )
+                    .order_by(Commitment.deadline)
+                    .limit(self.batch_size)
+                )
+            ).all()
+
+        drafted = 0
+        for row in rows:
+            subject = DraftSubject.of(row)
+            try:
+                draft = await self.service.cached(subject)
+                if draft is None:
+                    await self.wait_until_idle()
+                    draft = "".join([token async for token in self.service.stream(subject)])
+                async with self.session_factory() as db:
+                    # A draft written meanwhile (by its owner or another node) wins
+                    if await save_draft(db, row.owner_id, row.id, draft.strip(), overwrite=False):
+                        drafted += 1
+                        self.service.stats["pregenerated"] += 1
+            except Exception as exc:
+                logger.warning("Could not pre-generate a draft for commitment %d: %s", row.id, exc)
+        return drafted
+
+    async def wait_until_idle(self):
+        while not self.service.engine.is_idle():
+            await asyncio.sleep(self.idle_poll)
+
+
+draft_service = DraftService()
+draft_pregenerator = DraftPregenerator()
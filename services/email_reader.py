@@ -0,0 +1,478 @@
+"""
+Incremental, streaming mailbox ingestion.
+
+Readers for IMAP, mbox and Maildir are generators that resume from a
+per-folder checkpoint and yield messages one at a time with only their
+headers parsed; bodies are fetched lazily when text() is first called.
+ingest_mailbox() pulls messages in small batches, skips ones whose
+source_message_id was already ingested, runs extraction on the rest and
+advances the checkpoint after each committed batch, so memory stays
+bounded and a re-run over an unchanged mailbox does almost no work.
+"""
+
+import asyncio
+import email
+import hashlib
+import html
+import imaplib
+import itertools
+import logging
+import os
+import re
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email import policy
+from email.message import EmailMessage
+from email.parser import BytesHeaderParser, BytesParser
+from email.utils import parseaddr, parsedate_to_datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import get_settings
+from core.database import dialect_insert
+from models.mailbox import IngestedMessage, MailboxCheckpoint
+from schemas.commitment import CommitmentCreate
+from services import bulk_ingest
+from services.ai_engine import ExtractedCommitment, ai_engine
+from services.commitment_service import commitments_from_extraction
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+SOURCE = "email"
+
+HEADER_PARSER = BytesHeaderParser(policy=policy.default)
+MESSAGE_PARSER = BytesParser(policy=policy.default)
+
+TAG_PATTERN = re.compile(r"<(script|style)[^>]*>.*?</\1>|<[^>]+>", re.S | re.I)
+
+
+@dataclass
+class Checkpoint:
+    """Where a reader should resume within one folder"""
+    uidvalidity: Optional[int] = None
+    position: Optional[str] = None
+
+
+def html_to_text(markup: str) -> str:
+    """Crude tag stripper for HTML-only messages"""
+    return html.unescape(TAG_PATTERN.sub(" ", markup))
+
+
+def header_message_id(headers: email.message.Message) -> str:
+    """Message-ID header, or a stable hash of the headers when it is missing"""
+    message_id = str(headers.get("Message-ID") or "").strip().strip("<>")
+    if message_id:
+        return message_id[:255]
+    raw = "\n".join(f"{k}: {v}" for k, v in headers.items())
+    return "sha256:" + hashlib.sha256(raw.encode("utf-8", "replace")).hexdigest()
+
+
+def header_date(headers: email.message.Message) -> Optional[datetime]:
+    """Date header as naive UTC"""
+    try:
+        sent = parsedate_to_datetime(str(headers.get("Date")))
+    except (TypeError, ValueError):
+        return None
+    if sent.tzinfo is not None:
+        sent = sent.astimezone(timezone.utc).replace(tzinfo=None)
+    return sent
+
+
+def message_text(message: EmailMessage) -> str:
+    """Subject and plain-text body of a parsed message"""
+    part = message.get_body(preferencelist=("plain", "html"))
+    body = ""
+    if part is not None:
+        try:
+            body = part.get_content()
+        except (LookupError, ValueError):
+            body = part.get_payload(decode=True).decode("utf-8", "replace")
+        if part.get_content_subtype() == "html":
+            body = html_to_text(body)
+    return f"{message.get('Subject') or ''}\n\n{body}".strip()
+
+
+class MailMessage:
+    """A mailbox message with parsed headers and a lazily fetched body"""
+
+    __slots__ = ("folder", "position", "uidvalidity", "headers", "_fetch", "_text")
+
+    def __init__(
+        self,
+        folder: str,
+        position: str,
+        headers: email.message.Message,
+        fetch: Callable[[], bytes],
+        uidvalidity: Optional[int] = None,
+    ):
+        self.folder = folder
+        self.position = position
+        self.uidvalidity = uidvalidity
+        self.headers = headers
+        self._fetch = fetch
+        self._text: Optional[str] = None
+
+    @property
+    def source_message_id(self) -> str:
+        return header_message_id(self.headers)
+
+    @property
+    def subject(self) -> str:
+        return str(self.headers.get("Subject") or "")
+
+    @property
+    def sender(self) -> Tuple[str, str]:
+        """(display name, address) of the From header"""
+        return parseaddr(str(self.headers.get("From") or ""))
+
+    @property
+    def date(self) -> Optional[datetime]:
+        """Sent date as naive UTC"""
+        return header_date(self.headers)
+
+    def raw(self) -> bytes:
+        """Full RFC 822 message, fetched from the mailbox"""
+        return self._fetch()
+
+    def text(self) -> str:
+        """Subject and plain-text body; fetches the body on first use"""
+        if self._text is None:
+            self._text = message_text(MESSAGE_PARSER.parsebytes(self.raw()))
+        return self._text
+
+
+class ImapReader:
+    """Reads new messages from IMAP folders by UID"""
+
+    def __init__(
+        self,
+        host: str,
+        username: str,
+        password: str,
+        folders: Tuple[str, ...] = ("INBOX",),
+        port: int = 993,
+        use_ssl: bool = True,
+        fetch_chunk: int = 500,
+    ):
+        self.host = host
+        self.username = username
+        self.password = password
+        self.folders = folders
+        self.port = port
+        self.use_ssl = use_ssl
+        self.fetch_chunk = fetch_chunk
+        self.account = f"imap://{username}@{host}:{port}"
+        self._conn: Optional[imaplib.IMAP4] = None
+
+    def connect(self) -> imaplib.IMAP4:
+        """Open and log in the connection shared by header and body fetches"""
+        if self._conn is None:
+            conn = imaplib.IMAP4_SSL(self.host, self.port) if self.use_ssl else imaplib.IMAP4(self.host, self.port)
+            conn.login(self.username, self.password)
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        """Log out; lazily fetched bodies are unavailable afterwards"""
+        if self._conn is not None:
+            try:
+                self._conn.logout()
+            except (imaplib.IMAP4.error, OSError):
+                pass
+            self._conn = None
+
+    def messages(self, checkpoints: Dict[str, Checkpoint]) -> Iterator[MailMessage]:
+        """Yield messages with UID above each folder's checkpoint, headers only"""
+        conn = self.connect()
+        for folder in self.folders:
+            yield from self._folder_messages(conn, folder, checkpoints.get(folder, Checkpoint()))
+
+    def _folder_messages(self, conn: imaplib.IMAP4, folder: str, checkpoint: Checkpoint) -> Iterator[MailMessage]:
+        typ, _ = conn.select(f'"{folder}"', readonly=True)
+        if typ != "OK":
+            logger.warning("Cannot select IMAP folder %s", folder)
+            return
+        _, data = conn.response("UIDVALIDITY")
+        uidvalidity = int(data[0]) if data and data[0] else None
+
+        last_uid = 0
+        if checkpoint.position and checkpoint.uidvalidity == uidvalidity:
+            last_uid = int(checkpoint.position)
+
+        _, data = conn.uid("SEARCH", None, f"UID {last_uid + 1}:*")
+        # "N:*" always matches the highest UID, even when it is <= N
+        uids = [uid for uid in (int(u) for u in data[0].split()) if uid > last_uid]
+
+        for start in range(0, len(uids), self.fetch_chunk):
+            chunk = uids[start:start + self.fetch_chunk]
+            _, data = conn.uid("FETCH", ",".join(map(str, chunk)), "(UID BODY.PEEK[HEADER])")
+            for item in data:
+                if not isinstance(item, tuple):
+                    continue
+                match = re.search(rb"UID (\d+)", item[0])
+                if not match:
+                    continue
+                uid = int(match.group(1))
+                yield MailMessage(
+                    folder=folder,
+                    position=str(uid),
+                    headers=HEADER_PARSER.parsebytes(item[1]),
+                    fetch=lambda uid=uid: self._fetch_body(conn, uid),
+                    uidvalidity=uidvalidity,
+                )
+
+    @staticmethod
+    def _fetch_body(conn: imaplib.IMAP4, uid: int) -> bytes:
+        _, data = conn.uid("FETCH", str(uid), "(BODY.PEEK[])")
+        for item in data:
+            if isinstance(item, tuple):
+                return item[1]
+        return b""
+
+
+class MboxReader:
+    """Streams an mbox file from a byte offset without building a table of contents"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.account = f"mbox://{os.path.abspath(path)}"
+        self.folder = os.path.basename(path)
+
+    def messages(self, checkpoints: Dict[str, Checkpoint]) -> Iterator[MailMessage]:
+        """Yield messages starting after the checkpointed offset, headers only"""
+        checkpoint = checkpoints.get(self.folder, Checkpoint())
+        offset = int(checkpoint.position or 0)
+        if offset > os.path.getsize(self.path):
+            # File was truncated or replaced; start over
+            offset = 0
+
+        with open(self.path, "rb") as scan:
+            scan.seek(offset)
+            start = None
+            header_lines: List[bytes] = []
+            in_headers = False
+            position = offset
+            for line in iter(scan.readline, b""):
+                if line.startswith(b"From "):
+                    if start is not None:
+                        yield self._message(start, position, header_lines)
+                    start, header_lines, in_headers = position + len(line), [], True
+                elif in_headers:
+                    if line.strip():
+                        header_lines.append(line)
+                    else:
+                        in_headers = False
+                position += len(line)
+            if start is not None:
+                yield self._message(start, position, header_lines)
+
+    def close(self):
+        pass
+
+    def _message(self, start: int, end: int, header_lines: List[bytes]) -> MailMessage:
+        def fetch() -> bytes:
+            with open(self.path, "rb") as bodies:
+                bodies.seek(start)
+                raw = bodies.read(end - start)
+            # Undo mboxrd ">From " quoting
+            return re.sub(rb"(?m)^>(>*From )", rb"\1", raw)
+
+        return MailMessage(
+            folder=self.folder,
+            position=str(end),
+            headers=HEADER_PARSER.parsebytes(b"".join(header_lines)),
+            fetch=fetch,
+        )
+
+
+class MaildirReader:
+    """Reads Maildir messages delivered after the checkpointed (mtime, name)"""
+
+    def __init__(self, path: str, folders: Optional[Tuple[str, ...]] = None):
+        self.path = path
+        self.account = f"maildir://{os.path.abspath(path)}"
+        self.folders = folders
+
+    def _folders(self) -> List[Tuple[str, str]]:
+        if self.folders is not None:
+            return [(name, self.path if name == "INBOX" else os.path.join(self.path, name)) for name in self.folders]
+        folders = [("INBOX", self.path)]
+        for entry in sorted(os.listdir(self.path)):
+            if entry.startswith(".") and os.path.isdir(os.path.join(self.path, entry, "cur")):
+                folders.append((entry.lstrip("."), os.path.join(self.path, entry)))
+        return folders
+
+    def close(self):
+        pass
+
+    def messages(self, checkpoints: Dict[str, Checkpoint]) -> Iterator[MailMessage]:
+        """Yield messages newer than each folder's checkpoint, oldest first"""
+        for folder, folder_path in self._folders():
+            checkpoint = checkpoints.get(folder, Checkpoint())
+            after: Tuple[int, str] = (-1, "")
+            if checkpoint.position:
+                mtime, _, name = checkpoint.position.partition(":")
+                after = (int(mtime), name)
+
+            entries = []
+            for subdir in ("new", "cur"):
+                directory = os.path.join(folder_path, subdir)
+                if not os.path.isdir(directory):
+                    continue
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        if entry.is_file() and not entry.name.startswith("."):
+                            key = (entry.stat().st_mtime_ns, entry.name.split(":")[0])
+                            if key > after:
+                                entries.append((key, entry.path))
+            entries.sort()
+
+            for (mtime, name), path in entries:
+                with open(path, "rb") as handle:
+                    header_bytes = b"".join(itertools.takewhile(lambda line: line.strip(), handle))
+                yield MailMessage(
+                    folder=folder,
+                    position=f"{mtime}:{name}",
+                    headers=HEADER_PARSER.parsebytes(header_bytes),
+                    fetch=lambda path=path: _read_file(path),
+                )
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as handle:
+        return handle.read()
+
+
+async def load_checkpoints(db: AsyncSession, owner_id: int, account: str) -> Dict[str, Checkpoint]:
+    """Per-folder resume positions for one mailbox"""
+    rows = await db.scalars(
+        select(MailboxCheckpoint).where(
+            MailboxCheckpoint.owner_id == owner_id,
+            MailboxCheckpoint.account == account,
+        )
+    )
+    return {row.folder: Checkpoint(row.uidvalidity, row.position) for row in rows}
+
+
+async def save_checkpoints(db: AsyncSession, owner_id: int, account: str, positions: Dict[str, MailMessage]):
+    """Upsert the last processed message position of each folder"""
+    if not positions:
+        return
+    insert = dialect_insert(db.bind.dialect.name)
+    now = datetime.utcnow()
+    statement = insert(MailboxCheckpoint).values([
+        {
+            "owner_id": owner_id,
+            "account": account,
+            "folder": folder,
+            "uidvalidity": message.uidvalidity,
+            "position": message.position,
+            "updated_at": now,
+        }
+        for folder, message in positions.items()
+    ])
+    await db.execute(
+        statement.on_conflict_do_update(
+            index_elements=["owner_id", "account", "folder"],
+            set_={
+                "uidvalidity": statement.excluded.uidvalidity,
+                "position": statement.excluded.position,
+                "updated_at": statement.excluded.updated_at,
+            },
+        )
+    )
+
+
+async def seen_message_ids(db: AsyncSession, owner_id: int, source: str, message_ids: List[str]) -> set:
+    """Which of these source message ids were already ingested"""
+    rows = await db.scalars(
+        select(IngestedMessage.source_message_id).where(
+            IngestedMessage.owner_id == owner_id,
+            IngestedMessage.source == source,
+            IngestedMessage.source_message_id.in_(message_ids),
+        )
+    )
+    return set(rows)
+
+
+async def mark_ingested(db: AsyncSession, owner_id: int, source: str, found: Dict[str, int]):
+    """Record source message ids (with their commitment counts) as ingested"""
+    if not found:
+        return
+    now = datetime.utcnow()
+    insert = dialect_insert(db.bind.dialect.name)
+    await db.execute(
+        insert(IngestedMessage).on_conflict_do_nothing(),
+        [
+            {
+                "owner_id": owner_id,
+                "source": source,
+                "source_message_id": message_id,
+                "commitments_found": count,
+                "ingested_at": now,
+            }
+            for message_id, count in found.items()
+        ],
+    )
+
+
+def commitment_records(message: MailMessage, extracted: List[ExtractedCommitment]) -> List[CommitmentCreate]:
+    """Commitments the model found in one message"""
+    name, address = message.sender
+    return commitments_from_extraction(
+        extracted,
+        message.text(),
+        source=SOURCE,
+        source_message_id=message.source_message_id,
+        party_name=name or None,
+        party_email=address or None,
+        sent_at=message.date,
+    )
+
+
+async def ingest_mailbox(
+    db: AsyncSession,
+    reader,
+    owner_id: int,
+    batch_size: int = settings.EMAIL_BATCH_SIZE,
+) -> Dict[str, int]:
+    """Stream a mailbox through extraction into commitments, checkpointing per batch"""
+    stats = {"seen": 0, "skipped": 0, "extracted": 0, "commitments": 0}
+    checkpoints = await load_checkpoints(db, owner_id, reader.account)
+    messages = reader.messages(checkpoints)
+
+    try:
+        while True:
+            # Readers block on disk / network I/O, so pull each batch in a worker thread
+            batch: List[MailMessage] = await asyncio.to_thread(list, itertools.islice(messages, batch_size))
+            if not batch:
+                break
+            stats["seen"] += len(batch)
+
+            seen = await seen_message_ids(db, owner_id, SOURCE, [m.source_message_id for m in batch])
+            fresh = list({m.source_message_id: m for m in batch if m.source_message_id not in seen}.values())
+            stats["skipped"] += len(batch) - len(fresh)
+
+            texts = await asyncio.to_thread(lambda: [m.text() for m in fresh])
+            extracted = await ai_engine.extract_many(texts)
+            records = [r for m, found in zip(fresh, extracted) for r in commitment_records(m, found)]
+            stats["extracted"] += len(fresh)
+
+            if records:
+                result = await bulk_ingest.ingest_records(db, bulk_ingest.COMMITMENTS, owner_id, records)
+                stats["commitments"] += result.inserted
+
+            await mark_ingested(
+                db, owner_id, SOURCE, {m.source_message_id: len(found) for m, found in zip(fresh, extracted)}
+            )
+            await save_checkpoints(db, owner_id, reader.account, {m.folder: m for m in batch})
+            await db.commit()
+    finally:
+        messages.close()
+        await asyncio.to_thread(reader.close)
+
+    logger.info("Mailbox %s: %s", reader.account, stats)
+    return stats
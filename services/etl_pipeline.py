@@ -0,0 +1,299 @@
+"""
+Staged, streaming ETL pipeline for message archives.
+
+    source -> parse/normalize -> dedupe -> detect -> load
+
+Stages pass batches over bounded asyncio queues, so a slow stage applies
+backpressure all the way to the source and memory stays bounded by
+queue size x batch size. MIME parsing, normalization and pre-filter
+scoring are CPU-bound and run in a process pool; dedupe, detection (the AI
+engine) and loading (bulk COPY / INSERT) are I/O-bound and run as asyncio
+workers. Every stage reports throughput, queue depth and batch latency.
+"""
+
+import asyncio
+import itertools
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from email.utils import parseaddr
+from typing import Any, AsyncIterable, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+from core.config import get_settings
+from core.database import IngestSessionLocal
+from services import bulk_ingest
+from services.ai_engine import ai_engine, normalize_text, prefilter
+from services.commitment_service import commitments_from_extraction
+from services.email_reader import (
+    MESSAGE_PARSER,
+    header_date,
+    header_message_id,
+    mark_ingested,
+    message_text,
+    seen_message_ids,
+)
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# End-of-stream marker passed between stages
+_DONE = object()
+
+
+def parse_raw_batch(items: List[Union[bytes, Dict[str, Any]]], threshold: float) -> List[Dict[str, Any]]:
+    """Parse and normalize raw messages; runs in a worker process
+
+    Items are RFC 822 bytes or already-structured dicts (source_message_id,
+    text, sender_name, sender_email, sent_at). Messages scoring below the
+    pre-filter threshold are marked so later stages skip the model for them.
+    """
+    parsed = []
+    for item in items:
+        try:
+            if isinstance(item, (bytes, bytearray)):
+                message = MESSAGE_PARSER.parsebytes(item)
+                name, address = parseaddr(str(message.get("From") or ""))
+                record = {
+                    "source_message_id": header_message_id(message),
+                    "text": message_text(message),
+                    "sender_name": name or None,
+                    "sender_email": address or None,
+                    "sent_at": header_date(message),
+                }
+            else:
+                record = dict(item)
+            record["text"] = normalize_text(record.get("text") or "")
+            if not record.get("source_message_id"):
+                continue
+            record["relevant"] = prefilter(record["text"], record.get("sent_at")).score >= threshold
+            parsed.append(record)
+        except Exception as exc:  # one bad message must not sink the batch
+            logger.warning("Could not parse message: %s", exc)
+    return parsed
+
+
+@dataclass
+class StageMetrics:
+    """Throughput, input queue depth and latency of one stage"""
+    name: str
+    queue: Optional[asyncio.Queue] = None
+    batches: int = 0
+    items_in: int = 0
+    items_out: int = 0
+    errors: int = 0
+    busy_seconds: float = 0.0
+    max_latency: float = 0.0
+    started_at: float = field(default_factory=time.monotonic)
+
+    def record(self, items_in: int, items_out: int, seconds: float):
+        self.batches += 1
+        self.items_in += items_in
+        self.items_out += items_out
+        self.busy_seconds += seconds
+        self.max_latency = max(self.max_latency, seconds)
+
+    def snapshot(self) -> Dict[str, float]:
+        elapsed = max(time.monotonic() - self.started_at, 1e-9)
+        return {
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "errors": self.errors,
+            "throughput_per_s": self.items_in / elapsed,
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "avg_batch_latency_s": self.busy_seconds / self.batches if self.batches else 0.0,
+            "max_batch_latency_s": self.max_latency,
+        }
+
+
+class EtlPipeline:
+    """Backfills commitments from a stream of raw messages for one owner"""
+
+    def __init__(
+        self,
+        owner_id: int,
+        source: str = "email",
+        batch_size: int = settings.ETL_BATCH_SIZE,
+        queue_size: int = settings.ETL_QUEUE_SIZE,
+        parse_workers: int = settings.ETL_PARSE_WORKERS or os.cpu_count() or 1,
+        detect_workers: int = settings.ETL_DETECT_WORKERS,
+        load_workers: int = settings.ETL_LOAD_WORKERS,
+    ):
+        self.owner_id = owner_id
+        self.source = source
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.parse_workers = parse_workers
+        self.detect_workers = detect_workers
+        self.load_workers = load_workers
+        self.metrics: Dict[str, StageMetrics] = {}
+
+    def get_metrics(self) -> Dict[str, Dict[str, float]]:
+        """Per-stage metrics snapshot"""
+        return {name: stage.snapshot() for name, stage in self.metrics.items()}
+
+    async def run(self, items: Union[Iterable[Any], AsyncIterable[Any]]) -> Dict[str, Dict[str, float]]:
+        """Push every item through all stages; returns the final metrics"""
+        parse_q: asyncio.Queue = asyncio.Queue(self.queue_size)
+        dedupe_q: asyncio.Queue = asyncio.Queue(self.queue_size)
+        detect_q: asyncio.Queue = asyncio.Queue(self.queue_size)
+        load_q: asyncio.Queue = asyncio.Queue(self.queue_size)
+        self.metrics = {
+            "source": StageMetrics("source"),
+            "parse": StageMetrics("parse", parse_q),
+            "dedupe": StageMetrics("dedupe", dedupe_q),
+            "detect": StageMetrics("detect", detect_q),
+            "load": StageMetrics("load", load_q),
+        }
+
+        with ProcessPoolExecutor(max_workers=self.parse_workers) as pool:
+            loop = asyncio.get_running_loop()
+            threshold = ai_engine.prefilter_threshold
+
+            async def parse(batch):
+                return await loop.run_in_executor(pool, parse_raw_batch, batch, threshold)
+
+            stages = [
+                asyncio.create_task(self._source(items, parse_q, consumers=self.parse_workers)),
+                asyncio.create_task(self._stage("parse", parse, parse_q, dedupe_q, self.parse_workers, 1)),
+                asyncio.create_task(self._stage("dedupe", self._dedupe, dedupe_q, detect_q, 1, self.detect_workers)),
+                asyncio.create_task(self._stage("detect", self._detect, detect_q, load_q, self.detect_workers, self.load_workers)),
+                asyncio.create_task(self._stage("load", self._load, load_q, None, self.load_workers, 0)),
+            ]
+            reporter = asyncio.create_task(self._report())
+            try:
+                await asyncio.gather(*stages)
+            except BaseException:
+                for task in stages:
+                    task.cancel()
+                raise
+            finally:
+                reporter.cancel()
+
+        metrics = self.get_metrics()
+        logger.info("ETL finished: %s", metrics)
+        return metrics
+
+    async def _report(self):
+        while True:
+            await asyncio.sleep(settings.ETL_REPORT_SECONDS)
+            logger.info("ETL progress: %s", self.get_metrics())
+
+    async def _source(self, items, out: asyncio.Queue, consumers: int):
+        """Chunk the input into batches; blocks when the parse stage falls behind"""
+        metrics = self.metrics["source"]
+        if hasattr(items, "__aiter__"):
+            batch = []
+            async for item in items:
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    metrics.record(len(batch), len(batch), 0.0)
+                    await out.put(batch)
+                    batch = []
+            if batch:
+                metrics.record(len(batch), len(batch), 0.0)
+                await out.put(batch)
+        else:
+            iterator = iter(items)
+            while True:
+                started = time.monotonic()
+                # Sync sources may block on disk / network I/O
+                batch = await asyncio.to_thread(list, itertools.islice(iterator, self.batch_size))
+                if not batch:
+                    break
+                metrics.record(len(batch), len(batch), time.monotonic() - started)
+                await out.put(batch)
+        for _ in range(consumers):
+            await out.put(_DONE)
+
+    async def _stage(
+        self,
+        name: str,
+        handler: Callable[[List[Any]], Awaitable[List[Any]]],
+        inbox: asyncio.Queue,
+        outbox: Optional[asyncio.Queue],
+        workers: int,
+        consumers: int,
+    ):
+        """Run `workers` copies of handler over inbox, then signal the next stage"""
+        metrics = self.metrics[name]
+
+        async def worker():
+            while True:
+                batch = await inbox.get()
+                if batch is _DONE:
+                    return
+                started = time.monotonic()
+                try:
+                    result = await handler(batch)
+                except Exception:
+                    metrics.errors += 1
+                    logger.exception("ETL stage %s failed on a batch of %d", name, len(batch))
+                    continue
+                metrics.record(len(batch), len(result), time.monotonic() - started)
+                if outbox is not None and result:
+                    await outbox.put(result)
+
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        if outbox is not None:
+            for _ in range(consumers):
+                await outbox.put(_DONE)
+
+    async def _dedupe(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Drop repeats within the batch and messages ingested by earlier runs"""
+        unique = {record["source_message_id"]: record for record in batch}
+        async with IngestSessionLocal() as db:
+            seen = await seen_message_ids(db, self.owner_id, self.source, list(unique))
+        return [record for message_id, record in unique.items() if message_id not in seen]
+
+    async def _detect(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Run commitment extraction for messages that passed the pre-filter"""
+        relevant = [record for record in batch if record["relevant"]]
+        extracted = await ai_engine.extract_many([record["text"] for record in relevant], use_prefilter=False)
+        for record, found in zip(relevant, extracted):
+            record["extracted"] = found
+        return batch
+
+    async def _load(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Bulk insert commitments and mark the batch's messages as ingested"""
+        records = []
+        for record in batch:
+            records.extend(commitments_from_extraction(
+                record.get("extracted", []),
+                record["text"],
+                source=self.source,
+                source_message_id=record["source_message_id"],
+                party_name=record.get("sender_name"),
+                party_email=record.get("sender_email"),
+                sent_at=record.get("sent_at"),
+            ))
+        async with IngestSessionLocal() as db:
+            if records:
+                await bulk_ingest.ingest_records(db, bulk_ingest.COMMITMENTS, self.owner_id, records)
+            await mark_ingested(
+                db,
+                self.owner_id,
+                self.source,
+                {record["source_message_id"]: len(record.get("extracted", [])) for record in batch},
+            )
+            await db.commit()
+        return batch
+
+
+def reader_source(reader, checkpoints: Optional[Dict[str, Any]] = None) -> Iterator[bytes]:
+    """Raw messages from an email_reader mailbox reader (ImapReader, MboxReader, MaildirReader)"""
+    try:
+        for message in reader.messages(checkpoints or {}):
+            yield message.raw()
+    finally:
+        reader.close()
+
+
+async def run_etl(
+    owner_id: int,
+    items: Union[Iterable[Any], AsyncIterable[Any]],
+    source: str = "email",
+) -> Dict[str, Dict[str, float]]:
+    """Backfill commitments for one owner from raw messages"""
+    return await EtlPipeline(owner_id, source=source).run(items)
@@ -0,0 +1,149 @@
+"""
+Two-tier cache for AI extraction results (and draft templates).
+
+Entries are keyed by a hash of the model name, prompt version and
+normalized message text (plus the day, for messages with relative dates,
+see ai_engine.text_key), so changing either of the first two makes old
+entries unreachable; purge_stale() then drops them from the persistent tier.
+The in-process tier is an LRU with a TTL; the persistent tier is the
+extraction_cache table (or another table of the same shape, such as
+draft_templates) and survives restarts.
+"""
+
+import logging
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+
+from sqlalchemy import delete, or_, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from core.config import get_settings
+from core.database import BackgroundSessionLocal, dialect_insert
+from models.extraction_cache import CachedExtraction
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class ExtractionCache:
+    """In-process LRU/TTL tier in front of a persistent database tier"""
+
+    def __init__(
+        self,
+        model: str,
+        prompt_version: int,
+        encode: Callable[[Any], str],
+        decode: Callable[[str], Any],
+        max_entries: int = settings.EXTRACTION_CACHE_SIZE,
+        ttl: float = settings.EXTRACTION_CACHE_TTL_SECONDS,
+        persistent: bool = settings.EXTRACTION_CACHE_PERSIST,
+        session_factory: async_sessionmaker = BackgroundSessionLocal,
+        table: Type = CachedExtraction,
+    ):
+        self.model = model
+        self.prompt_version = prompt_version
+        self.encode = encode
+        self.decode = decode
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.persistent = persistent
+        self.session_factory = session_factory
+        self.table = table
+        self.stats: Counter = Counter()
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def _remember(self, key: str, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Look a key up in memory, then in the database"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return value
+            del self._entries[key]
+            self.stats["expired"] += 1
+
+        if self.persistent:
+            try:
+                async with self.session_factory() as db:
+                    result = await db.scalar(
+                        select(self.table.result).where(self.table.key == key)
+                    )
+            except Exception as exc:
+                logger.warning("Extraction cache lookup failed: %s", exc)
+                result = None
+            if result is not None:
+                value = self.decode(result)
+                self._remember(key, value)
+                self.stats["persistent_hits"] += 1
+                return value
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set_many(self, entries: Dict[str, Any]):
+        """Store results in both tiers, one database statement per call"""
+        if not entries:
+            return
+        for key, value in entries.items():
+            self._remember(key, value)
+        if not self.persistent:
+            return
+        now = datetime.utcnow()
+        rows = [
+            {
+                "key": key,
+                "model": self.model,
+                "prompt_version": self.prompt_version,
+                "result": self.encode(value),
+                "created_at": now,
+            }
+            for key, value in entries.items()
+        ]
+        try:
+            async with self.session_factory() as db:
+                insert = dialect_insert(db.bind.dialect.name)
+                await db.execute(insert(self.table).on_conflict_do_nothing(), rows)
+                await db.commit()
+        except Exception as exc:
+            logger.warning("Extraction cache write failed: %s", exc)
+
+    async def purge_stale(self, max_age: timedelta = timedelta(days=settings.EXTRACTION_CACHE_PERSIST_DAYS)) -> int:
+        """Drop persistent entries for other models / prompt versions or past max_age"""
+        if not self.persistent:
+            return 0
+        async with self.session_factory() as db:
+            result = await db.execute(
+                delete(self.table).where(
+                    or_(
+                        self.table.model != self.model,
+                        self.table.prompt_version != self.prompt_version,
+                        self.table.created_at < datetime.utcnow() - max_age,
+                    )
+                )
+            )
+            await db.commit()
+        return result.rowcount
+
+    def get_stats(self) -> Dict[str, float]:
+        """Hit/miss counters and ratio"""
+        hits = self.stats["memory_hits"] + self.stats["persistent_hits"]
+        lookups = hits + self.stats["misses"]
+        return {
+            "memory_hits": self.stats["memory_hits"],
+            "persistent_hits": self.stats["persistent_hits"],
+            "misses": self.stats["misses"],
+            **self.stats,
+            "entries": len(self._entries),
+            "hit_ratio": hits / lookups if lookups else 0.0,
+        }
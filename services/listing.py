@@ -0,0 +1,70 @@
+"""
+Column-only reads for list views.
+
+The list endpoints and the realtime change feed select just the columns
+of CommitmentListResponse / SalesListResponse and hand plain dicts to
+orjson, so listing thousands of rows never hydrates ORM objects or
+validates a Pydantic model per row.
+"""
+
+from typing import Any, Dict, Iterable, List, Sequence
+
+from sqlalchemy import Boolean, false, select, type_coerce
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.commitment import Commitment, CommitmentArchive
+from models.sales import Sales
+from services.dashboard_stats import COMMITMENTS, SALES
+
+# Fields of CommitmentListResponse, in order
+COMMITMENT_LIST_FIELDS = ("id", "action", "deadline", "status", "party_name", "commitment_type", "is_overdue")
+
+# Fields of SalesListResponse, in order
+SALES_LIST_FIELDS = ("id", "customer_name", "title", "amount", "status", "expected_close_date")
+
+
+def commitment_list_columns() -> tuple:
+    """Columns for COMMITMENT_LIST_FIELDS; is_overdue is computed by the database against the current time"""
+    return (
+        Commitment.id,
+        Commitment.action,
+        Commitment.deadline,
+        Commitment.status,
+        Commitment.party_name,
+        Commitment.commitment_type,
+        type_coerce(Commitment.is_overdue, Boolean).label("is_overdue"),
+    )
+
+
+def archive_list_columns() -> tuple:
+    """Columns for COMMITMENT_LIST_FIELDS from the archive, where nothing is overdue any more"""
+    return (
+        *(getattr(CommitmentArchive, name) for name in COMMITMENT_LIST_FIELDS[:-1]),
+        type_coerce(false(), Boolean).label("is_overdue"),
+    )
+
+
+def sales_list_columns() -> tuple:
+    """Columns for SALES_LIST_FIELDS"""
+    return tuple(getattr(Sales, name) for name in SALES_LIST_FIELDS)
+
+
+# kind -> (model, fields, columns)
+LIST_VIEWS = {
+    COMMITMENTS: (Commitment, COMMITMENT_LIST_FIELDS, commitment_list_columns),
+    SALES: (Sales, SALES_LIST_FIELDS, sales_list_columns),
+}
+
+
+def as_dicts(fields: Sequence[str], rows: Iterable[Sequence[Any]]) -> List[Dict[str, Any]]:
+    """Result rows as dicts orjson can encode directly"""
+    return [dict(zip(fields, row)) for row in rows]
+
+
+async def list_rows_by_id(db: AsyncSession, kind: str, owner_id: int, ids: Iterable[int]) -> List[Dict[str, Any]]:
+    """List-view rows of one owner's commitments or sales with the given ids"""
+    model, fields, columns = LIST_VIEWS[kind]
+    rows = await db.execute(
+        select(*columns()).where(model.owner_id == owner_id, model.id.in_(list(ids))).order_by(model.id)
+    )
+    return as_dicts(fields, rows)
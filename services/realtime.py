@@ -0,0 +1,290 @@
+"""
+Realtime change feed for dashboards.
+
+Writers collect the ids of the commitments and sales they touch in a
+ChangeSet and publish it inside their transaction:
+
+- Postgres: pg_notify() on CHANNEL. The notification is delivered only if
+  the transaction commits, and it reaches every worker process, each of
+  which LISTENs on one dedicated connection.
+- Anything else: the changes ride on the session and are handed to this
+  process's broker once the session commits.
+
+The broker coalesces changes per owner for REALTIME_COALESCE_SECONDS. It
+then loads the changed rows once with the list-view columns and fans the
+same message out to all of that owner's subscribers. A subscriber is one
+small bounded queue, so thousands of idle dashboards cost very little. A
+subscriber that falls behind has its backlog replaced by a single
+"reload everything" message. It is never allowed to grow.
+"""
+
+import asyncio
+import json
+import logging
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, Optional, Set
+
+import asyncpg
+import orjson
+from sqlalchemy import event, func, select
+from sqlalchemy.engine import URL
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session
+
+from core.config import get_settings
+from core.database import BackgroundSessionLocal, async_database_url, read_your_writes
+from services.dashboard_stats import COMMITMENTS, SALES
+from services.listing import list_rows_by_id
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+CHANNEL = "commit_ai_changes"
+KINDS = (COMMITMENTS, SALES)
+
+# Session.info key holding changes published on a non-Postgres session
+_PENDING = "realtime_changes"
+
+# Connect options SQLAlchemy's asyncpg adapter consumes itself; asyncpg.connect() rejects them
+POOL_ONLY_OPTIONS = ("prepared_statement_cache_size", "prepared_statement_name_func", "async_fallback")
+
+# owner_id -> kind -> changed ids, or None when too many to list (subscribers reload that kind)
+Changes = Dict[int, Dict[str, Optional[Set[int]]]]
+
+
+def listen_connect_args(url: URL) -> Dict[str, Any]:
+    """asyncpg.connect() arguments for url, translated as the async engine does (ssl and other options kept)"""
+    _, options = url.get_dialect()().create_connect_args(url)
+    for name in POOL_ONLY_OPTIONS:
+        options.pop(name, None)
+    # libpq's sslmode names are valid values of asyncpg's ssl argument
+    if "sslmode" in options:
+        options.setdefault("ssl", options.pop("sslmode"))
+    return options
+
+
+def _merge(into: Dict[str, Optional[Set[int]]], kind: str, ids: Optional[Iterable[int]]):
+    current = into.get(kind, set())
+    if current is None:
+        return
+    if ids is None:
+        into[kind] = None
+        return
+    current = current | set(ids)
+    into[kind] = None if len(current) > settings.REALTIME_MAX_IDS else current
+
+
+class ChangeSet:
+    """Changed rows collected by a writer and published in its transaction"""
+
+    def __init__(self):
+        self.changes: Changes = defaultdict(dict)
+
+    def __bool__(self) -> bool:
+        return bool(self.changes)
+
+    def add(self, owner_id: int, kind: str, ids: Iterable[int]):
+        ids = list(ids)
+        if ids:
+            _merge(self.changes[owner_id], kind, ids)
+
+    def add_all(self, owner_id: int, kind: str):
+        """Too many (or unknown) rows changed: the owner's dashboards reload the list"""
+        _merge(self.changes[owner_id], kind, None)
+
+    async def publish(self, db: AsyncSession):
+        """Queue the changes for delivery when the transaction commits"""
+        if not self.changes:
+            return
+        if db.bind.dialect.name == "postgresql":
+            for owner_id, kinds in sorted(self.changes.items()):
+                payload = {"owner": owner_id}
+                payload.update({kind: None if ids is None else sorted(ids) for kind, ids in kinds.items()})
+                await db.execute(select(func.pg_notify(CHANNEL, json.dumps(payload, separators=(",", ":")))))
+        else:
+            pending: Changes = db.sync_session.info.setdefault(_PENDING, defaultdict(dict))
+            for owner_id, kinds in self.changes.items():
+                for kind, ids in kinds.items():
+                    _merge(pending[owner_id], kind, ids)
+        self.changes.clear()
+
+
+class Subscription:
+    """One connected dashboard: a bounded queue of encoded messages"""
+
+    def __init__(self, owner_id: int, queue_size: int):
+        self.owner_id = owner_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    def put(self, message: bytes):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Too far behind: drop the backlog and have the client refetch instead
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RELOAD_ALL)
+
+    async def get(self, timeout: float) -> Optional[bytes]:
+        """Next message, or None when nothing arrived within timeout"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+RELOAD_ALL = orjson.dumps({"reload": list(KINDS)})
+
+
+class ChangeBroker:
+    """Routes committed changes to the subscribers of each owner"""
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker = BackgroundSessionLocal,
+        coalesce: float = settings.REALTIME_COALESCE_SECONDS,
+        queue_size: int = settings.REALTIME_QUEUE_SIZE,
+    ):
+        self.session_factory = session_factory
+        self.coalesce = coalesce
+        self.queue_size = queue_size
+        self.stats: Counter = Counter()
+        self._subscribers: Dict[int, Set[Subscription]] = defaultdict(set)
+        self._pending: Changes = defaultdict(dict)
+        self._flushing: Dict[int, asyncio.Task] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._listener: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start receiving changes; on Postgres this LISTENs on a dedicated connection"""
+        self._loop = asyncio.get_running_loop()
+        if async_database_url.get_backend_name() == "postgresql" and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        """Stop listening and cancel pending flushes"""
+        tasks = list(self._flushing.values())
+        if self._listener is not None:
+            tasks.append(self._listener)
+            self._listener = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._flushing.clear()
+        self._loop = None
+
+    def subscribe(self, owner_id: int) -> Subscription:
+        subscription = Subscription(owner_id, self.queue_size)
+        self._subscribers[owner_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self._subscribers.get(subscription.owner_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.owner_id]
+
+    def subscriber_count(self) -> int:
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def dispatch(self, owner_id: int, kinds: Dict[str, Optional[Iterable[int]]]):
+        """Merge committed changes of one owner into its next coalesced message"""
+        self.stats["changes"] += 1
+        # Changes committed by any worker reach every worker here, so they all pin the owner
+        read_your_writes.pin(owner_id)
+        if owner_id not in self._subscribers:
+            return
+        pending = self._pending[owner_id]
+        for kind, ids in kinds.items():
+            if kind in KINDS:
+                _merge(pending, kind, ids)
+        if owner_id not in self._flushing:
+            self._flushing[owner_id] = asyncio.create_task(self._flush(owner_id))
+
+    def dispatch_threadsafe(self, changes: Changes):
+        """Hand changes committed by any thread to the broker's event loop"""
+        if self._loop is None:
+            return
+        for owner_id, kinds in changes.items():
+            self._loop.call_soon_threadsafe(self.dispatch, owner_id, kinds)
+
+    def broadcast(self, message: bytes):
+        for subscribers in self._subscribers.values():
+            for subscription in subscribers:
+                subscription.put(message)
+
+    async def _flush(self, owner_id: int):
+        try:
+            await asyncio.sleep(self.coalesce)
+        finally:
+            # Changes arriving from here on start the next window
+            del self._flushing[owner_id]
+        kinds = self._pending.pop(owner_id, {})
+        subscribers = self._subscribers.get(owner_id)
+        if not kinds or not subscribers:
+            return
+        message: Dict[str, Any] = {"reload": [kind for kind, ids in kinds.items() if ids is None]}
+        try:
+            async with self.session_factory() as db:
+                for kind, ids in kinds.items():
+                    if ids is None:
+                        continue
+                    rows = await list_rows_by_id(db, kind, owner_id, ids)
+                    message[kind] = rows
+                    removed = ids - {row["id"] for row in rows}
+                    if removed:
+                        message.setdefault("removed", {})[kind] = sorted(removed)
+            encoded = orjson.dumps(message)
+        except Exception:
+            logger.exception("Loading changed rows for owner %d failed", owner_id)
+            encoded = RELOAD_ALL
+        self.stats["messages"] += 1
+        for subscription in list(subscribers):
+            subscription.put(encoded)
+
+    async def _listen(self):
+        connect_args = listen_connect_args(async_database_url)
+
+        def on_notify(connection, pid, channel, payload):
+            try:
+                data = json.loads(payload)
+                self.dispatch(int(data.pop("owner")), data)
+            except (ValueError, KeyError, TypeError):
+                logger.warning("Ignoring malformed change notification: %r", payload)
+
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(**connect_args)
+                await connection.add_listener(CHANNEL, on_notify)
+                # Whatever happened while we were not listening is unknown
+                self.broadcast(RELOAD_ALL)
+                while not connection.is_closed():
+                    await asyncio.sleep(settings.REALTIME_HEARTBEAT_SECONDS)
+                    await connection.execute("SELECT 1")
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("Change listener connection lost: %s", exc)
+            finally:
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            await asyncio.sleep(settings.REALTIME_HEARTBEAT_SECONDS)
+
+
+change_broker = ChangeBroker()
+
+
+def _after_commit(session: Session):
+    changes = session.info.pop(_PENDING, None)
+    if changes:
+        change_broker.dispatch_threadsafe(changes)
+
+
+def _after_rollback(session: Session, previous_transaction):
+    session.info.pop(_PENDING, None)
+
+
+event.listen(Session, "after_commit", _after_commit)
+event.listen(Session, "after_soft_rollback", _after_rollback)
@@ -0,0 +1,305 @@
+"""
+Reminder and escalation dispatcher.
+
+Every tick each node claims a batch of due commitments with
+SELECT ... FOR UPDATE SKIP LOCKED and stamps them with a lease
+(reminder_claimed_until) in a short transaction. Several processes or
+nodes can therefore drain the same backlog without claiming the same row
+twice, and no row locks are held while mail and Telegram are slow.
+
+Each claimed batch is grouped per owner into one digest per channel
+(email and Telegram), so an owner gets a single message however many of
+their commitments fell due. Afterwards one bulk UPDATE sets
+reminder_sent / escalated on delivered rows and releases the rest for
+the next tick. If the process dies in between, the rows become claimable
+again when the lease of REMINDER_LEASE_SECONDS expires.
+
+Nothing is claimed while neither SMTP nor the Telegram bot is configured.
+SQLite has no row locks; there the dispatcher is only safe on one node.
+"""
+
+import asyncio
+import logging
+import smtplib
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, case, or_, select, update
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from core.config import get_settings
+from core.database import BackgroundSessionLocal
+from models.commitment import Commitment, CommitmentStatus, OPEN_STATUSES
+from models.telegram import TelegramChat
+from models.user import User
+from services.telegram_bot import telegram_bot
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Commitments that can still need a reminder or an escalation
+NOTIFY_STATUSES = OPEN_STATUSES + (CommitmentStatus.OVERDUE,)
+
+
+@dataclass
+class Digest:
+    """Everything due for one owner in one claimed batch"""
+    owner_id: int
+    reminders: List[Row] = field(default_factory=list)
+    escalations: List[Row] = field(default_factory=list)
+    email: Optional[str] = None
+    chat_ids: List[int] = field(default_factory=list)
+
+    @property
+    def subject(self) -> str:
+        parts = []
+        if self.escalations:
+            parts.append(f"{len(self.escalations)} overdue")
+        if self.reminders:
+            parts.append(f"{len(self.reminders)} due soon")
+        return f"Commitments: {', '.join(parts)}"
+
+    def render(self) -> str:
+        """Plain-text digest body shared by every channel"""
+        lines = []
+        for title, rows in (("Overdue", self.escalations), ("Due soon", self.reminders)):
+            if not rows:
+                continue
+            lines.append(f"{title}:")
+            for row in rows:
+                party = f" ({row.party_name})" if row.party_name else ""
+                lines.append(f"- {row.action}{party}, due {row.deadline:%Y-%m-%d %H:%M}")
+            lines.append("")
+        return "\n".join(lines).rstrip()
+
+
+def send_email_digests(digests: List[Digest]) -> Set[int]:
+    """Send email digests over one SMTP connection; returns the owners reached"""
+    delivered = set()
+    with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT, timeout=30) as smtp:
+        if settings.SMTP_STARTTLS:
+            smtp.starttls()
+        if settings.SMTP_USERNAME:
+            smtp.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD or "")
+        for digest in digests:
+            message = EmailMessage()
+            message["From"] = settings.SMTP_FROM
+            message["To"] = digest.email
+            message["Subject"] = digest.subject
+            message.set_content(digest.render())
+            try:
+                smtp.send_message(message)
+                delivered.add(digest.owner_id)
+            except smtplib.SMTPException as exc:
+                logger.warning("Reminder email to owner %s failed: %s", digest.owner_id, exc)
+    return delivered
+
+
+async def send_telegram_digests(digests: List[Digest]) -> Set[int]:
+    """Send Telegram digests through the bot's rate limiter; returns the owners reached"""
+
+    async def send(digest: Digest) -> Optional[int]:
+        text = f"{digest.subject}\n\n{digest.render()}"
+        results = await asyncio.gather(
+            *(telegram_bot.send_message(chat_id, text) for chat_id in digest.chat_ids),
+            return_exceptions=True,
+        )
+        failures = [r for r in results if isinstance(r, Exception)]
+        for exc in failures:
+            logger.warning("Reminder to owner %s on Telegram failed: %s", digest.owner_id, exc)
+        return digest.owner_id if len(failures) < len(results) else None
+
+    reached = await asyncio.gather(*(send(digest) for digest in digests))
+    return {owner_id for owner_id in reached if owner_id is not None}
+
+
+class ReminderDispatcher:
+    """Claims due commitments in batches and sends per-owner digests"""
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker = BackgroundSessionLocal,
+        batch_size: int = settings.REMINDER_BATCH_SIZE,
+        lead: timedelta = timedelta(hours=settings.REMINDER_LEAD_HOURS),
+        escalate_after: timedelta = timedelta(hours=settings.ESCALATION_AFTER_HOURS),
+        interval: float = settings.REMINDER_INTERVAL_SECONDS,
+        lease: float = settings.REMINDER_LEASE_SECONDS,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.lead = lead
+        self.escalate_after = escalate_after
+        self.interval = interval
+        self.lease = lease
+        self.stats: Counter = Counter()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the dispatch loop on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Cancel the dispatch loop"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self) -> Dict[str, int]:
+        """Rows claimed, reminded, escalated and left undelivered, and digests sent per channel"""
+        return dict(self.stats)
+
+    @staticmethod
+    def channels() -> List[str]:
+        """Delivery channels configured in this process"""
+        return [name for name, enabled in (("email", settings.SMTP_HOST), ("telegram", telegram_bot.token)) if enabled]
+
+    async def run(self):
+        """Drain everything due, then wait for the next tick"""
+        while True:
+            try:
+                await self.dispatch_due()
+            except Exception:
+                logger.exception("Reminder dispatch failed")
+            await asyncio.sleep(self.interval)
+
+    async def dispatch_due(self, now: Optional[datetime] = None) -> int:
+        """Claim and notify batches until no due rows are left; returns rows handled"""
+        if not self.channels():
+            # Claiming would only settle every row as unreachable
+            return 0
+        total = 0
+        while True:
+            async with self.session_factory() as db:
+                claimed, handled = await self.dispatch_batch(db, now or datetime.utcnow())
+            total += handled
+            # Stop on a short batch, or when deliveries failed, to retry next tick
+            if claimed < self.batch_size or handled < claimed:
+                return total
+
+    async def dispatch_batch(self, db: AsyncSession, now: datetime) -> Tuple[int, int]:
+        """Claim one batch, send its digests and flag what was delivered; returns (claimed, flagged)"""
+        escalate_before = now - self.escalate_after
+        claimed_until = now + timedelta(seconds=self.lease)
+        rows = (
+            await db.execute(
+                select(
+                    Commitment.id,
+                    Commitment.owner_id,
+                    Commitment.action,
+                    Commitment.deadline,
+                    Commitment.party_name,
+                )
+                .where(
+                    Commitment.escalated.is_not(True),
+                    Commitment.status.in_(NOTIFY_STATUSES),
+                    or_(Commitment.reminder_claimed_until.is_(None), Commitment.reminder_claimed_until <= now),
+                    or_(
+                        and_(Commitment.reminder_sent.is_not(True), Commitment.deadline <= now + self.lead),
+                        Commitment.deadline <= escalate_before,
+                    ),
+                )
+                .order_by(Commitment.deadline)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+        ).all()
+        if not rows:
+            await db.commit()
+            return 0, 0
+
+        claimed_ids = [row.id for row in rows]
+        await db.execute(
+            update(Commitment)
+            .where(Commitment.id.in_(claimed_ids))
+            .values(reminder_claimed_until=claimed_until)
+            .execution_options(synchronize_session=False)
+        )
+        digests: Dict[int, Digest] = {}
+        for row in rows:
+            digest = digests.setdefault(row.owner_id, Digest(row.owner_id))
+            if row.deadline <= escalate_before:
+                digest.escalations.append(row)
+            else:
+                digest.reminders.append(row)
+        await self._load_contacts(db, digests)
+        # Releases the row locks and the connection before anything is sent
+        await db.commit()
+
+        delivered = await self._deliver(list(digests.values()))
+        reminder_ids = [row.id for d in digests.values() if d.owner_id in delivered for row in d.reminders]
+        escalation_ids = [row.id for d in digests.values() if d.owner_id in delivered for row in d.escalations]
+        flagged = reminder_ids + escalation_ids
+        # Flag delivered rows (an escalation also settles the reminder) and release the rest
+        # for the next tick; rows re-claimed by another worker after this lease expired are left alone
+        await db.execute(
+            update(Commitment)
+            .where(Commitment.id.in_(claimed_ids), Commitment.reminder_claimed_until == claimed_until)
+            .values(
+                reminder_sent=case((Commitment.id.in_(flagged), True), else_=Commitment.reminder_sent),
+                escalated=case((Commitment.id.in_(escalation_ids), True), else_=Commitment.escalated),
+                reminder_claimed_until=None,
+                updated_at=case((Commitment.id.in_(flagged), now), else_=Commitment.updated_at),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+
+        self.stats["claimed"] += len(rows)
+        self.stats["reminders"] += len(reminder_ids)
+        self.stats["escalations"] += len(escalation_ids)
+        self.stats["undelivered"] += len(rows) - len(flagged)
+        return len(rows), len(flagged)
+
+    async def _load_contacts(self, db: AsyncSession, digests: Dict[int, Digest]):
+        owner_ids = list(digests)
+        users = await db.execute(select(User.id, User.email).where(User.id.in_(owner_ids)))
+        for owner_id, email in users:
+            digests[owner_id].email = email
+        # Private chats only: linked groups may include the owner's customers
+        chats = await db.execute(
+            select(TelegramChat.owner_id, TelegramChat.chat_id).where(
+                TelegramChat.owner_id.in_(owner_ids), TelegramChat.chat_id > 0
+            )
+        )
+        for owner_id, chat_id in chats:
+            digests[owner_id].chat_ids.append(chat_id)
+
+    async def _deliver(self, digests: List[Digest]) -> Set[int]:
+        """Send every digest on every available channel; returns the owners reached"""
+        by_email = [d for d in digests if d.email] if settings.SMTP_HOST else []
+        by_telegram = [d for d in digests if d.chat_ids] if telegram_bot.token else []
+        sends = {}
+        if by_email:
+            sends["email"] = asyncio.to_thread(send_email_digests, by_email)
+        if by_telegram:
+            sends["telegram"] = send_telegram_digests(by_telegram)
+
+        delivered: Set[int] = set()
+        results = await asyncio.gather(*sends.values(), return_exceptions=True)
+        for channel, result in zip(sends, results):
+            if isinstance(result, Exception):
+                logger.warning("Reminder digests over %s failed: %s", channel, result)
+                continue
+            delivered |= result
+            self.stats[f"{channel}_digests"] += len(result)
+
+        # Owners with no address on any configured channel are settled rather than retried
+        # forever; with no channel configured at all nothing is settled
+        unreachable = set()
+        if self.channels():
+            unreachable = {d.owner_id for d in digests} - {d.owner_id for d in by_email + by_telegram}
+        if unreachable:
+            logger.info("No reminder channel for owners %s", sorted(unreachable))
+        return delivered | unreachable
+
+
+reminder_dispatcher = ReminderDispatcher()
@@ -0,0 +1,262 @@
+"""
+Sales record updates and pipeline forecasting.
+
+Updates keep the dashboard counters in step. Forecasts load an owner's
+deals as a handful of column arrays in one query. Currency conversion,
+stage weighting and bucketing into weeks or months are then NumPy
+operations over those arrays rather than loops over ORM objects.
+Timestamps are fetched as epoch seconds, which avoids converting one
+Python datetime per deal.
+"""
+
+import calendar
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import Integer, String, cast, func, select, type_coerce
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import get_settings
+from models.sales import Sales, SalesStatus
+from schemas.sales import ForecastPeriod, SalesForecast, SalesStatusSchema, SalesUpdate, SlippageStats
+from services.contacts import PARTY_COLUMNS, contact_for
+from services.dashboard_stats import SALES, CounterDelta
+from services.realtime import ChangeSet
+
+settings = get_settings()
+
+# Columns an update may not set to null
+REQUIRED_FIELDS = {"customer_name", "title", "status"}
+
+
+async def update_sale(db: AsyncSession, owner_id: int, sale_id: int, changes: SalesUpdate) -> Optional[Sales]:
+    """Apply a partial update, moving dashboard counters on status, currency or amount changes"""
+    sale = await db.scalar(
+        select(Sales).where(Sales.id == sale_id, Sales.owner_id == owner_id).with_for_update()
+    )
+    if sale is None:
+        return None
+    values = {
+        name: value
+        for name, value in changes.model_dump(exclude_unset=True).items()
+        if value is not None or name not in REQUIRED_FIELDS
+    }
+    if "status" in values:
+        values["status"] = SalesStatus(values["status"].value)
+
+    delta = CounterDelta()
+    delta.add_sale(owner_id, sale.currency, sale.status, sale.amount, -1)
+    for name, value in values.items():
+        setattr(sale, name, value)
+    if values.keys() & set(PARTY_COLUMNS[Sales.__tablename__]):
+        sale.contact_id = await contact_for(db, owner_id, sale.customer_name, sale.customer_email, sale.customer_phone)
+    sale.updated_at = datetime.utcnow()
+    delta.add_sale(owner_id, sale.currency, sale.status, sale.amount)
+    await delta.apply(db)
+    changes = ChangeSet()
+    changes.add(owner_id, SALES, [sale.id])
+    await changes.publish(db)
+    await db.commit()
+    await db.refresh(sale)
+    return sale
+
+
+# Status codes used in the deal arrays, in enum order
+STATUSES = list(SalesStatus)
+STATUS_CODES = {status.name: code for code, status in enumerate(STATUSES)}
+
+# Stages a won deal passes through, in order
+FUNNEL = [SalesStatus.PROSPECT, SalesStatus.NEGOTIATION, SalesStatus.APPROVED, SalesStatus.COMPLETED]
+FUNNEL_RANK = np.array([FUNNEL.index(s) if s in FUNNEL else 0 for s in STATUSES], dtype=np.int8)
+
+OPEN_SALES_STATUSES = (SalesStatus.PROSPECT, SalesStatus.NEGOTIATION, SalesStatus.APPROVED, SalesStatus.ON_HOLD)
+
+# Close probability per stage until an owner has enough closed deals to measure it
+DEFAULT_STAGE_WEIGHTS = {
+    SalesStatus.PROSPECT: 0.1,
+    SalesStatus.NEGOTIATION: 0.4,
+    SalesStatus.APPROVED: 0.8,
+    SalesStatus.ON_HOLD: 0.05,
+    SalesStatus.COMPLETED: 1.0,
+    SalesStatus.LOST: 0.0,
+}
+
+SECONDS_PER_DAY = 86400.0
+
+
+@dataclass
+class DealArrays:
+    """One owner's deals as parallel column arrays"""
+    amount: np.ndarray  # float64, NaN when unknown
+    currency: np.ndarray  # int index into currencies
+    currencies: List[str]
+    status: np.ndarray  # int8 index into STATUSES
+    expected_close: np.ndarray  # float64 epoch seconds, NaN when unset
+    updated_at: np.ndarray  # float64 epoch seconds
+
+    def __len__(self) -> int:
+        return len(self.amount)
+
+
+def _epoch(column, dialect_name: str):
+    """SQL expression for a naive UTC DateTime column as epoch seconds"""
+    if dialect_name == "postgresql":
+        return func.extract("epoch", column)
+    if dialect_name == "sqlite":
+        return cast(func.strftime("%s", column), Integer)
+    raise NotImplementedError(f"Epoch conversion is not supported for {dialect_name}")
+
+
+def _to_epoch(moment: datetime) -> float:
+    return calendar.timegm(moment.timetuple()) + moment.microsecond / 1e6
+
+
+async def load_deals(db: AsyncSession, owner_id: int) -> DealArrays:
+    """Fetch the forecast columns of all an owner's deals with one query"""
+    dialect = db.bind.dialect.name
+    result = await db.execute(
+        select(
+            Sales.amount,
+            Sales.currency,
+            # Raw stored enum names; skips building an enum member per row
+            type_coerce(Sales.status, String),
+            _epoch(Sales.expected_close_date, dialect),
+            _epoch(Sales.updated_at, dialect),
+        ).where(Sales.owner_id == owner_id)
+    )
+    columns = list(zip(*result.all())) or [()] * 5
+    return deal_arrays(*columns)
+
+
+def deal_arrays(amount, currency, status, expected_close, updated_at) -> DealArrays:
+    """Build DealArrays from column sequences (None allowed for amounts, currencies and dates)"""
+    # Dictionary-encode the string columns; a dict lookup per value beats sorting strings
+    currency_codes: Dict[Optional[str], int] = {}
+    return DealArrays(
+        amount=np.array(amount, dtype=np.float64),
+        currency=np.fromiter(
+            (currency_codes.setdefault(c, len(currency_codes)) for c in currency), dtype=np.int32, count=len(currency)
+        ),
+        currencies=[c or "" for c in currency_codes],
+        status=np.fromiter(map(STATUS_CODES.__getitem__, status), dtype=np.int8, count=len(status)),
+        expected_close=np.array(expected_close, dtype=np.float64),
+        updated_at=np.array(updated_at, dtype=np.float64),
+    )
+
+
+def convert_amounts(deals: DealArrays, rates: Dict[str, float]) -> Tuple[np.ndarray, List[str]]:
+    """Amounts in the forecast currency; deals in unknown currencies become NaN"""
+    rate_table = np.array([rates.get(c, np.nan) for c in deals.currencies], dtype=np.float64)
+    unknown = [c for c, rate in zip(deals.currencies, rate_table) if np.isnan(rate)]
+    return deals.amount * rate_table[deals.currency], unknown
+
+
+def funnel_rates(deals: DealArrays) -> Tuple[Dict[str, float], np.ndarray, int]:
+    """Share of deals reaching each funnel stage from the previous one
+
+    Stage history is not recorded, so a deal counts as having reached every
+    stage up to its current one; lost and on-hold deals count as prospects.
+    Returns (conversion rates, deals reaching each stage, closed deal count).
+    """
+    reached = np.bincount(FUNNEL_RANK[deals.status], minlength=len(FUNNEL))[::-1].cumsum()[::-1]
+    rates = {
+        f"{a.value}->{b.value}": float(reached[i + 1] / reached[i]) if reached[i] else 0.0
+        for i, (a, b) in enumerate(zip(FUNNEL, FUNNEL[1:]))
+    }
+    status_counts = np.bincount(deals.status, minlength=len(STATUSES))
+    closed = int(status_counts[STATUSES.index(SalesStatus.COMPLETED)] + status_counts[STATUSES.index(SalesStatus.LOST)])
+    return rates, reached, closed
+
+
+def stage_weights(reached: np.ndarray, closed: int, min_closed: int) -> np.ndarray:
+    """Close probability per status code: measured from the funnel when history allows"""
+    weights = np.array([DEFAULT_STAGE_WEIGHTS[s] for s in STATUSES], dtype=np.float64)
+    if closed >= min_closed:
+        won = reached[-1]
+        for rank, status in enumerate(FUNNEL):
+            if reached[rank]:
+                weights[STATUSES.index(status)] = won / reached[rank]
+    return weights
+
+
+def period_starts(now: datetime, period: str, horizon: int) -> List[datetime]:
+    """Start of the current week / month and the horizon periods after it (plus the end)"""
+    if period == "week":
+        first = datetime(now.year, now.month, now.day) - timedelta(days=now.weekday())
+        return [first + timedelta(weeks=n) for n in range(horizon + 1)]
+    if period == "month":
+        return [
+            datetime(now.year + (now.month - 1 + n) // 12, (now.month - 1 + n) % 12 + 1, 1)
+            for n in range(horizon + 1)
+        ]
+    raise ValueError(f"Unknown forecast period: {period}")
+
+
+def forecast(
+    deals: DealArrays,
+    now: Optional[datetime] = None,
+    period: str = "month",
+    horizon: int = 6,
+    currency: str = settings.FORECAST_CURRENCY,
+    rates: Optional[Dict[str, float]] = None,
+    min_closed: int = settings.FORECAST_MIN_CLOSED_DEALS,
+) -> SalesForecast:
+    """Weighted pipeline per period, stage conversion rates and slippage"""
+    now = now or datetime.utcnow()
+    rates = rates if rates is not None else settings.FX_RATES
+    if currency not in rates:
+        raise ValueError(f"No exchange rate for forecast currency {currency}")
+    # Re-base so FORECAST_CURRENCY does not have to be the rates' reference currency
+    base_rate = rates[currency]
+    value, unknown = convert_amounts(deals, {c: rate / base_rate for c, rate in rates.items()})
+    value = np.nan_to_num(value, nan=0.0)
+
+    conversion, reached, closed = funnel_rates(deals)
+    weights = stage_weights(reached, closed, min_closed)
+    is_open = np.isin(deals.status, [STATUSES.index(s) for s in OPEN_SALES_STATUSES])
+    weighted = value * weights[deals.status] * is_open
+
+    starts = period_starts(now, period, horizon)
+    edges = np.array([_to_epoch(start) for start in starts])
+    now_epoch = _to_epoch(now)
+    scheduled = is_open & ~np.isnan(deals.expected_close)
+    # Deals already past their close date are expected in the current period
+    close = np.maximum(np.where(scheduled, deals.expected_close, now_epoch), now_epoch)
+    bucket = np.searchsorted(edges, close, side="right") - 1
+    in_horizon = scheduled & (bucket >= 0) & (bucket < horizon)
+    counts = np.bincount(bucket[in_horizon], minlength=horizon)
+    pipeline = np.bincount(bucket[in_horizon], weights=value[in_horizon], minlength=horizon)
+    expected = np.bincount(bucket[in_horizon], weights=weighted[in_horizon], minlength=horizon)
+
+    past_due = scheduled & (deals.expected_close < now_epoch)
+    won = (deals.status == STATUSES.index(SalesStatus.COMPLETED)) & ~np.isnan(deals.expected_close)
+    days_late = (deals.updated_at[won] - deals.expected_close[won]) / SECONDS_PER_DAY
+
+    return SalesForecast(
+        currency=currency,
+        period=period,
+        periods=[
+            ForecastPeriod(start=starts[n], deals=int(counts[n]), pipeline=float(pipeline[n]), weighted=float(expected[n]))
+            for n in range(horizon)
+        ],
+        later=float(weighted[scheduled & (bucket >= horizon)].sum()),
+        unscheduled=float(weighted[is_open & np.isnan(deals.expected_close)].sum()),
+        stage_weights={SalesStatusSchema(s.value): float(w) for s, w in zip(STATUSES, weights)},
+        conversion_rates=conversion,
+        win_rate=float(reached[-1] / closed) if closed else None,
+        slippage=SlippageStats(
+            open_past_due=int(past_due.sum()),
+            open_past_due_value=float(value[past_due].sum()),
+            open_mean_days_late=float((now_epoch - deals.expected_close[past_due]).mean() / SECONDS_PER_DAY)
+            if past_due.any() else 0.0,
+            closed_mean_days_late=float(np.clip(days_late, 0, None).mean()) if len(days_late) else 0.0,
+        ),
+        unconverted_currencies=unknown,
+    )
+
+
+async def forecast_sales(db: AsyncSession, owner_id: int, **options) -> SalesForecast:
+    """Load an owner's deals and forecast them"""
+    return forecast(await load_deals(db, owner_id), **options)
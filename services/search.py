@@ -0,0 +1,111 @@
+"""
+Ranked full-text search over an owner's commitments and sales.
+
+Queries are split into word tokens and every token must match. The last
+token also matches as a prefix, so results keep up while the user is
+still typing. Postgres ranks with ts_rank_cd over the tsvector column.
+SQLite ranks with FTS5's bm25 (see models/search.py).
+
+On Postgres, matches are capped at SEARCH_MAX_CANDIDATES per table before
+ranking. A very common term therefore costs a bounded amount of work even
+for an owner with hundreds of thousands of rows.
+"""
+
+import re
+from typing import Iterable, List
+
+from sqlalchemy import DateTime, Float, Integer, String, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import get_settings
+from models.commitment import Commitment
+from models.sales import Sales
+from models.search import SEARCH_COLUMNS, TEXT_SEARCH_CONFIG, fts_table
+from schemas.search import SearchHit
+
+settings = get_settings()
+
+# Tokens beyond this are ignored rather than building huge queries
+MAX_TERMS = 8
+
+# kind -> (table, title column, party column, date column)
+SEARCH_TARGETS = {
+    "commitment": (Commitment.__table__, "action", "party_name", "deadline"),
+    "sale": (Sales.__table__, "title", "customer_name", "expected_close_date"),
+}
+
+
+def query_terms(query: str) -> List[str]:
+    """Lower-cased word tokens of a search string"""
+    return re.findall(r"\w+", query.lower())[:MAX_TERMS]
+
+
+def tsquery(terms: List[str]) -> str:
+    """to_tsquery() input: every term required, the last one as a prefix"""
+    return " & ".join(terms[:-1] + [f"{terms[-1]}:*"])
+
+
+def fts5_query(terms: List[str]) -> str:
+    """FTS5 MATCH input: every term required, the last one as a prefix"""
+    return " ".join([f'"{term}"' for term in terms[:-1]] + [f'"{terms[-1]}"*'])
+
+
+def _statement(dialect_name: str, kind: str):
+    table, title, party, date = SEARCH_TARGETS[kind]
+    if dialect_name == "postgresql":
+        sql = (
+            f"SELECT id, {title} AS title, {party} AS party, status, {date} AS date, "
+            f"ts_rank_cd(search_vector, query) AS rank "
+            f"FROM (SELECT * FROM {table.name}, to_tsquery('{TEXT_SEARCH_CONFIG}', :query) AS query "
+            f"WHERE owner_id = :owner_id AND search_vector @@ query LIMIT :candidates) AS matches "
+            f"ORDER BY rank DESC LIMIT :limit"
+        )
+    elif dialect_name == "sqlite":
+        fts = fts_table(table.name)
+        weights = ", ".join(
+            "2.0" if weight == "A" else "1.0"
+            for weight, columns in SEARCH_COLUMNS[table].items()
+            for _ in columns
+        )
+        sql = (
+            f"SELECT t.id, t.{title} AS title, t.{party} AS party, t.status, t.{date} AS date, "
+            f"-bm25({fts}, {weights}) AS rank "
+            f"FROM {fts} JOIN {table.name} AS t ON t.id = {fts}.rowid "
+            f"WHERE {fts} MATCH :query AND t.owner_id = :owner_id "
+            f"ORDER BY rank DESC LIMIT :limit"
+        )
+    else:
+        raise NotImplementedError(f"Full-text search is not supported for {dialect_name}")
+    return text(sql).columns(
+        id=Integer, title=String, party=String, status=table.c.status.type, date=DateTime, rank=Float
+    )
+
+
+async def search(
+    db: AsyncSession,
+    owner_id: int,
+    query: str,
+    kinds: Iterable[str] = SEARCH_TARGETS,
+    limit: int = 20,
+) -> List[SearchHit]:
+    """Best matches across the requested kinds, highest rank first"""
+    terms = query_terms(query)
+    if not terms:
+        return []
+    dialect = db.bind.dialect.name
+    params = {
+        "query": tsquery(terms) if dialect == "postgresql" else fts5_query(terms),
+        "owner_id": owner_id,
+        "limit": limit,
+        "candidates": settings.SEARCH_MAX_CANDIDATES,
+    }
+    hits: List[SearchHit] = []
+    for kind in kinds:
+        rows = await db.execute(_statement(dialect, kind), params)
+        hits.extend(
+            SearchHit(kind=kind, id=row.id, title=row.title, party=row.party,
+                      status=row.status.value, date=row.date, rank=row.rank)
+            for row in rows
+        )
+    hits.sort(key=lambda hit: hit.rank, reverse=True)
+    return hits[:limit]
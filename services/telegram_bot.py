@@ -0,0 +1,401 @@
+"""
+Asynchronous Telegram bot runner.
+
+Updates arrive by long polling getUpdates and go to a bounded pool of
+workers. Updates from one chat are handled one at a time and in order.
+Different chats are handled concurrently. When the pool is full, polling
+pauses until a worker frees a slot. When TELEGRAM_WEBHOOK_URL is set,
+updates arrive through the webhook route instead and are handled from the
+webhook spool (services/webhook_spool.py), with the same per-chat order.
+
+While polling, an update is confirmed to Telegram (by passing a higher
+offset) only after it and every earlier update have been handled. That
+offset is also stored in telegram_offsets, so a restart resumes where
+handling stopped. An update that was fetched but not finished is fetched
+again.
+
+Outbound messages share one pooled HTTP client. Token buckets hold them to
+Telegram's global and per-chat send limits.
+"""
+
+import asyncio
+import logging
+import time
+from collections import Counter, deque
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+import httpx
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from core.config import get_settings
+from core.database import IngestSessionLocal, dialect_insert
+from models.telegram import TelegramChat, TelegramOffset
+from services.ai_engine import ai_engine
+from services.commitment_service import commitments_from_extraction, upsert_commitments
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+SOURCE = "telegram"
+
+# Burst allowed to one group chat before its per-minute rate applies
+GROUP_BURST = 3
+
+# Per-chat buckets kept before idle (full) ones are dropped
+MAX_CHAT_BUCKETS = 10000
+
+# Attempts for one outbound message when Telegram answers 429
+SEND_ATTEMPTS = 3
+
+UPDATE_TYPES = ["message", "edited_message", "channel_post"]
+
+
+class TelegramApiError(Exception):
+    """Bot API call answered with ok=false"""
+
+    def __init__(self, method: str, error_code: int, description: str, retry_after: Optional[float] = None):
+        super().__init__(f"{method}: {error_code} {description}")
+        self.error_code = error_code
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second with bursts of up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def is_idle(self) -> bool:
+        """True when the bucket is full, i.e. dropping it loses nothing"""
+        now = time.monotonic()
+        self._refill(now)
+        return self.tokens >= self.capacity and now >= self.paused_until and not self._lock.locked()
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens for a while (Telegram's retry_after)"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+    async def acquire(self):
+        # The lock queues waiters first come, first served
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class SendLimiter:
+    """Global plus per-chat token buckets for outbound messages"""
+
+    def __init__(
+        self,
+        global_rate: float = settings.TELEGRAM_GLOBAL_RATE,
+        chat_rate: float = settings.TELEGRAM_CHAT_RATE,
+        group_rate: float = settings.TELEGRAM_GROUP_RATE,
+    ):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self._chats: Dict[int, TokenBucket] = {}
+
+    def chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= MAX_CHAT_BUCKETS:
+                self._chats = {key: b for key, b in self._chats.items() if not b.is_idle()}
+            # Group and channel ids are negative
+            if chat_id < 0:
+                bucket = TokenBucket(self.group_rate, GROUP_BURST)
+            else:
+                bucket = TokenBucket(self.chat_rate, 1)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    async def acquire(self, chat_id: int):
+        # Wait on the chat first so a throttled chat does not hold global tokens
+        await self.chat_bucket(chat_id).acquire()
+        await self.global_bucket.acquire()
+
+
+def update_chat_id(update: Dict[str, Any]) -> Optional[int]:
+    """Chat an update belongs to; None when it has none or is malformed"""
+    for kind in UPDATE_TYPES:
+        message = update.get(kind)
+        if message:
+            chat = message.get("chat") if isinstance(message, dict) else None
+            chat_id = chat.get("id") if isinstance(chat, dict) else None
+            return chat_id if isinstance(chat_id, int) else None
+    return None
+
+
+class TelegramBot:
+    """Polls (or receives) updates and dispatches them to per-chat ordered workers"""
+
+    def __init__(
+        self,
+        token: Optional[str] = settings.TELEGRAM_BOT_TOKEN,
+        api_url: str = settings.TELEGRAM_API_URL,
+        webhook_url: Optional[str] = settings.TELEGRAM_WEBHOOK_URL,
+        handler: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+        workers: int = settings.TELEGRAM_WORKERS,
+        max_pending: int = settings.TELEGRAM_MAX_PENDING,
+        poll_timeout: int = settings.TELEGRAM_POLL_TIMEOUT,
+        max_connections: int = settings.TELEGRAM_MAX_CONNECTIONS,
+        limiter: Optional[SendLimiter] = None,
+        session_factory: async_sessionmaker = IngestSessionLocal,
+    ):
+        self.token = token
+        self.api_url = api_url
+        self.webhook_url = webhook_url
+        self.handler = handler or capture_commitments
+        self.workers = workers
+        self.max_pending = max_pending
+        self.poll_timeout = poll_timeout
+        self.max_connections = max_connections
+        self.limiter = limiter or SendLimiter()
+        self.session_factory = session_factory
+        self.stats: Counter = Counter()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._tasks: List[asyncio.Task] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._ready: Optional[asyncio.Queue] = None
+        self._chats: Dict[Any, Deque[Dict[str, Any]]] = {}
+        # Offset bookkeeping: ids fetched but not yet handled, and the next id expected
+        self._unfinished: set = set()
+        self._next_update_id = 0
+        self._progress = asyncio.Event()
+
+    @property
+    def bot_id(self) -> int:
+        return int(self.token.split(":", 1)[0])
+
+    @property
+    def committed_offset(self) -> int:
+        """Lowest update id not yet handled"""
+        return min(self._unfinished) if self._unfinished else self._next_update_id
+
+    async def start(self):
+        """Open the pooled client, start the workers and begin polling or register the webhook"""
+        if self._client is not None or not self.token:
+            return
+        self._client = httpx.AsyncClient(
+            base_url=f"{self.api_url}/bot{self.token}/",
+            timeout=httpx.Timeout(10.0, read=self.poll_timeout + 10.0),
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+            ),
+        )
+        self._slots = asyncio.Semaphore(self.max_pending)
+        self._ready = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        if self.webhook_url:
+            await self.call(
+                "setWebhook",
+                url=self.webhook_url,
+                secret_token=settings.WEBHOOK_SECRET,
+                allowed_updates=UPDATE_TYPES,
+                max_connections=self.max_connections,
+            )
+        else:
+            self._tasks.append(asyncio.create_task(self._poll_loop()))
+
+    async def close(self):
+        """Stop polling and the workers, and close the HTTP client"""
+        if self._client is None:
+            return
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if not self.webhook_url and self._next_update_id:
+            await self._save_offset(self.committed_offset)
+        await self._client.aclose()
+        self._client = None
+
+    def get_stats(self) -> Dict[str, int]:
+        """Update and send counters, plus updates buffered and chats with buffered updates"""
+        return {
+            **self.stats,
+            "pending": sum(len(updates) for updates in self._chats.values()),
+            "active_chats": len(self._chats),
+        }
+
+    async def call(self, method: str, **params) -> Any:
+        """Call a Bot API method and return its result"""
+        response = await self._client.post(method, json=params)
+        body = response.json()
+        if not body.get("ok"):
+            parameters = body.get("parameters") or {}
+            raise TelegramApiError(
+                method, body.get("error_code", response.status_code), body.get("description", ""),
+                parameters.get("retry_after"),
+            )
+        return body["result"]
+
+    async def send_message(self, chat_id: int, text: str, **params) -> Dict[str, Any]:
+        """Send a message within Telegram's rate limits, retrying when throttled"""
+        for attempt in range(SEND_ATTEMPTS):
+            await self.limiter.acquire(chat_id)
+            try:
+                result = await self.call("sendMessage", chat_id=chat_id, text=text, **params)
+            except TelegramApiError as exc:
+                if exc.error_code != 429 or attempt == SEND_ATTEMPTS - 1:
+                    raise
+                self.stats["throttled"] += 1
+                self.limiter.chat_bucket(chat_id).pause(exc.retry_after or 1.0)
+                continue
+            self.stats["sent"] += 1
+            return result
+
+    async def submit(self, update: Dict[str, Any]):
+        """Queue an update behind earlier ones from the same chat; waits while the pool is full"""
+        await self._slots.acquire()
+        self.stats["received"] += 1
+        key = update_chat_id(update)
+        if key is None:
+            # Updates without a chat have no ordering constraint
+            key = ("update", update["update_id"])
+        queue = self._chats.get(key)
+        if queue is not None:
+            queue.append(update)
+        else:
+            self._chats[key] = deque([update])
+            self._ready.put_nowait(key)
+
+    async def _worker(self):
+        while True:
+            key = await self._ready.get()
+            queue = self._chats[key]
+            update = queue[0]
+            try:
+                await self.handler(update)
+                self.stats["handled"] += 1
+            except Exception:
+                self.stats["failed"] += 1
+                logger.exception("Telegram update %s failed", update.get("update_id"))
+            # Not reached on cancellation, so an interrupted update stays unconfirmed
+            queue.popleft()
+            if queue:
+                # Back of the line, so one busy chat cannot starve the others
+                self._ready.put_nowait(key)
+            else:
+                del self._chats[key]
+            self._unfinished.discard(update["update_id"])
+            self._progress.set()
+            self._slots.release()
+
+    async def _poll_loop(self):
+        await self.call("deleteWebhook")
+        offset = self._next_update_id = await self._load_offset()
+        saved = offset
+        while True:
+            try:
+                updates = await self.call(
+                    "getUpdates", offset=offset, timeout=self.poll_timeout, allowed_updates=UPDATE_TYPES
+                )
+            except asyncio.CancelledError:
+                raise
+            except TelegramApiError as exc:
+                logger.warning("getUpdates failed: %s", exc)
+                await asyncio.sleep(exc.retry_after or 5.0)
+                continue
+            except Exception as exc:
+                logger.warning("getUpdates failed: %s", exc)
+                await asyncio.sleep(5.0)
+                continue
+
+            # Updates still being handled come back until they finish; skip them
+            fresh = [update for update in updates if update["update_id"] >= self._next_update_id]
+            for update in fresh:
+                self._unfinished.add(update["update_id"])
+                self._next_update_id = update["update_id"] + 1
+                await self.submit(update)
+
+            polled, offset = offset, self.committed_offset
+            # Everything fetched is already in flight; wait for one to finish
+            stalled = updates and not fresh and offset == polled
+            if stalled:
+                self._progress.clear()
+            if offset != saved:
+                try:
+                    await self._save_offset(offset)
+                    saved = offset
+                except Exception as exc:
+                    logger.warning("Could not save Telegram offset: %s", exc)
+            if stalled:
+                await self._progress.wait()
+
+    async def _load_offset(self) -> int:
+        async with self.session_factory() as db:
+            offset = await db.scalar(
+                select(TelegramOffset.next_update_id).where(TelegramOffset.bot_id == self.bot_id)
+            )
+        return offset or 0
+
+    async def _save_offset(self, offset: int):
+        async with self.session_factory() as db:
+            insert = dialect_insert(db.bind.dialect.name)
+            statement = insert(TelegramOffset).values(
+                bot_id=self.bot_id, next_update_id=offset, updated_at=datetime.utcnow()
+            )
+            await db.execute(
+                statement.on_conflict_do_update(
+                    index_elements=["bot_id"],
+                    set_={
+                        "next_update_id": statement.excluded.next_update_id,
+                        "updated_at": statement.excluded.updated_at,
+                    },
+                )
+            )
+            await db.commit()
+
+
+async def capture_commitments(update: Dict[str, Any]):
+    """Default handler: extract commitments from messages in chats linked to an owner"""
+    message = next((update[kind] for kind in UPDATE_TYPES if update.get(kind)), None)
+    text = message and (message.get("text") or message.get("caption"))
+    if not text:
+        return
+    chat_id = message["chat"]["id"]
+    async with IngestSessionLocal() as db:
+        owner_id = await db.scalar(select(TelegramChat.owner_id).where(TelegramChat.chat_id == chat_id))
+    if owner_id is None:
+        return
+
+    extracted = await ai_engine.extract(text)
+    if not extracted:
+        return
+    sender = message.get("from") or {}
+    name = " ".join(filter(None, [sender.get("first_name"), sender.get("last_name")]))
+    records = commitments_from_extraction(
+        extracted,
+        text,
+        source=SOURCE,
+        source_message_id=f"{chat_id}:{message['message_id']}",
+        party_name=name or sender.get("username"),
+        sent_at=datetime.utcfromtimestamp(message["date"]),
+    )
+    async with IngestSessionLocal() as db:
+        await upsert_commitments(db, owner_id, records)
+
+
+telegram_bot = TelegramBot()
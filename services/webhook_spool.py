@@ -0,0 +1,388 @@
+"""
+Durable spool for inbound webhook deliveries.
+
+The webhook routes only validate a delivery, append it to a local SQLite
+file (WAL, synchronous=FULL) and answer 202. Extraction and database
+writes happen afterwards in a pool of workers that claim deliveries in
+batches. A delivery leaves the spool only once it has been handled, so
+every accepted delivery is handled at least once:
+
+- a worker claims a batch under a lease of WEBHOOK_LEASE_SECONDS; if its
+  process dies, the claims become available again when the lease expires
+- a failed delivery is retried with exponential backoff, and after
+  WEBHOOK_MAX_ATTEMPTS it is kept as dead, with its last error, rather
+  than dropped
+
+Handling twice is harmless because commitments are upserted on their
+source message key. Deliveries that share an ordering key (a Telegram
+chat) are handled one at a time, in arrival order. A failing delivery
+holds back the later ones of its key until it succeeds or dies.
+
+The spool is local to a host, and all worker processes on that host share
+the file. When more than WEBHOOK_MAX_PENDING deliveries are waiting,
+senders get 503 and retry later.
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from core.config import get_settings
+from core.database import IngestSessionLocal
+from schemas.webhook import InboundMessage
+from services.ai_engine import ai_engine
+from services.commitment_service import commitments_from_extraction, upsert_commitments
+from services.telegram_bot import telegram_bot
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Delivery kinds
+MESSAGE = "message"
+TELEGRAM = "telegram"
+
+# Retry delay after the first failure, doubled per attempt up to MAX_BACKOFF
+BACKOFF_SECONDS = 5.0
+MAX_BACKOFF_SECONDS = 900.0
+
+# How long stop() waits for workers to finish their current batch
+STOP_TIMEOUT_SECONDS = 10.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS deliveries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    ordering_key TEXT,
+    payload TEXT NOT NULL,
+    received_at REAL NOT NULL,
+    available_at REAL NOT NULL,
+    claimed_until REAL NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    dead INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_deliveries_ready ON deliveries (dead, available_at, id);
+CREATE INDEX IF NOT EXISTS ix_deliveries_key ON deliveries (ordering_key, id) WHERE ordering_key IS NOT NULL;
+"""
+
+# Only the oldest live delivery of each ordering key can be claimed
+CLAIM = """
+SELECT id, kind, payload, attempts FROM deliveries AS d
+WHERE dead = 0 AND available_at <= :now AND claimed_until <= :now
+  AND (ordering_key IS NULL OR NOT EXISTS (
+      SELECT 1 FROM deliveries AS earlier
+      WHERE earlier.ordering_key = d.ordering_key AND earlier.id < d.id AND earlier.dead = 0
+  ))
+ORDER BY id
+LIMIT :limit
+"""
+
+DEPTH = """
+SELECT
+    COALESCE(SUM(dead = 0 AND claimed_until <= :now), 0),
+    COALESCE(SUM(dead = 0 AND claimed_until > :now), 0),
+    COALESCE(SUM(dead), 0),
+    MIN(CASE WHEN dead = 0 THEN received_at END)
+FROM deliveries
+"""
+
+
+class SpoolFull(Exception):
+    """More than WEBHOOK_MAX_PENDING deliveries are waiting"""
+
+
+@dataclass
+class Delivery:
+    """One claimed webhook delivery"""
+    id: int
+    kind: str
+    payload: str
+    attempts: int  # including the current one
+
+
+# Handles one kind of delivery; returns the error for each delivery, None when handled
+Handler = Callable[[List[Delivery]], Awaitable[List[Optional[BaseException]]]]
+
+
+class WebhookSpool:
+    """Append-only local spool of webhook deliveries plus the workers draining it"""
+
+    def __init__(
+        self,
+        path: str = settings.WEBHOOK_SPOOL_PATH,
+        workers: int = settings.WEBHOOK_WORKERS,
+        batch_size: int = settings.WEBHOOK_BATCH_SIZE,
+        lease: float = settings.WEBHOOK_LEASE_SECONDS,
+        max_attempts: int = settings.WEBHOOK_MAX_ATTEMPTS,
+        max_pending: int = settings.WEBHOOK_MAX_PENDING,
+        poll_interval: float = settings.WEBHOOK_POLL_SECONDS,
+        handlers: Optional[Dict[str, Handler]] = None,
+    ):
+        self.path = path
+        self.workers = workers
+        self.batch_size = batch_size
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.max_pending = max_pending
+        self.poll_interval = poll_interval
+        self.handlers = handlers or {MESSAGE: handle_messages, TELEGRAM: handle_telegram_updates}
+        self.stats: Counter = Counter()
+        # Refreshed every poll_interval while the workers run
+        self.depth: Dict[str, float] = {"pending": 0, "in_flight": 0, "dead": 0, "oldest_seconds": 0.0}
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._claimed: set = set()
+
+    def start(self):
+        """Start the workers and the depth monitor"""
+        if self._tasks:
+            return
+        self._stopping = False
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._monitor()))
+
+    async def stop(self):
+        """Stop the workers and hand back their unfinished claims"""
+        self._stopping = True
+        self._wakeup.set()
+        for task in self._tasks:
+            task.cancel()
+        if self._tasks:
+            # A handler stuck past its cancellation must not hold up shutdown; its lease expires instead
+            _, stuck = await asyncio.wait(self._tasks, timeout=STOP_TIMEOUT_SECONDS)
+            if stuck:
+                logger.warning("%d webhook spool tasks did not stop within %ss", len(stuck), STOP_TIMEOUT_SECONDS)
+        self._tasks = []
+        if self._conn is not None:
+            await asyncio.to_thread(self._release, list(self._claimed))
+            self._claimed.clear()
+            with self._lock:
+                self._conn.close()
+                self._conn = None
+
+    def get_stats(self) -> Dict[str, int]:
+        return dict(self.stats)
+
+    async def append(self, kind: str, payload: str, ordering_key: Optional[str] = None) -> int:
+        """Durably record a delivery; returns its id once it is on disk"""
+        if self.depth["pending"] >= self.max_pending:
+            self.stats["rejected"] += 1
+            raise SpoolFull(f"{int(self.depth['pending'])} webhook deliveries waiting")
+        delivery_id = await asyncio.to_thread(self._append, kind, payload, ordering_key)
+        self.stats["accepted"] += 1
+        self._wakeup.set()
+        return delivery_id
+
+    async def drain(self) -> int:
+        """Handle everything claimable right now in this task; returns how many batches ran"""
+        batches = 0
+        while await self._run_batch():
+            batches += 1
+        return batches
+
+    async def _worker(self):
+        while not self._stopping:
+            try:
+                self._wakeup.clear()
+                if await self._run_batch():
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Webhook spool worker failed")
+            # Nothing claimable: wait for an append here, or poll for other processes' appends and expired leases
+            # (asyncio.timeout, not wait_for: on 3.11 wait_for can swallow a cancel that races the event)
+            try:
+                async with asyncio.timeout(self.poll_interval):
+                    await self._wakeup.wait()
+            except TimeoutError:
+                pass
+
+    async def _monitor(self):
+        while True:
+            try:
+                self.depth = await asyncio.to_thread(self._depth)
+            except Exception as exc:
+                logger.warning("Could not read webhook spool depth: %s", exc)
+            await asyncio.sleep(self.poll_interval)
+
+    async def _run_batch(self) -> bool:
+        batch = await asyncio.to_thread(self._claim, self.batch_size)
+        if not batch:
+            return False
+        ids = [delivery.id for delivery in batch]
+        self._claimed.update(ids)
+        self.stats["redelivered"] += sum(1 for delivery in batch if delivery.attempts > 1)
+
+        by_kind: Dict[str, List[Delivery]] = defaultdict(list)
+        for delivery in batch:
+            by_kind[delivery.kind].append(delivery)
+        errors: Dict[int, BaseException] = {}
+        for kind, deliveries in by_kind.items():
+            handler = self.handlers.get(kind)
+            try:
+                if handler is None:
+                    raise ValueError(f"No handler for webhook deliveries of kind '{kind}'")
+                results = await handler(deliveries)
+            except Exception as exc:
+                results = [exc] * len(deliveries)
+            for delivery, error in zip(deliveries, results):
+                if error is not None:
+                    errors[delivery.id] = error
+
+        failed = [delivery for delivery in batch if delivery.id in errors]
+        for delivery in failed:
+            logger.warning(
+                "Webhook delivery %d (%s) failed on attempt %d: %s",
+                delivery.id, delivery.kind, delivery.attempts, errors[delivery.id],
+            )
+        await asyncio.to_thread(self._settle, [i for i in ids if i not in errors], failed, errors)
+        self._claimed.difference_update(ids)
+        self.stats["handled"] += len(batch) - len(failed)
+        self.stats["failed"] += len(failed)
+        return True
+
+    # SQLite side; runs in worker threads, one statement sequence at a time
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            # Autocommit mode: every append is its own durable transaction
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, timeout=30.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _append(self, kind: str, payload: str, ordering_key: Optional[str]) -> int:
+        now = time.time()
+        with self._lock:
+            cursor = self._db().execute(
+                "INSERT INTO deliveries (kind, ordering_key, payload, received_at, available_at) VALUES (?, ?, ?, ?, ?)",
+                (kind, ordering_key, payload, now, now),
+            )
+            return cursor.lastrowid
+
+    def _claim(self, limit: int) -> List[Delivery]:
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            # IMMEDIATE takes the write lock up front, so two processes never claim the same rows
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = db.execute(CLAIM, {"now": now, "limit": limit}).fetchall()
+                if rows:
+                    db.executemany(
+                        "UPDATE deliveries SET claimed_until = ?, attempts = attempts + 1 WHERE id = ?",
+                        [(now + self.lease, row[0]) for row in rows],
+                    )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return [Delivery(id, kind, payload, attempts + 1) for id, kind, payload, attempts in rows]
+
+    def _settle(self, done: List[int], failed: List[Delivery], errors: Dict[int, BaseException]):
+        now = time.time()
+        retry, dead = [], []
+        for delivery in failed:
+            error = f"{type(errors[delivery.id]).__name__}: {errors[delivery.id]}"[:1000]
+            if delivery.attempts >= self.max_attempts:
+                dead.append((error, delivery.id))
+            else:
+                delay = min(BACKOFF_SECONDS * 2 ** (delivery.attempts - 1), MAX_BACKOFF_SECONDS)
+                retry.append((now + delay, error, delivery.id))
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.executemany("DELETE FROM deliveries WHERE id = ?", [(i,) for i in done])
+                db.executemany(
+                    "UPDATE deliveries SET available_at = ?, claimed_until = 0, last_error = ? WHERE id = ?", retry
+                )
+                db.executemany("UPDATE deliveries SET dead = 1, claimed_until = 0, last_error = ? WHERE id = ?", dead)
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        self.stats["dead"] += len(dead)
+
+    def _release(self, ids: List[int]):
+        with self._lock:
+            self._db().executemany("UPDATE deliveries SET claimed_until = 0 WHERE id = ?", [(i,) for i in ids])
+
+    def _depth(self) -> Dict[str, float]:
+        now = time.time()
+        with self._lock:
+            pending, in_flight, dead, oldest = self._db().execute(DEPTH, {"now": now}).fetchone()
+        return {
+            "pending": pending,
+            "in_flight": in_flight,
+            "dead": dead,
+            "oldest_seconds": now - oldest if oldest is not None else 0.0,
+        }
+
+
+async def handle_messages(deliveries: List[Delivery]) -> List[Optional[BaseException]]:
+    """Extract commitments from spooled messages; one upsert per owner"""
+    errors: List[Optional[BaseException]] = [None] * len(deliveries)
+    messages: Dict[int, InboundMessage] = {}
+    for index, delivery in enumerate(deliveries):
+        try:
+            messages[index] = InboundMessage.model_validate_json(delivery.payload)
+        except Exception as exc:
+            errors[index] = exc
+    indices = list(messages)
+    # extract() batches these into shared prompts
+    extracted = await asyncio.gather(*(ai_engine.extract(messages[i].text) for i in indices), return_exceptions=True)
+
+    by_owner: Dict[int, List[int]] = defaultdict(list)
+    records: Dict[int, list] = {}
+    for index, found in zip(indices, extracted):
+        if isinstance(found, BaseException):
+            errors[index] = found
+            continue
+        message = messages[index]
+        records[index] = commitments_from_extraction(
+            found,
+            message.text,
+            source=message.source,
+            source_message_id=message.source_message_id,
+            party_name=message.sender_name,
+            party_email=message.sender_email,
+            sent_at=message.sent_at,
+        )
+        by_owner[message.owner_id].append(index)
+    for owner_id, owned in by_owner.items():
+        try:
+            async with IngestSessionLocal() as db:
+                await upsert_commitments(db, owner_id, [record for i in owned for record in records[i]])
+        except Exception as exc:
+            for index in owned:
+                errors[index] = exc
+    return errors
+
+
+async def handle_telegram_updates(deliveries: List[Delivery]) -> List[Optional[BaseException]]:
+    """Hand spooled Telegram updates to the bot's handler; a batch holds at most one per chat"""
+
+    async def handle(delivery: Delivery) -> Optional[BaseException]:
+        try:
+            await telegram_bot.handler(json.loads(delivery.payload))
+        except Exception as exc:
+            return exc
+        return None
+
+    return await asyncio.gather(*(handle(delivery) for delivery in deliveries))
+
+
+webhook_spool = WebhookSpool()
@@ -35,4 +35,12 @@ async function login() {
   });
 
   if (res.ok) goToDashboard();
-}
\ No newline at end of file
+}
+// Live dashboard updates: onChanges gets {commitments, sales, removed, reload}
+// for every coalesced batch; onReady fires on (re)connect, when lists should be refetched.
+function watchChanges(token, onChanges, onReady) {
+  const source = new EventSource(`/api/events/stream?token=${encodeURIComponent(token)}`);
+  source.addEventListener('ready', () => onReady && onReady());
+  source.addEventListener('changes', e => onChanges(JSON.parse(e.data)));
+  return source;
+}
@@ -0,0 +1,58 @@
+"""
+Test configuration.
+
+Settings are read once, at the first import of core.config, so the
+environment is set here before any application module is imported: a
+throwaway SQLite database and webhook spool, and no persistent extraction
+cache. Run the suite from the repository root with `python -m pytest`.
+"""
+
+import asyncio
+import itertools
+import os
+import tempfile
+
+import pytest
+
+TEST_DIR = tempfile.mkdtemp(prefix="commit_ai_tests_")
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{TEST_DIR}/primary.db",
+    DEBUG="false",
+    EXTRACTION_CACHE_PERSIST="false",
+    WEBHOOK_SPOOL_PATH=f"{TEST_DIR}/webhook_spool.db",
+)
+
+from core.database import SessionLocal, close_db, init_db  # noqa: E402
+from models.user import User  # noqa: E402
+
+_user_ids = itertools.count(1)
+
+
+@pytest.fixture(scope="session")
+def database():
+    """The test database, with every table created"""
+    init_db()
+    return TEST_DIR
+
+
+@pytest.fixture
+def owner_id(database) -> int:
+    """A new user for this test, so tests never see each other's rows"""
+    user_id = next(_user_ids)
+    with SessionLocal() as db:
+        db.add(User(id=user_id, email=f"user{user_id}@example.com", username=f"user{user_id}", hashed_password="x"))
+        db.commit()
+    return user_id
+
+
+@pytest.fixture
+def run():
+    """Run a coroutine on a fresh event loop, releasing pooled connections bound to it afterwards"""
+    def runner(coro):
+        async def main():
+            try:
+                return await coro
+            finally:
+                await close_db()
+        return asyncio.run(main())
+    return runner
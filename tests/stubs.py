@@ -0,0 +1,162 @@
+"""Local HTTP stand-ins for the external services the app talks to"""
+
+import json
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List, Tuple
+
+
+class StubServer:
+    """A threaded HTTP server on localhost; handle(path, body) returns (status, payload, delay_seconds)"""
+
+    def __init__(self, handle: Callable[[str, dict], Tuple[int, dict, float]]):
+        self.handle = handle
+        self.requests: List[Tuple[str, dict]] = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "StubServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                with stub._lock:
+                    stub.requests.append((self.path, body))
+                    stub.active += 1
+                    stub.max_active = max(stub.max_active, stub.active)
+                try:
+                    status, payload, delay = stub.handle(self.path, body)
+                    time.sleep(delay)
+                finally:
+                    with stub._lock:
+                        stub.active -= 1
+                data = json.dumps(payload).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client timed out
+
+            do_GET = do_POST
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+class ImapStub:
+    """A minimal IMAP4rev1 server: LOGIN, EXAMINE/SELECT, UID SEARCH and UID FETCH over plain TCP
+
+    folders maps a folder name to {"uidvalidity": int, "messages": {uid: raw RFC 822 bytes}} and
+    may be changed while the server runs.
+    """
+
+    def __init__(self, folders: dict):
+        self.folders = folders
+        self.commands: List[str] = []
+        stub = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                self.wfile.write(b"* OK [CAPABILITY IMAP4rev1] stub ready\r\n")
+                folder = None
+                for line in self.rfile:
+                    tag, _, rest = line.decode().strip().partition(" ")
+                    command, _, args = rest.partition(" ")
+                    command = command.upper()
+                    stub.commands.append(rest)
+                    if command == "UID":
+                        command, _, args = args.partition(" ")
+                        command = "UID " + command.upper()
+                    if command == "CAPABILITY":
+                        self.reply(tag, b"* CAPABILITY IMAP4rev1\r\n")
+                    elif command == "LOGIN":
+                        self.reply(tag)
+                    elif command in ("SELECT", "EXAMINE"):
+                        folder = stub.folders.get(args.strip('"'))
+                        if folder is None:
+                            self.wfile.write(f"{tag} NO no such folder\r\n".encode())
+                            continue
+                        self.reply(tag, (
+                            f"* {len(folder['messages'])} EXISTS\r\n"
+                            f"* OK [UIDVALIDITY {folder['uidvalidity']}] UIDs valid\r\n"
+                        ).encode())
+                    elif command == "UID SEARCH":
+                        uids = stub.uid_set(folder, args.split()[-1])
+                        self.reply(tag, ("* SEARCH " + " ".join(map(str, uids))).rstrip().encode() + b"\r\n")
+                    elif command == "UID FETCH":
+                        uid_set, _, items = args.partition(" ")
+                        self.reply(tag, stub.fetch(folder, stub.uid_set(folder, uid_set), "HEADER" in items))
+                    elif command == "LOGOUT":
+                        self.reply(tag, b"* BYE\r\n")
+                        return
+                    else:
+                        self.wfile.write(f"{tag} BAD unknown command\r\n".encode())
+
+            def reply(self, tag, untagged: bytes = b""):
+                self.wfile.write(untagged + f"{tag} OK done\r\n".encode())
+
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def __enter__(self) -> "ImapStub":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    @staticmethod
+    def uid_set(folder: dict, spec: str) -> List[int]:
+        """UIDs matched by a set like "4,7" or "5:*"; "*" is the highest UID, so "N:*" matches it even below N"""
+        existing = sorted(folder["messages"])
+        matched = set()
+        for part in spec.split(","):
+            low, _, high = part.partition(":")
+            if not existing and "*" in (low, high):
+                continue
+            first, last = (existing[-1] if bound == "*" else int(bound) for bound in (low, high or low))
+            matched.update(uid for uid in existing if min(first, last) <= uid <= max(first, last))
+        return sorted(matched)
+
+    @staticmethod
+    def fetch(folder: dict, uids: List[int], header_only: bool) -> bytes:
+        existing = sorted(folder["messages"])
+        out = b""
+        for uid in uids:
+            raw = folder["messages"][uid]
+            section = b"HEADER" if header_only else b""
+            data = raw.split(b"\r\n\r\n", 1)[0] + b"\r\n\r\n" if header_only else raw
+            out += b"* %d FETCH (UID %d BODY[%s] {%d}\r\n%s)\r\n" % (existing.index(uid) + 1, uid, section, len(data), data)
+        return out
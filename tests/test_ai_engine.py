@@ -0,0 +1,145 @@
+"""AIEngine against a stub Ollama server"""
+
+import asyncio
+import json
+import re
+from datetime import date
+
+import httpx
+import pytest
+
+from services.ai_engine import AIEngine, text_key
+from tests.stubs import StubServer
+
+MESSAGE = re.compile(r"Message (\d+):\n(.*?)(?=\n\nMessage \d+:|\Z)", re.S)
+
+
+def ollama(delay: float = 0.0, status: int = 200, skip=()):
+    """Stub /api/generate: one commitment per message, its action the message text, listed in reverse order"""
+    def handle(path, body):
+        assert path == "/api/generate"
+        results = [
+            {"index": int(index), "commitments": [{"action": text, "commitment_type": "invoice", "deadline": None}]}
+            for index, text in MESSAGE.findall(body["prompt"])
+            if text not in skip
+        ]
+        return status, {"response": json.dumps({"results": results[::-1]}), "done": True}, delay
+    return handle
+
+
+def engine(server: StubServer, **options) -> AIEngine:
+    options = {"batch_size": 8, "batch_wait": 0.1, "max_concurrency": 2, "timeout": 5.0, **options}
+    return AIEngine(api_url=server.url, model="stub", **options)
+
+
+async def extract_all(ai: AIEngine, texts):
+    try:
+        return await ai.extract_many(texts, use_prefilter=False)
+    finally:
+        await ai.close()
+
+
+def test_messages_are_batched_into_one_call(run):
+    texts = [f"Send invoice {n} to Acme" for n in range(5)]
+    with StubServer(ollama()) as server:
+        results = run(extract_all(engine(server), texts))
+    assert len(server.requests) == 1
+    assert len(MESSAGE.findall(server.requests[0][1]["prompt"])) == 5
+    assert server.requests[0][1]["format"] == "json"
+    assert [[c.action for c in result] for result in results] == [[text] for text in texts]
+
+
+def test_batches_are_capped_by_batch_size_and_keep_order(run):
+    texts = [f"Pay supplier {n}" for n in range(7)]
+    with StubServer(ollama()) as server:
+        results = run(extract_all(engine(server, batch_size=3), texts))
+    assert sorted(len(MESSAGE.findall(body["prompt"])) for _, body in server.requests) == [1, 3, 3]
+    assert [result[0].action for result in results] == texts
+
+
+def test_identical_texts_share_one_model_slot(run):
+    with StubServer(ollama()) as server:
+        results = run(extract_all(engine(server), ["Ship the order", "Ship  the order", "Ship the order"]))
+    assert len(MESSAGE.findall(server.requests[0][1]["prompt"])) == 1
+    assert [result[0].action for result in results] == ["Ship the order"] * 3
+
+
+def test_concurrent_calls_are_capped(run):
+    texts = [f"Call customer {n}" for n in range(6)]
+    with StubServer(ollama(delay=0.3)) as server:
+        ai = engine(server, batch_size=1, batch_wait=0.0, max_concurrency=2)
+        results = run(extract_all(ai, texts))
+    assert len(server.requests) == 6
+    assert server.max_active == 2
+    assert [result[0].action for result in results] == texts
+
+
+def test_timeout_fails_every_message_in_the_batch(run):
+    texts = ["Deliver pallets", "Reorder paper", "Invoice Acme"]
+
+    async def scenario():
+        ai = engine(server, timeout=0.2)
+        try:
+            return await ai.extract_many(texts, use_prefilter=False)
+        except httpx.TimeoutException:
+            pass
+        # Every caller gets the failure, not just the first
+        outcomes = await asyncio.gather(*(ai.extract(text, use_prefilter=False) for text in texts), return_exceptions=True)
+        await ai.close()
+        return outcomes
+
+    with StubServer(ollama(delay=1.0)) as server:
+        outcomes = run(scenario())
+    assert [type(outcome) for outcome in outcomes] == [httpx.ReadTimeout] * 3
+    assert len(server.requests) == 2
+
+
+def test_server_error_fails_every_message_in_the_batch(run):
+    texts = ["Send the contract", "Pay the deposit"]
+
+    async def scenario():
+        ai = engine(server)
+        try:
+            return await asyncio.gather(*(ai.extract(text, use_prefilter=False) for text in texts), return_exceptions=True)
+        finally:
+            await ai.close()
+
+    with StubServer(ollama(status=500)) as server:
+        outcomes = run(scenario())
+    assert len(server.requests) == 1
+    assert all(isinstance(outcome, httpx.HTTPStatusError) for outcome in outcomes)
+    # Failures are not cached: the next attempt reaches the model again
+    with StubServer(ollama()) as server:
+        results = run(extract_all(engine(server), texts))
+    assert [result[0].action for result in results] == texts
+
+
+
+
+def test_message_skipped_by_the_model_is_retried_and_not_cached(run):
+    texts = ["Send invoice to Acme", "Pay the courier", "Reorder toner"]
+
+    async def scenario():
+        ai = engine(server)
+        try:
+            results = await ai.extract_many(texts, use_prefilter=False)
+            cached = [await ai.cache.get(text_key(text, "stub")) for text in texts]
+            return results, cached, ai.stats["llm_unanswered"]
+        finally:
+            await ai.close()
+
+    with StubServer(ollama(skip={"Pay the courier"})) as server:
+        results, cached, unanswered = run(scenario())
+    # Asked once more on its own, then given up on for now
+    assert [len(MESSAGE.findall(body["prompt"])) for _, body in server.requests] == [3, 1]
+    assert [len(result) for result in results] == [1, 0, 1]
+    assert cached[1] is None and cached[0][0].action == texts[0] and cached[2][0].action == texts[2]
+    assert unanswered == 2
+
+
+def test_relative_dates_are_cached_per_day():
+    monday, tuesday = date(2026, 10, 19), date(2026, 10, 20)
+    for text in ("Send the invoice by Friday", "Pay in 2 weeks", "Deliver tomorrow", "Ship on March 3"):
+        assert text_key(text, "stub", monday) != text_key(text, "stub", tuesday)
+    for text in ("Send the invoice by 2026-11-02", "Thanks for the update"):
+        assert text_key(text, "stub", monday) == text_key(text, "stub", tuesday)
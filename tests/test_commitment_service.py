@@ -0,0 +1,103 @@
+"""Idempotent commitment writes: redelivered batches and bad rows"""
+
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, select
+
+from core.database import IngestSessionLocal
+from models.commitment import Commitment
+from models.dashboard import DashboardCounter
+from schemas.commitment import CommitmentCreate
+from schemas.webhook import InboundMessage
+from services import bulk_ingest
+from services.ai_engine import ExtractedCommitment, parse_deadline
+from services.commitment_service import commitments_from_extraction, upsert_commitments
+from services.dashboard_stats import COMMITMENTS
+
+DEADLINE = datetime(2030, 1, 1)
+
+
+def record(message_id: str, **fields) -> CommitmentCreate:
+    return CommitmentCreate(action=f"Send invoice for {message_id}", deadline=DEADLINE, source="email", source_message_id=message_id, **fields)
+
+
+def malformed(message_id: str) -> CommitmentCreate:
+    """A record that slipped past validation: the database rejects its null action"""
+    return CommitmentCreate.model_construct(action=None, deadline=DEADLINE, source="email", source_message_id=message_id)
+
+
+async def stored(owner_id: int):
+    async with IngestSessionLocal() as db:
+        ids = (await db.scalars(
+            select(Commitment.source_message_id).where(Commitment.owner_id == owner_id).order_by(Commitment.source_message_id)
+        )).all()
+        counted = await db.scalar(
+            select(func.sum(DashboardCounter.count)).where(DashboardCounter.owner_id == owner_id, DashboardCounter.scope == COMMITMENTS)
+        )
+    return ids, counted
+
+
+def test_redelivered_batch_with_a_bad_row_keeps_the_rest(owner_id, run):
+    async def scenario():
+        async with IngestSessionLocal() as db:
+            first = await upsert_commitments(db, owner_id, [record("m1"), record("m2", party_name="Acme Corp"), record("m3")])
+        async with IngestSessionLocal() as db:
+            # Redelivery: three already stored, one bad, one new
+            second = await upsert_commitments(
+                db, owner_id, [record("m1"), record("m2", party_name="Acme Corp"), malformed("m4"), record("m5", party_name="ACME Inc."), record("m3")]
+            )
+        async with IngestSessionLocal() as db:
+            third = await upsert_commitments(db, owner_id, [record("m5")])
+        return first, second, third, await stored(owner_id)
+
+    first, second, third, (ids, counted) = run(scenario())
+    assert (first, second, third) == (3, 1, 0)
+    assert ids == ["m1", "m2", "m3", "m5"]
+    # Counters moved only for rows actually inserted
+    assert counted == 4
+
+
+def test_redelivered_bulk_batch_with_a_bad_row(owner_id, run):
+    rows = [
+        {"action": "Ship pallets", "deadline": "2030-01-01T09:00:00Z", "source": "erp", "source_message_id": f"o{n}"}
+        for n in range(4)
+    ]
+    bad = {**rows[2], "source_message_id": "o-bad", "action": "x" * 300}
+
+    async def scenario():
+        async with IngestSessionLocal() as db:
+            first = await bulk_ingest.ingest_records(db, bulk_ingest.COMMITMENTS, owner_id, rows[:3], batch_size=10)
+        async with IngestSessionLocal() as db:
+            second = await bulk_ingest.ingest_records(db, bulk_ingest.COMMITMENTS, owner_id, rows[:2] + [bad] + rows[2:], batch_size=10)
+        return first, second, await stored(owner_id)
+
+    first, second, (ids, counted) = run(scenario())
+    assert (first.inserted, first.duplicates, first.errors) == (3, 0, [])
+    assert (second.inserted, second.duplicates) == (1, 3)
+    assert [error["index"] for error in second.errors] == [2]
+    assert ids == ["o0", "o1", "o2", "o3"] and counted == 4
+
+
+def test_webhook_message_with_a_utc_sent_at(owner_id, run):
+    message = InboundMessage(
+        owner_id=owner_id,
+        source="email",
+        source_message_id="z1",
+        text="I will send the invoice by March 5",
+        sent_at="2026-10-01T10:00:00Z",
+    )
+    assert message.sent_at == datetime(2026, 10, 1, 10, 0)
+    assert parse_deadline(message.text, datetime(2026, 10, 1, 10, 0, tzinfo=timezone.utc)) == datetime(2027, 3, 5, 23, 59)
+
+    records = commitments_from_extraction(
+        [ExtractedCommitment(action="Send the invoice")], message.text, message.source, message.source_message_id,
+        sent_at=message.sent_at,
+    )
+
+    async def scenario():
+        async with IngestSessionLocal() as db:
+            await upsert_commitments(db, owner_id, records)
+            return (await db.scalars(select(Commitment.deadline).where(Commitment.owner_id == owner_id))).all()
+
+    # Already passed this year, so next year's March 5
+    assert run(scenario()) == [datetime(2027, 3, 5, 23, 59)]
@@ -0,0 +1,39 @@
+"""Commitment listing filters and cursors with timezone-aware datetimes"""
+
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+import main
+from api.commitments import decode_cursor, encode_cursor
+from core.database import SessionLocal
+from core.security import create_access_token
+from models.commitment import Commitment
+from models.user import User
+
+
+def test_aware_deadline_filters_are_compared_in_utc(owner_id, run):
+    with SessionLocal() as db:
+        db.add_all([
+            Commitment(owner_id=owner_id, action="Send invoice", deadline=datetime(2030, 1, 1, 0, 0)),
+            Commitment(owner_id=owner_id, action="Pay courier", deadline=datetime(2030, 1, 2, 0, 0)),
+        ])
+        db.commit()
+        token = create_access_token(db.get(User, owner_id))
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+            response = await client.get(
+                "/api/commitments",
+                # 2029-12-31 23:00 and 2030-01-01 23:00 UTC
+                params={"deadline_from": "2030-01-01T01:00:00+02:00", "deadline_to": "2030-01-01T23:00:00Z"},
+                headers={"Authorization": f"Bearer {token}"},
+            )
+            return response.status_code, [item["action"] for item in response.json()["items"]]
+
+    assert run(scenario()) == (200, ["Send invoice"])
+
+
+def test_cursor_with_an_offset_decodes_to_naive_utc():
+    deadline = datetime(2030, 1, 1, 1, 0, tzinfo=timezone(timedelta(hours=2)))
+    assert decode_cursor(encode_cursor(deadline, 7)) == (datetime(2029, 12, 31, 23, 0), 7)
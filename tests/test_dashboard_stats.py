@@ -0,0 +1,48 @@
+"""Counter rebuild against rows written behind the counters' back"""
+
+from datetime import datetime
+
+from core.database import BackgroundSessionLocal
+from models.commitment import Commitment, CommitmentArchive, CommitmentStatus, CommitmentType
+from models.dashboard import DashboardCounter
+from models.sales import Sales, SalesStatus
+from services.dashboard_stats import COMMITMENTS, SALES, get_counters, rebuild_counters
+
+DEADLINE = datetime(2030, 1, 1)
+
+
+def test_rebuild_corrects_drift_in_one_pass(owner_id, run):
+    async def scenario():
+        async with BackgroundSessionLocal() as db:
+            db.add_all([
+                Commitment(owner_id=owner_id, action="Send invoice", deadline=DEADLINE, commitment_type=CommitmentType.INVOICE),
+                Commitment(owner_id=owner_id, action="Pay courier", deadline=DEADLINE, commitment_type=CommitmentType.PAYMENT,
+                           status=CommitmentStatus.IN_PROGRESS),
+                CommitmentArchive(id=10_000 + owner_id, deadline=DEADLINE, owner_id=owner_id, action="Old invoice",
+                                  commitment_type=CommitmentType.INVOICE, status=CommitmentStatus.PENDING,
+                                  created_at=DEADLINE, updated_at=DEADLINE, archived_at=DEADLINE),
+                Sales(owner_id=owner_id, customer_name="Acme", title="Toner", amount=120.0, currency="EUR"),
+                Sales(owner_id=owner_id, customer_name="Acme", title="Paper", amount=30.0, currency="EUR"),
+                Sales(owner_id=owner_id, customer_name="Initech", title="Chairs", amount=None,
+                      status=SalesStatus.LOST),
+                # Stale and wrong counters
+                DashboardCounter(owner_id=owner_id, scope=COMMITMENTS, category="reorder", status="overdue", count=4, amount=0.0),
+                DashboardCounter(owner_id=owner_id, scope=COMMITMENTS, category="invoice", status="pending", count=1, amount=0.0),
+            ])
+            await db.commit()
+        async with BackgroundSessionLocal() as db:
+            corrected = await rebuild_counters(db, [owner_id])
+        async with BackgroundSessionLocal() as db:
+            again = await rebuild_counters(db, [owner_id])
+            counters = {(c.scope, c.category, c.status): (c.count, c.amount) for c in await get_counters(db, owner_id)}
+        return corrected, again, counters
+
+    corrected, again, counters = run(scenario())
+    # invoice/pending fixed, payment/in_progress, two sales buckets added, reorder/overdue removed
+    assert (corrected, again) == (5, 0)
+    assert counters == {
+        (COMMITMENTS, "invoice", "pending"): (2, 0.0),
+        (COMMITMENTS, "payment", "in_progress"): (1, 0.0),
+        (SALES, "EUR", "prospect"): (2, 150.0),
+        (SALES, "USD", "lost"): (1, 0.0),
+    }
@@ -0,0 +1,122 @@
+"""Read-replica routing with two local SQLite databases as primary and replica"""
+
+import pytest
+from sqlalchemy import create_engine, select, update
+from starlette.requests import Request
+
+from core import database as db_module
+from core.database import (
+    READ_REPLICA,
+    USER_ID,
+    AsyncSessionLocal,
+    Base,
+    ReadYourWrites,
+    get_async_db,
+    get_async_url,
+    get_ingest_db,
+    make_async_engine,
+)
+from models.user import User
+
+# Present in both databases under different usernames, so a read shows where it went
+MARKER_ID = 9000
+
+
+@pytest.fixture
+def replica(database, monkeypatch):
+    url = f"sqlite:///{database}/replica.db"
+    sync_engine = create_engine(url)
+    Base.metadata.create_all(bind=sync_engine)
+    with sync_engine.begin() as conn:
+        conn.execute(User.__table__.delete().where(User.id == MARKER_ID))
+        conn.execute(User.__table__.insert().values(id=MARKER_ID, email="r@example.com", username="replica", hashed_password="x"))
+    sync_engine.dispose()
+    with db_module.SessionLocal() as db:
+        if db.get(User, MARKER_ID) is None:
+            db.add(User(id=MARKER_ID, email="p@example.com", username="primary", hashed_password="x"))
+            db.commit()
+    monkeypatch.setattr(db_module, "replica_engines", [make_async_engine(get_async_url(url), "replica0")])
+    monkeypatch.setattr(db_module, "read_your_writes", ReadYourWrites(seconds=60))
+
+
+def request(method: str) -> Request:
+    return Request({"type": "http", "method": method, "headers": [], "path": "/"})
+
+
+MARKER = select(User.username).where(User.id == MARKER_ID)
+
+
+async def read_through(dependency):
+    """What a request session sees for the marker row"""
+    sessions = dependency()
+    db = await sessions.__anext__()
+    try:
+        return await db.scalar(MARKER)
+    finally:
+        await sessions.aclose()
+
+
+def test_get_requests_read_from_the_replica(replica, run):
+    async def scenario():
+        return (
+            await read_through(lambda: get_async_db(request("GET"))),
+            await read_through(lambda: get_async_db(request("HEAD"))),
+            await read_through(lambda: get_async_db(request("POST"))),
+        )
+
+    assert run(scenario()) == ("replica", "replica", "primary")
+
+
+def test_locking_reads_and_reads_after_a_write_use_the_primary(replica, run):
+    async def scenario():
+        async with AsyncSessionLocal(info={READ_REPLICA: True}) as db:
+            before = await db.scalar(MARKER)
+            locked = await db.scalar(MARKER.with_for_update())
+            await db.execute(update(User).where(User.id == -1).values(username="nobody"))
+            after = await db.scalar(MARKER)
+            await db.rollback()
+        return before, locked, after
+
+    assert run(scenario()) == ("replica", "primary", "primary")
+
+
+def test_owner_reads_own_writes_after_commit(replica, run, monkeypatch):
+    async def session_read(user_id):
+        async with AsyncSessionLocal(info={READ_REPLICA: True, USER_ID: user_id}) as db:
+            return await db.scalar(MARKER)
+
+    async def commit_as(user_id, write: bool):
+        async with AsyncSessionLocal(info={READ_REPLICA: True, USER_ID: user_id}) as db:
+            if write:
+                await db.execute(update(User).where(User.id == -1).values(username="nobody"))
+            else:
+                await db.scalar(MARKER)
+            await db.commit()
+
+    async def scenario():
+        await commit_as(1, write=True)
+        # A commit that wrote nothing does not pin
+        await commit_as(3, write=False)
+        pinned = await session_read(1), await session_read(2), await session_read(3)
+        # Once the pin lapses the owner is back on the replica
+        monkeypatch.setattr(db_module.read_your_writes, "seconds", 0.0)
+        await commit_as(1, write=True)
+        return pinned, await session_read(1)
+
+    pinned, expired = run(scenario())
+    assert pinned == ("primary", "replica", "replica")
+    assert expired == "replica"
+
+
+def test_pin_expires():
+    pins = ReadYourWrites(seconds=0.0)
+    pins.pin(1)
+    assert not pins.pinned(1)
+    pins = ReadYourWrites(seconds=60, max_entries=2)
+    for owner in (1, 2, 3):
+        pins.pin(owner)
+    assert (pins.pinned(1), pins.pinned(2), pins.pinned(3)) == (False, True, True)
+
+
+def test_ingest_sessions_never_use_replicas(replica, run):
+    assert run(read_through(get_ingest_db)) == "primary"
@@ -0,0 +1,35 @@
+"""Draft templates: keys and what may be cached"""
+
+from datetime import datetime
+
+from models.commitment import CommitmentType
+from services.drafts import ACTION_SLOT, DEADLINE_SLOT, PARTY_SLOT, DraftSubject, fill, templatize
+
+DEADLINE = datetime(2030, 1, 4, 17, 0)
+
+
+def subject(action: str, owner_id: int = 1, party: str = "Acme Corp") -> DraftSubject:
+    return DraftSubject(owner_id=owner_id, commitment_type=CommitmentType.INVOICE, action=action, deadline=DEADLINE, party=party)
+
+
+def draft(item: DraftSubject, extra: str = "") -> str:
+    return f"Dear {item.party},\n\nA reminder about \"{item.action}\", due {item.deadline_text}.{extra}\n\nThanks"
+
+
+def test_template_keys_are_per_owner():
+    assert subject("Send invoice 1042").key("m") == subject("Send invoice 77").key("m")
+    assert subject("Send invoice 1042", owner_id=1).key("m") != subject("Send invoice 1042", owner_id=2).key("m")
+
+
+def test_draft_quoting_only_slotted_values_is_cached_and_filled():
+    template = templatize(draft(subject("Send invoice 1042")), subject("Send invoice 1042"))
+    assert template == f"Dear {PARTY_SLOT},\n\nA reminder about \"{ACTION_SLOT}\", due {DEADLINE_SLOT}.\n\nThanks"
+    assert fill(template, subject("Send invoice 77")) == draft(subject("Send invoice 77"))
+
+
+def test_draft_repeating_values_outside_the_slots_is_not_cached():
+    item = subject("Send invoice 1042")
+    assert templatize(draft(item, " Invoice 1042 totals $5,300."), item) is None
+    assert templatize(draft(item, " Best regards to everyone at Acme."), item) is None
+    # Other numbers, and digits that merely contain the action's, are fine
+    assert templatize(draft(item, " Call 510423 with questions."), item) is not None
@@ -0,0 +1,170 @@
+"""Mailbox readers against a local IMAP stand-in and scratch mbox / Maildir files"""
+
+import json
+import os
+from email.utils import format_datetime
+from datetime import datetime, timezone
+
+import pytest
+
+from core.database import IngestSessionLocal
+from services import email_reader
+from services.email_reader import Checkpoint, ImapReader, MaildirReader, MboxReader, ingest_mailbox
+from tests.stubs import ImapStub, StubServer
+
+
+def raw_message(n: int, body: str = "I will send the invoice to Acme by Friday.") -> bytes:
+    return (
+        f"From: Customer {n} <customer{n}@example.com>\r\n"
+        f"To: me@example.com\r\n"
+        f"Subject: Order {n}\r\n"
+        f"Message-ID: <msg-{n}@example.com>\r\n"
+        f"Date: {format_datetime(datetime(2026, 10, 1, 9, n, tzinfo=timezone.utc))}\r\n"
+        f"\r\n"
+        f"{body}\r\n"
+    ).encode()
+
+
+def read(reader, checkpoints):
+    try:
+        return [(m.folder, m.position, m.uidvalidity, m.source_message_id) for m in reader.messages(checkpoints)]
+    finally:
+        reader.close()
+
+
+def imap_reader(server: ImapStub, folders=("INBOX",)) -> ImapReader:
+    return ImapReader("127.0.0.1", "me", "secret", folders=folders, port=server.port, use_ssl=False, fetch_chunk=2)
+
+
+def test_imap_reads_new_uids_after_checkpoint():
+    folders = {"INBOX": {"uidvalidity": 7, "messages": {3: raw_message(3), 5: raw_message(5), 9: raw_message(9)}}}
+    with ImapStub(folders) as server:
+        everything = read(imap_reader(server), {})
+        resumed = read(imap_reader(server), {"INBOX": Checkpoint(7, "5")})
+        reader = imap_reader(server)
+        messages = list(reader.messages({}))
+        body = messages[1].text()
+        reader.close()
+    assert everything == [("INBOX", "3", 7, "msg-3@example.com"), ("INBOX", "5", 7, "msg-5@example.com"), ("INBOX", "9", 7, "msg-9@example.com")]
+    assert resumed == [("INBOX", "9", 7, "msg-9@example.com")]
+    assert "Order 5" in body and "invoice to Acme" in body
+
+
+def test_imap_highest_uid_is_not_read_again():
+    # "UID 10:*" matches UID 9, the highest, although it is below 10
+    folders = {"INBOX": {"uidvalidity": 7, "messages": {3: raw_message(3), 9: raw_message(9)}}}
+    with ImapStub(folders) as server:
+        assert server.uid_set(folders["INBOX"], "10:*") == [9]
+        assert read(imap_reader(server), {"INBOX": Checkpoint(7, "9")}) == []
+        assert "UID SEARCH UID 10:*" in server.commands
+
+
+def test_imap_uidvalidity_change_starts_over():
+    folders = {"INBOX": {"uidvalidity": 8, "messages": {1: raw_message(1), 2: raw_message(2)}}}
+    with ImapStub(folders) as server:
+        # The checkpoint's UID 9 belongs to an older UIDVALIDITY, so UIDs 1 and 2 are new
+        messages = read(imap_reader(server), {"INBOX": Checkpoint(7, "9")})
+    assert [position for _, position, _, _ in messages] == ["1", "2"]
+    assert {uidvalidity for _, _, uidvalidity, _ in messages} == {8}
+
+
+def test_imap_folders_resume_independently_and_missing_ones_are_skipped():
+    folders = {
+        "INBOX": {"uidvalidity": 1, "messages": {1: raw_message(1), 2: raw_message(2)}},
+        "Sent": {"uidvalidity": 2, "messages": {4: raw_message(4)}},
+    }
+    with ImapStub(folders) as server:
+        messages = read(imap_reader(server, ("INBOX", "Archive", "Sent")), {"INBOX": Checkpoint(1, "1")})
+    assert [(folder, position) for folder, position, _, _ in messages] == [("INBOX", "2"), ("Sent", "4")]
+
+
+def ollama(path, body):
+    """Stub Ollama: one commitment per message, its action the message's subject line"""
+    prompt = body["prompt"]
+    results = []
+    for index, chunk in enumerate(prompt.split("\n\nMessage ")[1:]):
+        results.append({"index": index, "commitments": [{"action": chunk.split("\n", 1)[1][:40], "commitment_type": "invoice"}]})
+    return 200, {"response": json.dumps({"results": results})}, 0.0
+
+
+def test_ingest_resumes_from_saved_imap_checkpoint(owner_id, run, monkeypatch):
+    folders = {"INBOX": {"uidvalidity": 3, "messages": {n: raw_message(n) for n in (1, 2, 3)}}}
+
+    async def ingest():
+        try:
+            async with IngestSessionLocal() as db:
+                return await ingest_mailbox(db, imap_reader(server), owner_id, batch_size=2)
+        finally:
+            await email_reader.ai_engine.close()
+
+    with StubServer(ollama) as llm, ImapStub(folders) as server:
+        monkeypatch.setattr(email_reader.ai_engine, "api_url", llm.url)
+        monkeypatch.setattr(email_reader.ai_engine, "prefilter_threshold", float("-inf"))
+        first = run(ingest())
+        folders["INBOX"]["messages"].update({n: raw_message(n) for n in (4, 5)})
+        second = run(ingest())
+        third = run(ingest())
+        # A new UIDVALIDITY re-reads the folder, but already ingested messages are skipped
+        folders["INBOX"]["uidvalidity"] = 4
+        fourth = run(ingest())
+    assert (first["seen"], first["commitments"]) == (3, 3)
+    assert (second["seen"], second["commitments"]) == (2, 2)
+    assert third["seen"] == 0
+    assert (fourth["seen"], fourth["skipped"], fourth["commitments"]) == (5, 5, 0)
+
+
+def test_mbox_resumes_from_byte_offset(tmp_path):
+    path = tmp_path / "archive.mbox"
+
+    def append(*numbers):
+        with open(path, "ab") as mbox:
+            for n in numbers:
+                mbox.write(b"From customer@example.com Thu Oct  1 09:00:00 2026\n")
+                # mboxrd quotes body lines starting with "From "
+                mbox.write(raw_message(n, body=">From the warehouse: pallets ship Monday.").replace(b"\r\n", b"\n") + b"\n")
+
+    append(1, 2)
+    first = read(MboxReader(str(path)), {})
+    assert [message_id for *_, message_id in first] == ["msg-1@example.com", "msg-2@example.com"]
+    checkpoint = {"archive.mbox": Checkpoint(None, first[-1][1])}
+    assert read(MboxReader(str(path)), checkpoint) == []
+
+    append(3)
+    resumed = list(MboxReader(str(path)).messages(checkpoint))
+    assert [m.source_message_id for m in resumed] == ["msg-3@example.com"]
+    assert "\nFrom the warehouse" in resumed[0].raw().decode()
+
+    # A file replaced by a shorter one is read from the start
+    path.write_bytes(b"")
+    append(4)
+    assert [message_id for *_, message_id in read(MboxReader(str(path)), checkpoint)] == ["msg-4@example.com"]
+
+
+def test_maildir_resumes_after_mtime_and_name(tmp_path):
+    for sub in ("new", "cur", ".Sent/new", ".Sent/cur"):
+        os.makedirs(tmp_path / sub)
+
+    def deliver(folder: str, name: str, n: int, mtime: int):
+        path = tmp_path / folder / name
+        path.write_bytes(raw_message(n))
+        os.utime(path, ns=(mtime, mtime))
+
+    deliver("cur", "100.a:2,S", 1, 1_000)
+    deliver("new", "200.b", 2, 2_000)
+    deliver(".Sent/cur", "150.c:2,S", 3, 1_500)
+    first = read(MaildirReader(str(tmp_path)), {})
+    assert [(folder, message_id) for folder, _, _, message_id in first] == [
+        ("INBOX", "msg-1@example.com"), ("INBOX", "msg-2@example.com"), ("Sent", "msg-3@example.com"),
+    ]
+    checkpoints = {folder: Checkpoint(None, position) for folder, position, _, _ in first}
+    assert checkpoints["INBOX"].position == "2000:200.b"
+
+    # Same mtime as the checkpoint but a later name still counts as new; a message moved to cur keeps its name
+    os.rename(tmp_path / "new" / "200.b", tmp_path / "cur" / "200.b:2,S")
+    os.utime(tmp_path / "cur" / "200.b:2,S", ns=(2_000, 2_000))
+    deliver("new", "200.c", 4, 2_000)
+    deliver("new", "300.d", 5, 3_000)
+    resumed = read(MaildirReader(str(tmp_path)), checkpoints)
+    assert [(folder, message_id) for folder, _, _, message_id in resumed] == [
+        ("INBOX", "msg-4@example.com"), ("INBOX", "msg-5@example.com"),
+    ]
@@ -0,0 +1,53 @@
+"""Change stream: the access token is re-checked while the stream is open"""
+
+import asyncio
+from datetime import timedelta
+
+from api import events
+from core.database import SessionLocal
+from core.security import auth_cache, create_access_token
+from models.user import User
+
+
+def user_token(owner_id: int, **options) -> str:
+    with SessionLocal() as db:
+        return create_access_token(db.get(User, owner_id), **options)
+
+
+async def read(stream, limit: int = 50):
+    """Chunks yielded until the stream ends (or limit chunks)"""
+    chunks = []
+    async for chunk in stream:
+        chunks.append(chunk)
+        if len(chunks) == limit:
+            break
+    return chunks
+
+
+def test_stream_ends_when_the_token_expires(owner_id, run, monkeypatch):
+    monkeypatch.setattr(events.settings, "REALTIME_HEARTBEAT_SECONDS", 0.1)
+    token = user_token(owner_id, expires_delta=timedelta(seconds=2))
+
+    chunks = run(asyncio.wait_for(read(events.event_stream(owner_id, token)), 10))
+    assert chunks[0].endswith(b"event: ready\ndata: {}\n\n")
+    # Pinged while valid, closed without being read to the limit once expired
+    assert 5 < len(chunks) < 50 and set(chunks[1:]) == {b": ping\n\n"}
+
+
+def test_stream_ends_after_a_password_change(owner_id, run, monkeypatch):
+    monkeypatch.setattr(events.settings, "REALTIME_HEARTBEAT_SECONDS", 0.05)
+    token = user_token(owner_id)
+
+    async def scenario():
+        stream = events.event_stream(owner_id, token)
+        before = [await stream.__anext__() for _ in range(3)]
+        with SessionLocal() as db:
+            db.get(User, owner_id).hashed_password = "changed"
+            db.commit()
+        return before, await asyncio.wait_for(read(stream), 5)
+
+    auth_cache.clear()
+    before, after = run(scenario())
+    assert before[1:] == [b": ping\n\n"] * 2
+    # At most the heartbeat already in flight, then the stream closes
+    assert len(after) <= 1
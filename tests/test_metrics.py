@@ -0,0 +1,95 @@
+"""Service stats exposed on /metrics"""
+
+import main
+from services.reminder_dispatcher import ReminderDispatcher
+from services.telegram_bot import TelegramBot
+from tests.stubs import StubServer
+from tests.test_ai_engine import engine, ollama
+from tests.test_reminder_dispatcher import NOW, add_commitments
+from tests.test_telegram_bot import FakeBotApi
+
+
+def samples() -> dict:
+    """Rendered samples by series ("name{labels}") and value"""
+    series = {}
+    for line in main.registry.render().splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            series[name] = float(value)
+    return series
+
+
+def test_extraction_cache_hit_ratio_and_time_saved(run, monkeypatch):
+    texts = ["Send invoice to Acme", "Pay the courier"]
+
+    async def scenario():
+        try:
+            await ai.extract_many(texts, use_prefilter=False)
+            await ai.extract_many(texts, use_prefilter=False)
+            return samples()
+        finally:
+            await ai.close()
+
+    with StubServer(ollama()) as server:
+        ai = engine(server)
+        monkeypatch.setattr(main, "ai_engine", ai)
+        series = run(scenario())
+    assert series['extraction_cache_events_total{event="misses"}'] == 2
+    assert series['extraction_cache_events_total{event="memory_hits"}'] == 2
+    assert series["extraction_cache_hit_ratio"] == 0.5
+    assert series["extraction_cache_llm_seconds_saved"] > 0
+
+
+def test_prefilter_stages_and_score_histogram(run, monkeypatch):
+    texts = ["I will send the invoice by Friday", "Thanks, see you soon"]
+
+    async def scenario():
+        try:
+            await ai.extract_many(texts)
+            return samples()
+        finally:
+            await ai.close()
+
+    with StubServer(ollama()) as server:
+        ai = engine(server)
+        monkeypatch.setattr(main, "ai_engine", ai)
+        series = run(scenario())
+    assert series['ai_engine_events_total{event="prefilter_seen"}'] == 2
+    assert series['ai_engine_events_total{event="prefilter_passed"}'] == 1
+    assert series['ai_engine_events_total{event="prefilter_rejected"}'] == 1
+    assert series["prefilter_threshold"] == ai.prefilter_threshold
+    buckets = {name: value for name, value in series.items() if name.startswith("prefilter_score_messages_total")}
+    assert sum(buckets.values()) == 2 and len(buckets) == 2
+
+
+def test_reminder_dispatch_counts(owner_id, run, monkeypatch):
+    dispatcher = ReminderDispatcher()
+    monkeypatch.setattr(main, "reminder_dispatcher", dispatcher)
+    monkeypatch.setattr(main.settings, "SMTP_HOST", "smtp.test")
+    monkeypatch.setattr("services.reminder_dispatcher.send_email_digests", lambda digests: {d.owner_id for d in digests})
+    run(add_commitments(owner_id))
+    run(dispatcher.dispatch_due(NOW))
+
+    series = samples()
+    assert series['reminder_events_total{event="claimed"}'] == 2
+    assert series['reminder_events_total{event="reminders"}'] == 1
+    assert series['reminder_events_total{event="escalations"}'] == 1
+    assert series['reminder_events_total{event="undelivered"}'] == 0
+
+
+def test_telegram_counts(run, monkeypatch):
+    async def scenario():
+        await bot.start()
+        try:
+            await bot.send_message(5, "hello")
+            return samples()
+        finally:
+            await bot.close()
+
+    with StubServer(FakeBotApi(throttle={5: 1})) as server:
+        bot = TelegramBot(token="104:test", api_url=server.url, webhook_url="https://example.test/hook", handler=lambda u: None)
+        monkeypatch.setattr(main, "telegram_bot", bot)
+        series = run(scenario())
+    assert series['telegram_events_total{event="sent"}'] == 1
+    assert series['telegram_events_total{event="throttled"}'] == 1
+    assert series["telegram_pending_updates"] == 0 and series["telegram_active_chats"] == 0
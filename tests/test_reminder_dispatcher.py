@@ -0,0 +1,102 @@
+"""Reminder dispatch: leased claims and unconfigured channels"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from core.database import BackgroundSessionLocal, SessionLocal
+from models.commitment import Commitment
+from services import reminder_dispatcher as dispatcher_module
+from services.reminder_dispatcher import ReminderDispatcher
+
+# Long past, so commitments of other tests (due 2030) are never due here
+NOW = datetime(2020, 6, 1, 12, 0)
+
+
+def add_commitments(owner_id: int):
+    async def scenario():
+        async with BackgroundSessionLocal() as db:
+            db.add_all([
+                Commitment(owner_id=owner_id, action="Send invoice", deadline=NOW + timedelta(hours=2)),
+                Commitment(owner_id=owner_id, action="Pay courier", deadline=NOW - timedelta(days=3)),
+                Commitment(owner_id=owner_id, action="Renew lease", deadline=NOW + timedelta(days=30)),
+            ])
+            await db.commit()
+    return scenario()
+
+
+async def flags(owner_id: int):
+    async with BackgroundSessionLocal() as db:
+        rows = await db.execute(
+            select(Commitment.action, Commitment.reminder_sent, Commitment.escalated, Commitment.reminder_claimed_until)
+            .where(Commitment.owner_id == owner_id)
+            .order_by(Commitment.deadline)
+        )
+        return [tuple(row) for row in rows]
+
+
+def test_digests_are_sent_outside_the_claim_transaction(owner_id, run, monkeypatch):
+    sent = []
+
+    def send_email_digests(digests):
+        # Runs in a worker thread while the claim is already committed
+        with SessionLocal() as db:
+            leased = db.execute(
+                select(Commitment.action, Commitment.reminder_claimed_until)
+                .where(Commitment.owner_id == owner_id, Commitment.reminder_claimed_until.is_not(None))
+                .order_by(Commitment.deadline)
+            ).all()
+        sent.append(([d.subject for d in digests], leased))
+        return {d.owner_id for d in digests}
+
+    monkeypatch.setattr(dispatcher_module.settings, "SMTP_HOST", "smtp.test")
+    monkeypatch.setattr(dispatcher_module, "send_email_digests", send_email_digests)
+    run(add_commitments(owner_id))
+
+    async def scenario():
+        dispatcher = ReminderDispatcher(lease=300)
+        handled = await dispatcher.dispatch_due(NOW)
+        again = await dispatcher.dispatch_due(NOW)
+        return handled, again, await flags(owner_id)
+
+    handled, again, rows = run(scenario())
+    lease_end = NOW + timedelta(seconds=300)
+    assert sent == [(["Commitments: 1 overdue, 1 due soon"], [("Pay courier", lease_end), ("Send invoice", lease_end)])]
+    assert (handled, again) == (2, 0)
+    assert rows == [
+        ("Pay courier", True, True, None),
+        ("Send invoice", True, False, None),
+        ("Renew lease", False, False, None),
+    ]
+
+
+def test_failed_delivery_releases_the_claim(owner_id, run, monkeypatch):
+    monkeypatch.setattr(dispatcher_module.settings, "SMTP_HOST", "smtp.test")
+    monkeypatch.setattr(dispatcher_module, "send_email_digests", lambda digests: set())
+    run(add_commitments(owner_id))
+
+    async def scenario():
+        handled = await ReminderDispatcher().dispatch_due(NOW)
+        return handled, await flags(owner_id)
+
+    handled, rows = run(scenario())
+    assert handled == 0
+    # Retried on the next tick rather than after the lease
+    assert all(row[1:] == (False, False, None) for row in rows)
+
+
+def test_nothing_is_settled_without_a_configured_channel(owner_id, run, monkeypatch):
+    monkeypatch.setattr(dispatcher_module.settings, "SMTP_HOST", None)
+    monkeypatch.setattr(dispatcher_module.telegram_bot, "token", None)
+    run(add_commitments(owner_id))
+
+    async def scenario():
+        dispatcher = ReminderDispatcher()
+        handled = await dispatcher.dispatch_due(NOW)
+        async with BackgroundSessionLocal() as db:
+            batch = await dispatcher.dispatch_batch(db, NOW)
+        return handled, batch, await flags(owner_id)
+
+    handled, (claimed, flagged), rows = run(scenario())
+    assert handled == 0 and flagged == 0
+    assert all(row[1:] == (False, False, None) for row in rows)
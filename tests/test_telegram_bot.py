@@ -0,0 +1,197 @@
+"""TelegramBot polling and send limits against a fake Bot API server"""
+
+import asyncio
+import time
+from collections import Counter
+
+import pytest
+from sqlalchemy import select
+
+from core.database import IngestSessionLocal
+from models.telegram import TelegramOffset
+from services.telegram_bot import SendLimiter, TelegramApiError, TelegramBot, TokenBucket, update_chat_id
+from tests.stubs import StubServer
+
+
+class FakeBotApi:
+    """Just enough of the Bot API: getUpdates forgets updates below the offset it is given"""
+
+    def __init__(self, updates=(), throttle=None):
+        self.updates = list(updates)
+        self.offsets = []
+        self.sent = []
+        # chat_id -> how many sendMessage calls to answer with 429 first
+        self.throttle = Counter(throttle or {})
+
+    def __call__(self, path, body):
+        method = path.rsplit("/", 1)[1]
+        if method == "getUpdates":
+            offset = body.get("offset", 0)
+            self.offsets.append(offset)
+            pending = [update for update in self.updates if update["update_id"] >= offset]
+            # An empty long poll waits a little instead of returning at once
+            return 200, {"ok": True, "result": pending[:100]}, 0.0 if pending else 0.05
+        if method == "sendMessage":
+            self.sent.append((time.monotonic(), body["chat_id"]))
+            if self.throttle[body["chat_id"]]:
+                self.throttle[body["chat_id"]] -= 1
+                return 429, {
+                    "ok": False, "error_code": 429, "description": "Too Many Requests: retry after 0.3",
+                    "parameters": {"retry_after": 0.3},
+                }, 0.0
+            return 200, {"ok": True, "result": {"message_id": len(self.sent), "chat": {"id": body["chat_id"]}}}, 0.0
+        return 200, {"ok": True, "result": True}, 0.0
+
+
+def message(update_id: int, chat_id: int) -> dict:
+    return {"update_id": update_id, "message": {"message_id": update_id, "chat": {"id": chat_id}, "date": 0, "text": "hi"}}
+
+
+async def wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+async def saved_offset(bot_id: int):
+    async with IngestSessionLocal() as db:
+        return await db.scalar(select(TelegramOffset.next_update_id).where(TelegramOffset.bot_id == bot_id))
+
+
+def test_update_chat_id_skips_malformed_updates():
+    assert update_chat_id(message(1, -42)) == -42
+    assert update_chat_id({"update_id": 1, "callback_query": {}}) is None
+    assert update_chat_id({"update_id": 1, "message": {"text": "no chat"}}) is None
+    assert update_chat_id({"update_id": 1, "message": {"chat": "nope"}}) is None
+    assert update_chat_id({"update_id": 1, "message": "nope"}) is None
+
+
+def test_every_update_is_handled_once_in_chat_order(database, run):
+    updates = [message(1000 + n, n % 3 + 1) for n in range(30)]
+    handled = []
+
+    async def handler(update):
+        await asyncio.sleep(0.001 * (update["update_id"] % 7))
+        handled.append(update)
+
+    async def scenario():
+        bot = TelegramBot(token="101:test", api_url=server.url, webhook_url=None, handler=handler, workers=4)
+        await bot.start()
+        try:
+            await wait_for(lambda: len(handled) == len(updates) and bot.committed_offset == 1030)
+            await wait_for(lambda: server_api.offsets[-1] == 1030)
+        finally:
+            await bot.close()
+        return await saved_offset(101)
+
+    server_api = FakeBotApi(updates)
+    with StubServer(server_api) as server:
+        offset = run(scenario())
+    assert sorted(update["update_id"] for update in handled) == [update["update_id"] for update in updates]
+    for chat_id in (1, 2, 3):
+        ids = [update["update_id"] for update in handled if update["message"]["chat"]["id"] == chat_id]
+        assert ids == sorted(ids)
+    assert offset == 1030
+
+
+def test_unfinished_update_is_not_confirmed_and_comes_back_after_restart(database, run):
+    # Even ids are chat 1, odd ids chat 2; update 1004 never finishes in the first run
+    updates = [message(1000 + n, n % 2 + 1) for n in range(10)]
+    first, second = [], []
+
+    async def stuck_at_1004(update):
+        if update["update_id"] == 1004:
+            await asyncio.Event().wait()
+        first.append(update["update_id"])
+
+    async def handler(update):
+        second.append(update["update_id"])
+
+    async def scenario():
+        bot = TelegramBot(token="102:test", api_url=server.url, webhook_url=None, handler=stuck_at_1004, workers=4)
+        await bot.start()
+        try:
+            # Chat 2 is not held up by chat 1
+            await wait_for(lambda: sorted(first) == [1000, 1001, 1002, 1003, 1005, 1007, 1009])
+            assert bot.committed_offset == 1004
+        finally:
+            await bot.close()
+        offset_after_crash = await saved_offset(102)
+
+        bot = TelegramBot(token="102:test", api_url=server.url, webhook_url=None, handler=handler, workers=4)
+        await bot.start()
+        try:
+            await wait_for(lambda: 1008 in second and bot.committed_offset == 1010)
+        finally:
+            await bot.close()
+        return offset_after_crash, await saved_offset(102)
+
+    server_api = FakeBotApi(updates)
+    with StubServer(server_api) as server:
+        offset_after_crash, final_offset = run(scenario())
+    assert offset_after_crash == 1004
+    # Telegram was never told to drop the unfinished update
+    assert max(server_api.offsets[: server_api.offsets.index(1004) + 1]) == 1004
+    # Nothing lost; only updates from the unconfirmed one on are handled again
+    assert set(first) | set(second) == {update["update_id"] for update in updates}
+    assert min(second) == 1004
+    assert [i for i in second if i % 2 == 0] == [1004, 1006, 1008]
+    assert final_offset == 1010
+
+
+def elapsed(coro_factory, count: int) -> float:
+    async def scenario():
+        started = time.monotonic()
+        for _ in range(count):
+            await coro_factory()
+        return time.monotonic() - started
+    return asyncio.run(scenario())
+
+
+def test_token_bucket_allows_burst_then_rate():
+    bucket = TokenBucket(rate=20.0, capacity=5)
+    # 5 at once, then 5 more at 20 per second
+    assert 0.2 <= elapsed(bucket.acquire, 10) < 0.4
+
+
+def test_private_chat_limit():
+    limiter = SendLimiter(global_rate=100.0, chat_rate=10.0, group_rate=1.0)
+    assert 0.2 <= elapsed(lambda: limiter.acquire(7), 3) < 0.35
+
+
+def test_group_limit_after_burst():
+    limiter = SendLimiter(global_rate=100.0, chat_rate=10.0, group_rate=5.0)
+    # Three at once (GROUP_BURST), then 5 per second
+    assert 0.4 <= elapsed(lambda: limiter.acquire(-100), 5) < 0.55
+
+
+def test_global_limit_across_chats():
+    limiter = SendLimiter(global_rate=20.0, chat_rate=1.0, group_rate=1.0)
+    chats = iter(range(1, 100))
+    # Distinct chats never wait on their own bucket, only on the global one
+    assert 0.45 <= elapsed(lambda: limiter.acquire(next(chats)), 30) < 0.65
+
+
+def test_send_retries_after_429_retry_after(run):
+    async def scenario():
+        bot = TelegramBot(token="103:test", api_url=server.url, webhook_url="https://example.test/hook", handler=lambda u: None)
+        await bot.start()
+        try:
+            result = await bot.send_message(5, "hello")
+            with pytest.raises(TelegramApiError) as raised:
+                await bot.send_message(6, "hello")
+            return result, raised.value, dict(bot.stats)
+        finally:
+            await bot.close()
+
+    server_api = FakeBotApi(throttle={5: 1, 6: 3})
+    with StubServer(server_api) as server:
+        result, error, stats = run(scenario())
+    assert result["chat"]["id"] == 5
+    to_5 = [at for at, chat_id in server_api.sent if chat_id == 5]
+    assert len(to_5) == 2 and to_5[1] - to_5[0] >= 0.3
+    # Gives up after SEND_ATTEMPTS throttled answers
+    assert error.error_code == 429 and error.retry_after == 0.3
+    assert [chat_id for _, chat_id in server_api.sent].count(6) == 3
+    assert stats["throttled"] == 3 and stats["sent"] == 1